@@ -0,0 +1 @@
+"""Latency and throughput benchmarks for the TTS server."""
@@ -0,0 +1,170 @@
+"""Microbenchmark of the /stream chunk path, without HTTP or a model.
+
+Compares the original per-step path (``np.array`` + ``astype`` + ``tobytes``
+and a header concatenation for every model step) with the pooled path
+(conversion straight into reused buffers, yielded as memoryviews) and with
+the pooled path coalescing steps.
+
+``encode`` is the time to produce the pieces; ``served`` also moves each
+piece the way /stream does, off the worker thread with
+``iterate_in_threadpool`` and into a socket, which is where the number of
+writes shows::
+
+    python -m benchmarks.chunk_path
+    python -m benchmarks.chunk_path --seconds 30 --coalesce-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+from starlette.concurrency import iterate_in_threadpool
+
+from tts_engine.batching import to_float32
+from tts_engine.tracing import NULL_TRACE
+from tts_engine.wire import Framer, StreamEncoder, encode_stream
+
+SAMPLE_RATE = 24000
+# Model step sizes, in samples: 10 ms, 80 ms and one second of audio.
+STEP_SAMPLES = (240, 1920, 24000)
+FORMATS = ("f32le", "s16le")
+
+
+def legacy_stream(chunks, fmt: str, framed: bool) -> Iterator[bytes]:
+    """The chunk path as it was before buffer pooling."""
+    encoder = StreamEncoder(fmt, SAMPLE_RATE)
+    framer = Framer() if framed else None
+    for audio in chunks:
+        audio = np.array(audio).astype(np.float32)
+        with NULL_TRACE.span("encode"):
+            data = encoder.encode(audio)
+        yield data if framer is None else framer.audio(data, len(audio))
+    if framer is not None:
+        yield framer.end()
+
+
+def pooled_stream(coalesce_ms: float) -> Callable:
+    def stream(chunks, fmt: str, framed: bool):
+        converted = (to_float32(audio) for audio in chunks)
+        return encode_stream(
+            converted, fmt, SAMPLE_RATE, framed=framed, coalesce_ms=coalesce_ms
+        )
+
+    return stream
+
+
+def drain(stream) -> tuple:
+    writes = sent = 0
+    for piece in stream:
+        writes += 1
+        sent += len(piece)
+    return writes, sent
+
+
+def serve(stream) -> tuple:
+    """Sends ``stream`` over a local socket as the /stream endpoint would."""
+    sender, receiver = socket.socketpair()
+    reader = threading.Thread(
+        target=lambda: all(iter(lambda: receiver.recv(1 << 20), b""))
+    )
+    reader.start()
+
+    async def send():
+        loop = asyncio.get_running_loop()
+        sender.setblocking(False)
+        writes = sent = 0
+        async for piece in iterate_in_threadpool(stream):
+            await loop.sock_sendall(sender, piece)
+            writes += 1
+            sent += len(piece)
+        return writes, sent
+
+    try:
+        return asyncio.run(send())
+    finally:
+        sender.close()
+        reader.join()
+        receiver.close()
+
+
+def measure(stream, steps: List[np.ndarray], fmt: str, repeats: int) -> Dict:
+    """Best-of-``repeats`` times to produce and to serve ``stream``."""
+    seconds = sum(len(step) for step in steps) / SAMPLE_RATE
+    result = {}
+    for name, consume in (("encode", drain), ("served", serve)):
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            writes, sent = consume(stream(iter(steps), fmt, True))
+            best = min(best, time.perf_counter() - started)
+        result[f"{name}_us_per_audio_s"] = best * 1e6 / seconds
+    result["writes_per_audio_s"] = writes / seconds
+    result["bytes"] = sent
+    return result
+
+
+def run(
+    seconds: float = 10.0, coalesce_ms: float = 80.0, repeats: int = 5
+) -> List[Dict]:
+    rng = np.random.default_rng(0)
+    paths = {
+        "legacy": legacy_stream,
+        "pooled": pooled_stream(0.0),
+        f"pooled+{coalesce_ms:g}ms": pooled_stream(coalesce_ms),
+    }
+    results = []
+    for step in STEP_SAMPLES:
+        count = max(1, int(seconds * SAMPLE_RATE / step))
+        steps = [
+            rng.uniform(-1, 1, step).astype(np.float32) for _ in range(count)
+        ]
+        for fmt in FORMATS:
+            for name, stream in paths.items():
+                results.append(
+                    {
+                        "step_ms": step * 1000 / SAMPLE_RATE,
+                        "format": fmt,
+                        "path": name,
+                        **measure(stream, steps, fmt, repeats),
+                    }
+                )
+    return results
+
+
+def print_table(results: List[Dict]) -> None:
+    print(
+        f"{'step':>8}  {'format':<7}{'path':<14}"
+        f"{'encode us/s':>12}{'served us/s':>13}{'writes/s':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['step_ms']:>6.0f}ms  {r['format']:<7}{r['path']:<14}"
+            f"{r['encode_us_per_audio_s']:>12.1f}"
+            f"{r['served_us_per_audio_s']:>13.1f}"
+            f"{r['writes_per_audio_s']:>10.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="/stream chunk path benchmark")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--coalesce-ms", type=float, default=80.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print raw results")
+    args = parser.parse_args(argv)
+
+    results = run(args.seconds, args.coalesce_ms, args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+"""Compares benchmark results with a stored baseline."""
+
+import json
+from typing import Any, Dict, List, NamedTuple
+
+# Metrics where a larger value is worse, with the smallest absolute change
+# worth flagging so timer noise on tiny values is not reported.
+TOLERANCES = {
+    "load_seconds": 0.05,
+    "peak_rss_mb": 64.0,
+    "ttfa_ms": 10.0,
+    "rtf": 0.02,
+    "chunk_gap_p95_ms": 10.0,
+}
+
+
+class Regression(NamedTuple):
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        if not self.baseline:
+            return float("inf")
+        return self.current / self.baseline - 1
+
+    def __str__(self) -> str:
+        return (
+            f"{self.metric}: {self.baseline:.4g} -> {self.current:.4g} "
+            f"({self.change:+.0%})"
+        )
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """Maps results onto ``metric`` / ``scenario.metric`` keys."""
+    metrics = {
+        name: float(results[name]) for name in TOLERANCES if name in results
+    }
+    for scenario in results.get("scenarios", []):
+        for name in TOLERANCES:
+            if name in scenario:
+                metrics[f"{scenario['name']}.{name}"] = float(scenario[name])
+    return metrics
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.25
+) -> List[Regression]:
+    """Returns metrics that got worse than the baseline by over ``threshold``.
+
+    Args:
+        current: Results of this run.
+        baseline: Stored results to compare against.
+        threshold: Allowed relative slowdown, e.g. 0.25 for 25%.
+    """
+    current_metrics = flatten(current)
+    regressions = []
+    for key, base in flatten(baseline).items():
+        if key not in current_metrics:
+            continue
+        value = current_metrics[key]
+        tolerance = TOLERANCES[key.rsplit(".", 1)[-1]]
+        if value > base * (1 + threshold) and value - base > tolerance:
+            regressions.append(Regression(key, base, value))
+    return regressions
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_results(path: str, results: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
@@ -0,0 +1,308 @@
+"""Runs the TTS benchmark suite against the HTTP server.
+
+The server is started in-process on a free port and driven over real HTTP,
+so the numbers include scheduling, segmentation and streaming overhead::
+
+    python -m benchmarks                          # deterministic stub model
+    python -m benchmarks --model <repo id|path>   # real model
+    python -m benchmarks --baseline benchmarks/baselines/stub.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.regression import compare, load_results, write_results
+from benchmarks.stub_model import load_stub_model
+from tts_engine.loader import peak_rss_bytes
+
+STUB_MODEL = "stub"
+
+TEXTS = {
+    "short": "Your meeting starts in five minutes.",
+    "medium": (
+        "The quarterly report is ready for review. Revenue grew eight percent "
+        "over last quarter, driven mostly by the new subscription tier. "
+        "Please send comments before Friday."
+    ),
+    "long": (
+        "Memory-mapped files let a process treat a file on disk as if it were "
+        "part of its own address space. Pages are read lazily, the first time "
+        "they are touched, and the operating system is free to drop clean "
+        "pages again under memory pressure. For large model checkpoints this "
+        "means start-up cost is paid gradually rather than all at once. It "
+        "also means two processes that map the same file share one copy of "
+        "it in the page cache. The trade-off is that the first inference may "
+        "stall on page faults, which is why servers often run a short warm-up "
+        "request before they report themselves ready."
+    ),
+}
+MODES = ("voice", "clone")
+# Reads closer together than this are one delivery split by HTTP chunking.
+BURST_MS = 2.0
+REF_TEXT = "This is a short reference recording."
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def patched(module: Any, **attrs: Any):
+    """Temporarily replaces module attributes."""
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield module
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+@contextmanager
+def running_server(app: Any, timeout: float = 30.0):
+    """Serves ``app`` with uvicorn on a background thread; yields the port."""
+    import uvicorn
+
+    port = free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="benchmark-server")
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError("Benchmark server failed to start")
+        time.sleep(0.01)
+    try:
+        yield port
+    finally:
+        server.should_exit = True
+        thread.join(timeout=timeout)
+
+
+def wait_until_ready(port: int, started: float, timeout: float) -> Dict[str, Any]:
+    """Polls /health until the model is ready; returns the health body."""
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            conn.request("GET", "/health")
+            response = conn.getresponse()
+            body = json.loads(response.read())
+        finally:
+            conn.close()
+        if response.status == 200:
+            return body
+        if body.get("detail", {}).get("status") == "failed":
+            raise RuntimeError(f"Model failed to load: {body['detail']}")
+        time.sleep(0.02)
+    raise TimeoutError("Model did not become ready in time")
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def stream_once(port: int, payload: Dict[str, Any]) -> Dict[str, float]:
+    """Streams one request as f32le and measures latency and cadence."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    try:
+        started = time.perf_counter()
+        conn.request(
+            "POST",
+            "/stream",
+            json.dumps(dict(payload, stream_format="f32le", cache=False)),
+            {"Content-Type": "application/json"},
+        )
+        response = conn.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f"/stream failed: {response.read()!r}")
+        sample_rate = int(response.getheader("X-Sample-Rate"))
+
+        arrivals = []
+        received = 0
+        while True:
+            data = response.read1(1 << 16)
+            if not data:
+                break
+            now = time.perf_counter()
+            if not arrivals or (now - arrivals[-1]) * 1000 > BURST_MS:
+                arrivals.append(now)
+            received += len(data)
+        finished = time.perf_counter()
+    finally:
+        conn.close()
+
+    if not arrivals:
+        raise RuntimeError("/stream returned no audio")
+    audio_seconds = received / 4 / sample_rate
+    gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+    return {
+        "ttfa_ms": (arrivals[0] - started) * 1000,
+        "rtf": (finished - started) / audio_seconds,
+        "audio_seconds": audio_seconds,
+        "chunks": len(arrivals),
+        "chunk_gap_p50_ms": percentile(gaps, 50),
+        "chunk_gap_p95_ms": percentile(gaps, 95),
+        "chunk_gap_max_ms": max(gaps, default=0.0),
+    }
+
+
+def run_scenarios(
+    port: int, texts: Dict[str, str], ref_audio: str, repeats: int
+) -> List[Dict[str, Any]]:
+    """Runs every text length in every mode; reports per-metric medians."""
+    scenarios = []
+    for length, text in texts.items():
+        for mode in MODES:
+            payload = {"text": text}
+            if mode == "clone":
+                payload.update(ref_audio=ref_audio, ref_text=REF_TEXT)
+            else:
+                payload["voice"] = "Chelsie"
+            runs = [stream_once(port, payload) for _ in range(repeats)]
+            scenario = {"name": f"{length}-{mode}", "text_chars": len(text)}
+            for metric in runs[0]:
+                scenario[metric] = statistics.median(run[metric] for run in runs)
+            scenarios.append(scenario)
+    return scenarios
+
+
+def write_reference_audio(directory: str, sample_rate: int = 24000) -> str:
+    path = os.path.join(directory, "reference.wav")
+    t = np.arange(3 * sample_rate) / sample_rate
+    sf.write(path, 0.2 * np.sin(2 * np.pi * 180 * t), sample_rate)
+    return path
+
+
+def run_suite(
+    model: str = STUB_MODEL,
+    repeats: int = 3,
+    texts: Optional[Dict[str, str]] = None,
+    load_timeout: float = 600.0,
+) -> Dict[str, Any]:
+    """Starts the server, waits for the model and runs every scenario.
+
+    Args:
+        model: ``"stub"`` for the deterministic stub, otherwise a model id
+            or path for the real loader.
+        repeats: Runs per scenario; the median is reported.
+        texts: Text lengths to cover; defaults to ``TEXTS``.
+        load_timeout: Seconds to wait for the model to become ready.
+
+    Returns:
+        JSON-serializable results.
+    """
+    os.environ.setdefault("TTS_SYNTHESIS_CACHE_MB", "0")
+    if model != STUB_MODEL:
+        os.environ["TTS_MODEL"] = model
+    import tts_server
+
+    overrides = {}
+    if model == STUB_MODEL:
+        overrides = {
+            "import_backend": lambda: None,
+            "load_model": load_stub_model,
+            "load_audio": lambda path, sample_rate: sf.read(path, dtype="float32")[0],
+        }
+
+    with tempfile.TemporaryDirectory() as tmp, patched(tts_server, **overrides):
+        ref_audio = write_reference_audio(tmp)
+        tts_server.ref_audio_cache.clear()
+        started = time.perf_counter()
+        with running_server(tts_server.app) as port:
+            health = wait_until_ready(port, started, load_timeout)
+            load_seconds = time.perf_counter() - started
+            scenarios = run_scenarios(port, texts or TEXTS, ref_audio, repeats)
+
+    return {
+        "model": model,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "load_seconds": load_seconds,
+        "startup_phases": health["startup"]["phases"],
+        "peak_rss_mb": peak_rss_bytes() / (1 << 20),
+        "scenarios": scenarios,
+    }
+
+
+def print_summary(results: Dict[str, Any]) -> None:
+    print(f"model: {results['model']}")
+    print(
+        f"load: {results['load_seconds']:.2f}s  "
+        f"peak RSS: {results['peak_rss_mb']:.0f} MiB"
+    )
+    print(f"{'scenario':<14}{'TTFA ms':>10}{'RTF':>8}{'gap p95 ms':>12}{'chunks':>8}")
+    for s in results["scenarios"]:
+        print(
+            f"{s['name']:<14}{s['ttfa_ms']:>10.1f}{s['rtf']:>8.3f}"
+            f"{s['chunk_gap_p95_ms']:>12.1f}{s['chunks']:>8.0f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="TTS latency benchmarks")
+    parser.add_argument(
+        "--model",
+        default=STUB_MODEL,
+        help="'stub' (default) or a model id/path to benchmark the real model",
+    )
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed relative regression before failing (default 0.25)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write this run's results to --baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_suite(model=args.model, repeats=args.repeats)
+    write_results(args.output, results)
+    print_summary(results)
+    print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return 0
+    if args.update_baseline:
+        write_results(args.baseline, results)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_results(args.baseline), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed past {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Deterministic stand-in for the TTS model.
+
+Audio length, chunking and compute time depend only on the input text and
+the configured rates, so results are comparable between runs and machines.
+"""
+
+import time
+import zlib
+from contextlib import nullcontext
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional
+
+import numpy as np
+
+from tts_engine.startup import READING_WEIGHTS, TOKENIZER
+
+
+class StubModel:
+    """Synthesizes a text-dependent tone at a fixed real-time factor.
+
+    Args:
+        sample_rate: Output sample rate.
+        rtf: Seconds of compute per second of audio.
+        first_chunk_latency: Fixed delay before the first chunk (prefill).
+        clone_overhead: Extra delay when reference audio is given.
+        chunk_seconds: Audio per streamed chunk.
+        chars_per_second: Speaking rate used to size the audio.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 24000,
+        rtf: float = 0.2,
+        first_chunk_latency: float = 0.05,
+        clone_overhead: float = 0.03,
+        chunk_seconds: float = 0.25,
+        chars_per_second: float = 15.0,
+    ):
+        self.sample_rate = sample_rate
+        self.rtf = rtf
+        self.first_chunk_latency = first_chunk_latency
+        self.clone_overhead = clone_overhead
+        self.chunk_seconds = chunk_seconds
+        self.chars_per_second = chars_per_second
+
+    def _tone(self, text: str) -> np.ndarray:
+        seconds = max(len(text) / self.chars_per_second, self.chunk_seconds)
+        frequency = 120 + zlib.crc32(text.encode("utf-8")) % 200
+        t = np.arange(int(seconds * self.sample_rate)) / self.sample_rate
+        return (0.3 * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+    def generate(
+        self,
+        text: str,
+        stream: bool = False,
+        ref_audio: Optional[Any] = None,
+        **kwargs,
+    ) -> Iterator[SimpleNamespace]:
+        audio = self._tone(text)
+        delay = self.first_chunk_latency
+        if ref_audio is not None:
+            delay += self.clone_overhead
+        time.sleep(delay)
+
+        step = len(audio) if not stream else int(self.chunk_seconds * self.sample_rate)
+        for start in range(0, len(audio), step):
+            chunk = audio[start : start + step]
+            time.sleep(len(chunk) / self.sample_rate * self.rtf)
+            yield SimpleNamespace(audio=chunk, sample_rate=self.sample_rate)
+
+
+def load_stub_model(
+    model_id: str, phase=None, load_seconds: float = 0.1, **kwargs
+) -> StubModel:
+    """Mimics the loader's phases with fixed delays and returns a stub."""
+    phase = phase or (lambda name: nullcontext())
+    with phase(READING_WEIGHTS):
+        time.sleep(load_seconds * 0.8)
+    with phase(TOKENIZER):
+        time.sleep(load_seconds * 0.2)
+    return StubModel(**kwargs)
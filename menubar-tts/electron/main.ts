@@ -39,8 +39,8 @@ function initializeServices() {
   const appRoot = process.env.APP_ROOT || path.join(__dirname, '..') // Fallback if env missing
   
   pythonService = new PythonService(appRoot, app.isPackaged, process.resourcesPath)
-  voiceService = new VoiceService(userDataPath)
   ttsService = new TtsService(pythonService, userDataPath)
+  voiceService = new VoiceService(userDataPath, ttsService)
   modelDownloadService = new ModelDownloadService()
 }
 
@@ -16,6 +16,24 @@ export interface TtsPayload {
   exaggeration?: number
   cfgScale?: number
   ddpmSteps?: number
+  model?: string
+}
+
+export interface IngestedVoice {
+  id: string
+  path: string
+  warnings: string[]
+}
+
+const JOB_POLL_INTERVAL_MS = 100
+const SERVER_POLL_INTERVAL_MS = 200
+const SERVER_START_TIMEOUT_MS = 10 * 60 * 1000
+
+const STARTUP_PHASE_LABELS: Record<string, string> = {
+  importing: 'Loading libraries...',
+  reading_weights: 'Loading model weights...',
+  tokenizer: 'Loading tokenizer...',
+  warmup: 'Warming up model...',
 }
 
 export class TtsService {
@@ -23,6 +41,7 @@ export class TtsService {
   private userDataPath: string
   private serverProcess?: ChildProcessWithoutNullStreams
   private serverReady?: Promise<number>
+  private startupListeners = new Set<(status: string) => void>()
 
   constructor(pythonService: PythonService, userDataPath: string) {
     this.pythonService = pythonService
@@ -47,21 +66,39 @@ export class TtsService {
   }
 
   private async waitForServerReady(port: number): Promise<void> {
-    const maxAttempts = 25
-    const delayMs = 200
-    for (let attempt = 0; attempt < maxAttempts; attempt += 1) {
+    // The server binds immediately and loads the model in the background, so
+    // keep polling for as long as /health reports progress.
+    const deadline = Date.now() + SERVER_START_TIMEOUT_MS
+    while (Date.now() < deadline) {
+      if (!this.serverProcess) throw new Error('TTS server exited during startup')
+      let startup: { status?: string, phase?: string, error?: string } | undefined
       try {
         const response = await fetch(`http://127.0.0.1:${port}/health`)
         if (response.ok) return
+        startup = (await response.json())?.detail
       } catch {
-        // ignore until ready
+        // ignore until the server is listening
+      }
+      if (startup?.status === 'failed') {
+        throw new Error(`TTS server failed to load model: ${startup.error}`)
       }
-      await new Promise((resolve) => setTimeout(resolve, delayMs))
+      const label = startup?.phase && STARTUP_PHASE_LABELS[startup.phase]
+      if (label) this.startupListeners.forEach((listener) => listener(label))
+      await new Promise((resolve) => setTimeout(resolve, SERVER_POLL_INTERVAL_MS))
     }
     throw new Error('TTS streaming server failed to start')
   }
 
-  private ensureServer(): Promise<number> {
+  private async ensureServer(onStatus?: (status: string) => void): Promise<number> {
+    if (onStatus) this.startupListeners.add(onStatus)
+    try {
+      return await this.startServer()
+    } finally {
+      if (onStatus) this.startupListeners.delete(onStatus)
+    }
+  }
+
+  private startServer(): Promise<number> {
     if (this.serverReady) return this.serverReady
 
     this.serverReady = (async () => {
@@ -87,22 +124,67 @@ export class TtsService {
         this.serverProcess = undefined
       })
 
-      await this.waitForServerReady(port)
+      try {
+        await this.waitForServerReady(port)
+      } catch (err) {
+        this.serverProcess?.kill()
+        this.serverReady = undefined
+        throw err
+      }
       return port
     })()
 
     return this.serverReady
   }
 
+  /**
+   * Uploads a clone reference to the server, which checks it, converts it
+   * to the model's sample rate and stores a normalized copy.
+   */
+  async ingestVoice(filePath: string, name: string, transcript?: string): Promise<IngestedVoice> {
+    const port = await this.ensureServer()
+    const query = new URLSearchParams({ name })
+    if (transcript) query.set('transcript', transcript)
+    const response = await fetch(`http://127.0.0.1:${port}/voices?${query}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/octet-stream' },
+      body: await fsp.readFile(filePath),
+    })
+    if (!response.ok) {
+      throw new Error(`Voice ingestion failed: ${await response.text()}`)
+    }
+    return response.json()
+  }
+
+  async removeVoice(id: string): Promise<void> {
+    // Only a running server knows its voices; never start one just to delete.
+    if (!this.serverReady) return
+    const port = await this.serverReady
+    await fetch(`http://127.0.0.1:${port}/voices/${id}`, { method: 'DELETE' })
+  }
+
+  private toServerRequest(payload: TtsPayload) {
+    return {
+      text: payload.text,
+      voice: payload.voice,
+      speed: payload.speed,
+      pitch: payload.pitch,
+      gender: payload.gender,
+      instruct: payload.instruct,
+      ref_audio: payload.refAudioPath,
+      ref_text: payload.refText,
+      exaggeration: payload.exaggeration,
+      cfg_scale: payload.cfgScale,
+      ddpm_steps: payload.ddpmSteps,
+      model: payload.model,
+    }
+  }
+
   async generate(
     payload: TtsPayload,
     onStatus?: (status: string) => void
   ): Promise<{ audioPath: string, audioData: string, mimeType: string }> {
-    const { 
-      text, voice, speed, pitch, gender, instruct, refAudioPath, refText, exaggeration, cfgScale, ddpmSteps 
-    } = payload
-    
-    if (!text || !text.trim()) {
+    if (!payload.text || !payload.text.trim()) {
       throw new Error('Text is required.')
     }
 
@@ -110,38 +192,6 @@ export class TtsService {
     await fsp.mkdir(outputDir, { recursive: true })
 
     const filePrefix = `qwen3_${Date.now()}`
-    
-    const pythonPath = this.pythonService.resolvePath()
-    const cwd = outputDir
-    
-    const modelId = 'mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16'
-
-    // Construct CLI arguments for mlx_audio.tts.generate
-    const args = [
-      '-m',
-      'mlx_audio.tts.generate',
-      '--model',
-      modelId,
-      '--text',
-      text,
-      '--file_prefix',
-      filePrefix,
-      '--audio_format',
-      'wav',
-    ]
-
-    if (voice) args.push('--voice', voice)
-    if (gender) args.push('--gender', gender)
-    if (instruct) args.push('--instruct', instruct)
-    if (typeof speed === 'number') args.push('--speed', String(speed))
-    if (typeof pitch === 'number') args.push('--pitch', String(pitch))
-    if (typeof exaggeration === 'number') args.push('--exaggeration', String(exaggeration))
-    if (typeof cfgScale === 'number') args.push('--cfg_scale', String(cfgScale))
-    if (typeof ddpmSteps === 'number') args.push('--ddpm_steps', String(ddpmSteps))
-    if (refAudioPath) args.push('--ref_audio', refAudioPath)
-    if (refText) args.push('--ref_text', refText)
-
-    console.log('Running TTS Spawn:', pythonPath, args.join(' '))
 
     let lastStatus = ''
     const pushStatus = (status: string) => {
@@ -151,50 +201,41 @@ export class TtsService {
       onStatus?.(next)
     }
 
-    const parseStatusLines = (text: string) => {
-      const lines = text.split(/[\r\n]+/).map((line) => line.trim()).filter(Boolean)
-      for (const line of lines) {
-        if (/\b(Downloading|Resolving|Fetching|Loading)\b/i.test(line)) {
-          pushStatus(line)
-          continue
-        }
-        if (/\b\d{1,3}%\b/.test(line)) {
-          pushStatus(line)
-        }
-      }
-    }
-
     pushStatus('Preparing model...')
+    const port = await this.ensureServer(pushStatus)
+    const baseUrl = `http://127.0.0.1:${port}`
 
-    await new Promise<void>((resolve, reject) => {
-      const child = spawn(pythonPath, args, { env: process.env, cwd })
-      let stderr = ''
-
-      child.stdout.on('data', (data) => console.log('[TTS stdout]:', data.toString()))
-      child.stderr.on('data', (data) => {
-        const str = data.toString()
-        stderr += str
-        parseStatusLines(str)
-        console.error('[TTS stderr]:', str)
-      })
-
-      child.on('spawn', () => pushStatus('Generating audio...'))
-      child.on('error', (err) => reject(err))
-      child.on('close', (code) => {
-        if (code === 0) resolve()
-        else reject(new Error(`TTS process failed (code ${code}):\n${stderr}`))
-      })
+    // Runs on the resident model in the server, so there is no per-request
+    // interpreter start or model load.
+    const created = await fetch(`${baseUrl}/jobs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ format: 'wav', items: [this.toServerRequest(payload)] }),
     })
+    if (!created.ok) {
+      throw new Error(`TTS job failed: ${await created.text()}`)
+    }
+    const { id } = await created.json()
+    pushStatus('Generating audio...')
 
-    const files = await fsp.readdir(outputDir)
-    const match = files
-      .filter((file) => file.startsWith(filePrefix) && file.endsWith('.wav'))
-      .sort()[0]
+    for (;;) {
+      const response = await fetch(`${baseUrl}/jobs/${id}`)
+      if (!response.ok) {
+        throw new Error(`TTS job failed: ${await response.text()}`)
+      }
+      const job = await response.json()
+      const item = job.items[0]
+      if (item.status === 'failed') throw new Error(`TTS job failed: ${item.error}`)
+      if (item.status === 'done') break
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+    }
 
-    if (!match) throw new Error('No audio file was generated.')
+    const result = await fetch(`${baseUrl}/jobs/${id}/result/0`)
+    if (!result.ok) throw new Error('No audio file was generated.')
 
-    const audioPath = path.join(outputDir, match)
-    const audioBuffer = await fsp.readFile(audioPath)
+    const audioBuffer = Buffer.from(await result.arrayBuffer())
+    const audioPath = path.join(outputDir, `${filePrefix}.wav`)
+    await fsp.writeFile(audioPath, audioBuffer)
 
     return {
       audioPath,
@@ -216,7 +257,7 @@ export class TtsService {
     if (!payload.text || !payload.text.trim()) {
       throw new Error('Text is required.')
     }
-    const port = await this.ensureServer()
+    const port = await this.ensureServer(handlers.onStatus)
     handlers.onStatus?.('Connecting to streaming engine...')
 
     const outputDir = path.join(this.userDataPath, 'tts-output')
@@ -226,19 +267,9 @@ export class TtsService {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({
-        text: payload.text,
+        ...this.toServerRequest(payload),
         output_path: outputDir,
         file_prefix: `stream_${Date.now()}`,
-        voice: payload.voice,
-        speed: payload.speed,
-        pitch: payload.pitch,
-        gender: payload.gender,
-        instruct: payload.instruct,
-        ref_audio: payload.refAudioPath,
-        ref_text: payload.refText,
-        exaggeration: payload.exaggeration,
-        cfg_scale: payload.cfgScale,
-        ddpm_steps: payload.ddpmSteps,
       }),
     })
 
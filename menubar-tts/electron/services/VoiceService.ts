@@ -7,15 +7,33 @@ const VOICES_DIR = 'custom_voices'
 export interface Voice {
   id: string
   name: string
+  // Clip the server clones from: the ingested copy when available.
   path: string
   transcript?: string
+  // The recording as saved, kept when the server stored its own copy.
+  sourcePath?: string
+  serverVoiceId?: string
+  warnings?: string[]
+}
+
+// Server-side ingestion (TtsService), injected so the registry can be used
+// and tested without a running server.
+export interface VoiceIngestor {
+  ingestVoice(
+    filePath: string,
+    name: string,
+    transcript?: string
+  ): Promise<{ id: string; path: string; warnings: string[] }>
+  removeVoice(id: string): Promise<void>
 }
 
 export class VoiceService {
   private userDataPath: string
+  private ingestor?: VoiceIngestor
 
-  constructor(userDataPath: string) {
+  constructor(userDataPath: string, ingestor?: VoiceIngestor) {
     this.userDataPath = userDataPath
+    this.ingestor = ingestor
   }
 
   private get voicesDir(): string {
@@ -62,6 +80,19 @@ export class VoiceService {
       path: filePath,
       transcript
     }
+
+    if (this.ingestor) {
+      try {
+        const ingested = await this.ingestor.ingestVoice(filePath, name, transcript)
+        newVoice.path = ingested.path
+        newVoice.sourcePath = filePath
+        newVoice.serverVoiceId = ingested.id
+        newVoice.warnings = ingested.warnings
+      } catch (err) {
+        // Unusable recordings are still saved; cloning falls back to the raw file.
+        console.warn('Voice ingestion failed, using the original recording:', err)
+      }
+    }
     
     voices.push(newVoice)
     await fsp.writeFile(this.voicesFile, JSON.stringify(voices, null, 2))
@@ -82,8 +113,15 @@ export class VoiceService {
     const voice = voices.find(v => v.id === id)
     
     if (voice) {
+      if (voice.serverVoiceId && this.ingestor) {
+        try {
+          await this.ingestor.removeVoice(voice.serverVoiceId)
+        } catch {
+          // the server may be gone; its copy is orphaned, not the registry
+        }
+      }
       try {
-        await fsp.unlink(voice.path)
+        await fsp.unlink(voice.sourcePath ?? voice.path)
       } catch {
         // ignore missing file
       }
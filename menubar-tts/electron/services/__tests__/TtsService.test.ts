@@ -1,4 +1,4 @@
-import { describe, it, expect, vi, beforeEach } from 'vitest'
+import { describe, it, expect, vi, beforeEach, afterEach } from 'vitest'
 import { TtsService } from '../TtsService'
 import { PythonService } from '../PythonService'
 import { spawn } from 'node:child_process'
@@ -8,120 +8,101 @@ vi.mock('node:child_process')
 vi.mock('node:fs', () => ({
   promises: {
     mkdir: vi.fn().mockResolvedValue(undefined),
-    readdir: vi.fn().mockImplementation(async () => {
-      return ['qwen3_1700000000000.wav']
-    }),
-    readFile: vi.fn().mockResolvedValue(Buffer.from('fake audio data')),
+    writeFile: vi.fn().mockResolvedValue(undefined),
   }
 }))
 
+const jsonResponse = (body: unknown, ok = true) => ({
+  ok,
+  json: async () => body,
+  text: async () => JSON.stringify(body),
+})
+
 describe('TtsService', () => {
   let ttsService: TtsService
   let mockPythonService: PythonService
+  let fetchMock: ReturnType<typeof vi.fn>
   const MOCK_NOW = 1700000000000
+  const audioBytes = Buffer.from('fake audio data')
+
+  const mockJobServer = (itemStatus: Record<string, unknown> = { status: 'done' }) => {
+    fetchMock.mockImplementation(async (url: string, init?: RequestInit) => {
+      if (url.endsWith('/jobs') && init?.method === 'POST') {
+        return jsonResponse({ id: 'job1', status: 'queued' })
+      }
+      if (url.endsWith('/jobs/job1')) {
+        return jsonResponse({ id: 'job1', items: [{ index: 0, ...itemStatus }] })
+      }
+      if (url.endsWith('/jobs/job1/result/0')) {
+        return {
+          ok: true,
+          arrayBuffer: async () => audioBytes.buffer.slice(
+            audioBytes.byteOffset, audioBytes.byteOffset + audioBytes.byteLength
+          ),
+        }
+      }
+      throw new Error(`Unexpected request ${url}`)
+    })
+  }
 
   beforeEach(() => {
     vi.clearAllMocks()
     vi.useFakeTimers()
     vi.setSystemTime(new Date(MOCK_NOW))
-    
+
     mockPythonService = {
       resolvePath: vi.fn().mockReturnValue('/mock/python'),
       getRepoRoot: vi.fn().mockReturnValue('/mock/repo'),
     } as any
     ttsService = new TtsService(mockPythonService, '/mock/user/data')
+    vi.spyOn(ttsService as any, 'ensureServer').mockResolvedValue(4321)
+
+    fetchMock = vi.fn()
+    vi.stubGlobal('fetch', fetchMock)
+  })
+
+  afterEach(() => {
+    vi.unstubAllGlobals()
   })
 
-  it('should generate audio with correct arguments and environment', async () => {
-    const mockChild = {
-      stdout: { on: vi.fn() },
-      stderr: { on: vi.fn() },
-      on: vi.fn((event, cb) => {
-        if (event === 'close') cb(0)
-      }),
-    }
-    vi.mocked(spawn).mockReturnValue(mockChild as any)
-
-    const payload = {
+  it('should generate audio through the server job API', async () => {
+    mockJobServer()
+
+    const result = await ttsService.generate({
       text: 'Hello world',
       voice: 'Chelsie',
       speed: 1.2
-    }
-
-    const result = await ttsService.generate(payload)
-
-    expect(spawn).toHaveBeenCalledWith(
-      '/mock/python',
-      expect.arrayContaining([
-        '-m',
-        'mlx_audio.tts.generate',
-        '--model',
-        'mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16',
-        '--text',
-        'Hello world',
-        '--voice',
-        'Chelsie',
-        '--speed',
-        '1.2'
-      ]),
-      expect.objectContaining({
-        env: expect.any(Object),
-        cwd: '/mock/user/data/tts-output'
-      })
-    )
-
-    expect(result.audioData).toBe(Buffer.from('fake audio data').toString('base64'))
+    })
+
+    const [url, init] = fetchMock.mock.calls[0]
+    expect(url).toBe('http://127.0.0.1:4321/jobs')
+    expect(JSON.parse(init.body)).toEqual({
+      format: 'wav',
+      items: [expect.objectContaining({ text: 'Hello world', voice: 'Chelsie', speed: 1.2 })],
+    })
+    expect(spawn).not.toHaveBeenCalled()
+
+    expect(result.audioPath).toBe('/mock/user/data/tts-output/qwen3_1700000000000.wav')
+    expect(fsp.writeFile).toHaveBeenCalledWith(result.audioPath, audioBytes)
+    expect(result.audioData).toBe(audioBytes.toString('base64'))
+    expect(result.mimeType).toBe('audio/wav')
   })
 
-  it('reports status updates from stderr output', async () => {
-    const stderrHandlers: Array<(data: Buffer) => void> = []
-    const spawnHandlers: Record<string, () => void> = {}
-    const closeHandlers: Array<(code: number) => void> = []
-    const mockChild = {
-      stdout: { on: vi.fn() },
-      stderr: { on: vi.fn((_event, handler) => stderrHandlers.push(handler)) },
-      on: vi.fn((event, cb) => {
-        if (event === 'spawn') spawnHandlers[event] = cb
-        if (event === 'close') closeHandlers.push(cb)
-      }),
-    }
-    vi.mocked(spawn).mockReturnValue(mockChild as any)
-
+  it('reports status updates', async () => {
+    mockJobServer()
     const onStatus = vi.fn()
 
-    const resultPromise = ttsService.generate({ text: 'Hello world' }, onStatus)
-
-    await Promise.resolve()
-
-    spawnHandlers.spawn?.()
-    for (const handler of stderrHandlers) {
-      handler(Buffer.from('Downloading 10%\n'))
-    }
-    for (const handler of closeHandlers) {
-      handler(0)
-    }
-
-    await resultPromise
+    await ttsService.generate({ text: 'Hello world' }, onStatus)
 
     expect(onStatus).toHaveBeenCalledWith('Preparing model...')
     expect(onStatus).toHaveBeenCalledWith('Generating audio...')
-    expect(onStatus).toHaveBeenCalledWith('Downloading 10%')
   })
 
-  it('throws if no audio file is generated', async () => {
-    vi.mocked(fsp.readdir).mockResolvedValue([])
-
-    const mockChild = {
-      stdout: { on: vi.fn() },
-      stderr: { on: vi.fn() },
-      on: vi.fn((event, cb) => {
-        if (event === 'close') cb(0)
-      }),
-    }
-    vi.mocked(spawn).mockReturnValue(mockChild as any)
+  it('throws if the job item fails', async () => {
+    mockJobServer({ status: 'failed', error: 'boom' })
 
     await expect(ttsService.generate({ text: 'Hello world' })).rejects.toThrow(
-      'No audio file was generated.'
+      'TTS job failed: boom'
     )
   })
 
@@ -86,4 +86,48 @@ describe('VoiceService', () => {
 
     expect(result).toEqual([])
   })
+
+  it('stores the server-ingested clip and keeps the recording', async () => {
+    vi.mocked(fsp.readFile).mockRejectedValue(new Error('File not found'))
+    const ingestor = {
+      ingestVoice: vi.fn().mockResolvedValue({
+        id: 'abc123',
+        path: '/cache/voices/abc123.voice.wav',
+        warnings: ['low_snr'],
+      }),
+      removeVoice: vi.fn().mockResolvedValue(undefined),
+    }
+    const service = new VoiceService(userDataPath, ingestor)
+
+    const result = await service.saveFromBuffer('Recorded', Buffer.from('audio'), 'hi')
+
+    expect(ingestor.ingestVoice).toHaveBeenCalledWith(
+      expect.stringContaining('_recording.wav'),
+      'Recorded',
+      'hi'
+    )
+    expect(result.path).toBe('/cache/voices/abc123.voice.wav')
+    expect(result.sourcePath).toContain('_recording.wav')
+    expect(result.warnings).toEqual(['low_snr'])
+
+    vi.mocked(fsp.readFile).mockResolvedValue(JSON.stringify([result]))
+    vi.mocked(fsp.unlink).mockResolvedValue(undefined)
+    await service.delete(result.id)
+    expect(ingestor.removeVoice).toHaveBeenCalledWith('abc123')
+    expect(fsp.unlink).toHaveBeenCalledWith(result.sourcePath)
+  })
+
+  it('falls back to the raw recording when ingestion fails', async () => {
+    vi.mocked(fsp.readFile).mockRejectedValue(new Error('File not found'))
+    const ingestor = {
+      ingestVoice: vi.fn().mockRejectedValue(new Error('silent')),
+      removeVoice: vi.fn(),
+    }
+    const service = new VoiceService(userDataPath, ingestor)
+
+    const result = await service.saveFromFile('Test Voice', '/path/to/original.wav')
+
+    expect(result.path).toContain(`${MOCK_NOW}_original.wav`)
+    expect(result.serverVoiceId).toBeUndefined()
+  })
 })
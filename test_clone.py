@@ -1,5 +1,5 @@
 from mlx_audio.tts.generate import generate_audio
-from mlx_audio.tts.utils import load_model
+from tts_engine.loader import load_model
 import os
 
 # Using a VALID existing file
@@ -12,7 +12,7 @@ import os
 MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
 
 print("Loading model...")
-model = load_model(MODEL_ID)
+model, _ = load_model(MODEL_ID)
 
 print("Generating with voice='' ...")
 output = generate_audio(
@@ -0,0 +1,15 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def running_scheduler():
+    """Reopens the server's scheduler, as app startup does.
+
+    Most tests use the app without its lifespan; an earlier test that ran
+    it (e.g. the benchmark suite) leaves the scheduler shut down.
+    """
+    server = sys.modules.get("tts_server")
+    if server is not None:
+        server.scheduler.start()
@@ -0,0 +1,37 @@
+import io
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tts_engine.audio_codec import encode_audio, negotiate_format
+
+
+@pytest.mark.parametrize(
+    "accept,expected",
+    [
+        (None, "wav"),
+        ("", "wav"),
+        ("*/*", "wav"),
+        ("audio/flac", "flac"),
+        ("audio/ogg", "opus"),
+        ("audio/ogg; codecs=opus", "opus"),
+        ("audio/wav;q=0.4, audio/flac;q=0.9", "flac"),
+        ("audio/flac, audio/wav", "flac"),
+        ("audio/wav;q=0, audio/flac;q=0.1", "flac"),
+        ("audio/mpeg", None),
+        ("audio/mpeg, */*;q=0.1", "wav"),
+    ],
+)
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+@pytest.mark.parametrize("fmt", ["wav", "flac", "opus"])
+def test_encode_audio_round_trips(fmt):
+    audio = 0.25 * np.sin(np.linspace(0, 200 * np.pi, 24000)).astype(np.float32)
+    data = encode_audio(audio, 24000, fmt)
+    decoded, sample_rate = sf.read(io.BytesIO(data), dtype="float32")
+    assert sample_rate == 24000
+    assert abs(len(decoded) - len(audio)) < 2400
+    assert np.max(np.abs(decoded)) > 0.1
@@ -0,0 +1,441 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from tts_engine.batching import (
+    BACKGROUND,
+    BULK,
+    INTERACTIVE,
+    QUEUED,
+    RUNNING,
+    BatchScheduler,
+    batch_key,
+)
+from tts_engine.cancellation import DEADLINE, Cancelled, CancelToken
+
+
+class StubModel:
+    """Records the batch shapes it is asked to run."""
+
+    def __init__(self, chunks=2, samples=4):
+        self.chunks = chunks
+        self.samples = samples
+        self.batch_sizes = []
+        self.batch_kwargs = []
+        self.single_calls = []
+
+    def generate(self, text, **kwargs):
+        self.single_calls.append(text)
+        for _ in range(self.chunks):
+            yield SimpleNamespace(audio=np.full(self.samples, len(text), np.float64))
+
+    def batch_generate(self, texts, voices=None, instructs=None, stream=False):
+        self.batch_sizes.append(len(texts))
+        self.batch_kwargs.append({"voices": voices, "instructs": instructs})
+        for _ in range(self.chunks):
+            for idx, text in enumerate(texts):
+                yield SimpleNamespace(
+                    sequence_idx=idx,
+                    audio=np.full(self.samples, len(text), np.float64),
+                )
+
+
+def submit_all(scheduler, kwargs_list):
+    """Submits concurrently so requests land inside one batching window."""
+    tickets = [None] * len(kwargs_list)
+    barrier = threading.Barrier(len(kwargs_list))
+
+    def submit(i):
+        barrier.wait()
+        tickets[i] = scheduler.submit(kwargs_list[i])
+
+    threads = [
+        threading.Thread(target=submit, args=(i,)) for i in range(len(kwargs_list))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return tickets
+
+
+def test_compatible_requests_share_one_batch():
+    model = StubModel()
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=4, max_wait=0.2)
+    tickets = submit_all(
+        scheduler,
+        [{"text": "a" * n, "stream": True, "instruct": "calm"} for n in (1, 2, 3)],
+    )
+    results = [t.result() for t in tickets]
+    scheduler.shutdown()
+
+    assert model.batch_sizes == [3]
+    assert model.single_calls == []
+    for ticket, audio in zip(tickets, results):
+        expected = len(ticket.gen_kwargs["text"])
+        assert audio.dtype == np.float32
+        assert audio.shape == (8,)
+        assert np.all(audio == expected)
+
+
+def test_max_batch_size_is_respected():
+    model = StubModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=2, max_wait=0.2)
+    tickets = submit_all(scheduler, [{"text": "x" * n} for n in range(1, 6)])
+    for t in tickets:
+        t.result()
+    scheduler.shutdown()
+
+    assert sum(model.batch_sizes) + len(model.single_calls) == 5
+    assert max(model.batch_sizes) == 2
+
+
+def test_incompatible_requests_are_not_batched_together():
+    model = StubModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=4, max_wait=0.1)
+    tickets = submit_all(
+        scheduler,
+        [
+            {"text": "one", "speed": 1.0},
+            {"text": "two", "speed": 1.0},
+            {"text": "three", "speed": 1.5},
+        ],
+    )
+    for t in tickets:
+        t.result()
+    scheduler.shutdown()
+
+    assert sorted(model.batch_sizes) == [2]
+    assert model.single_calls == ["three"]
+
+
+def test_model_extras_at_their_defaults_are_dropped_for_batch_generate():
+    model = StubModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=2, max_wait=0.2)
+    tickets = submit_all(
+        scheduler,
+        [
+            {"text": "hi", "voice": "Ethan", "cfg_scale": 1.0, "ddpm_steps": 30},
+            {"text": "yo", "voice": "Vivian", "cfg_scale": 1.0, "ddpm_steps": 30},
+        ],
+    )
+    for t in tickets:
+        t.result()
+    scheduler.shutdown()
+
+    assert model.batch_sizes == [2]
+    assert sorted(model.batch_kwargs[0]["voices"]) == ["Ethan", "Vivian"]
+
+
+def test_extras_batch_generate_would_drop_run_one_at_a_time():
+    model = StubModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=2, max_wait=0.2)
+    tickets = submit_all(
+        scheduler, [{"text": "hi", "speed": 1.2}, {"text": "yo", "speed": 1.2}]
+    )
+    for t in tickets:
+        t.result()
+    scheduler.shutdown()
+
+    assert model.batch_sizes == []
+    assert sorted(model.single_calls) == ["hi", "yo"]
+
+
+class CloningModel(StubModel):
+    """Mirrors Qwen3: reference clones cannot batch with a voice or instruct."""
+
+    @staticmethod
+    def supports_tts_batch(ref_audio=None, ref_text=None, voice=None, **kwargs):
+        return not (ref_audio is not None and ref_text and voice)
+
+    def batch_generate(
+        self, texts, voices=None, ref_audio=None, ref_text=None, **kwargs
+    ):
+        if ref_audio is not None and ref_text and any(voices):
+            raise ValueError("voice is not supported with ref_audio")
+        return super().batch_generate(texts, voices=voices, **kwargs)
+
+
+def test_model_can_refuse_to_batch_a_request():
+    model = CloningModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=2, max_wait=0.2)
+    clone = {"ref_audio": "ref.wav", "ref_text": "Reference words.", "voice": "Ethan"}
+    tickets = submit_all(scheduler, [{"text": "hi", **clone}, {"text": "yo", **clone}])
+    results = [t.result() for t in tickets]
+    scheduler.shutdown()
+
+    assert model.batch_sizes == []
+    assert sorted(model.single_calls) == ["hi", "yo"]
+    assert all(len(audio) == 4 for audio in results)
+
+
+def test_falls_back_to_sequential_generate_without_batch_support():
+    model = StubModel(chunks=1)
+    model.batch_generate = None
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=4, max_wait=0.1)
+    tickets = submit_all(scheduler, [{"text": "a"}, {"text": "bb"}])
+    for t in tickets:
+        t.result()
+    scheduler.shutdown()
+
+    assert sorted(model.single_calls) == ["a", "bb"]
+
+
+def test_requests_for_different_models_never_share_a_batch():
+    models = {None: StubModel(chunks=1), "small": StubModel(chunks=1)}
+    scheduler = BatchScheduler(
+        lambda model_id: models[model_id], max_batch_size=4, max_wait=0.1
+    )
+    default = scheduler.submit({"text": "a"})
+    small = scheduler.submit({"text": "bb"}, model="small")
+    default.result()
+    small.result()
+    scheduler.shutdown()
+
+    assert models[None].single_calls == ["a"]
+    assert models["small"].single_calls == ["bb"]
+
+
+def test_errors_are_raised_to_the_caller():
+    class FailingModel:
+        def generate(self, **kwargs):
+            raise RuntimeError("boom")
+            yield
+
+    scheduler = BatchScheduler(lambda _: FailingModel(), max_wait=0)
+    ticket = scheduler.submit({"text": "hi"})
+    with pytest.raises(RuntimeError, match="boom"):
+        ticket.result()
+    scheduler.shutdown()
+
+
+def test_missing_model_fails_tickets():
+    scheduler = BatchScheduler(lambda _: None, max_wait=0)
+    with pytest.raises(RuntimeError, match="Model not loaded"):
+        scheduler.submit({"text": "hi"}).result()
+    scheduler.shutdown()
+
+
+def test_batch_key_ignores_per_item_fields():
+    ref = np.zeros(3)
+    a = {"text": "a", "voice": "x", "instruct": "i", "ref_audio": ref}
+    b = {"text": "b", "voice": "y", "instruct": "j", "ref_audio": ref}
+    c = {"text": "a", "voice": "x", "instruct": "i", "ref_audio": np.zeros(3)}
+    assert batch_key(a) == batch_key(b)
+    assert batch_key(a) != batch_key(c)
+
+
+def test_start_callback_reports_queue_wait():
+    model = StubModel()
+    started = []
+    scheduler = BatchScheduler(
+        lambda _: model, max_batch_size=4, max_wait=0.05, on_start=started.append
+    )
+    ticket = scheduler.submit({"text": "hi"})
+    ticket.result()
+    scheduler.shutdown()
+
+    assert started == [ticket]
+    assert ticket.queue_wait >= 0.04
+
+
+class SteppingModel:
+    """Yields one chunk per step until released or closed."""
+
+    def __init__(self, steps=100, step_seconds=0.01):
+        self.steps = steps
+        self.step_seconds = step_seconds
+        self.started = threading.Event()
+        self.produced = 0
+        self.closed = False
+
+    def generate(self, text, **kwargs):
+        self.started.set()
+        try:
+            for _ in range(self.steps):
+                time.sleep(self.step_seconds)
+                self.produced += 1
+                yield SimpleNamespace(audio=np.zeros(4))
+        except GeneratorExit:
+            self.closed = True
+            raise
+
+
+def test_cancel_stops_running_generation_at_next_step():
+    model = SteppingModel()
+    cancelled = []
+    scheduler = BatchScheduler(lambda _: model, max_wait=0, on_cancel=cancelled.append)
+    scheduler.seconds_per_char = 1.0
+    token = CancelToken()
+    ticket = scheduler.submit({"text": "a long paragraph"}, token=token)
+    assert model.started.wait(timeout=5)
+
+    token.cancel()
+    with pytest.raises(Cancelled):
+        ticket.result()
+    deadline = time.monotonic() + 5
+    while not cancelled and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scheduler.shutdown()
+
+    assert cancelled == [ticket]
+    assert ticket.cancel_state == RUNNING
+    assert model.closed and model.produced < model.steps
+    assert 0 < ticket.saved_seconds < len("a long paragraph")
+
+
+def test_cancel_drops_queued_ticket():
+    model = SteppingModel(steps=20)
+    cancelled = []
+    scheduler = BatchScheduler(lambda _: model, max_wait=0, on_cancel=cancelled.append)
+    busy = scheduler.submit({"text": "first"})
+    assert model.started.wait(timeout=5)
+    token = CancelToken()
+    queued = scheduler.submit({"text": "second"}, token=token)
+    assert scheduler.pending_count == 1
+
+    token.cancel()
+    assert scheduler.pending_count == 0
+    with pytest.raises(Cancelled):
+        queued.result()
+    busy.result()
+    scheduler.shutdown()
+
+    assert cancelled == [queued]
+    assert queued.cancel_state == QUEUED
+    assert queued.started_at is None
+
+
+def test_deadline_wakes_a_waiting_consumer():
+    model = SteppingModel(steps=50)
+    scheduler = BatchScheduler(lambda _: model, max_wait=0)
+    scheduler.submit({"text": "busy"})
+    ticket = scheduler.submit({"text": "late"}, token=CancelToken(timeout=0.05))
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled) as excinfo:
+        ticket.result()
+    waited = time.monotonic() - started
+    scheduler.shutdown()
+    assert excinfo.value.reason == DEADLINE
+    assert waited < 0.4
+
+
+class GatedModel:
+    """Blocks its first generation until released; records the order."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def generate(self, text, **kwargs):
+        self.calls.append(text)
+        self.started.set()
+        assert self.release.wait(timeout=5)
+        yield SimpleNamespace(audio=np.zeros(4))
+
+
+def test_most_urgent_lane_runs_first():
+    model = GatedModel()
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=1, max_wait=0)
+    busy = scheduler.submit({"text": "busy"})
+    assert model.started.wait(timeout=5)
+    tickets = [
+        scheduler.submit({"text": "background"}, priority=BACKGROUND),
+        scheduler.submit({"text": "bulk"}),
+        scheduler.submit({"text": "interactive"}, priority=INTERACTIVE),
+        scheduler.submit({"text": "bulk 2"}, priority=BULK),
+    ]
+    model.release.set()
+    for ticket in [busy, *tickets]:
+        ticket.result()
+    scheduler.shutdown()
+
+    assert model.calls == ["busy", "interactive", "bulk", "bulk 2", "background"]
+
+
+def test_priority_callable_is_asked_when_picking():
+    model = GatedModel()
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=1, max_wait=0)
+    busy = scheduler.submit({"text": "busy"})
+    assert model.started.wait(timeout=5)
+    lane = [BACKGROUND]
+    promoted = scheduler.submit({"text": "promoted"}, priority=lambda: lane[0])
+    bulk = scheduler.submit({"text": "bulk"})
+
+    lane[0] = INTERACTIVE
+    model.release.set()
+    for ticket in (busy, promoted, bulk):
+        ticket.result()
+    scheduler.shutdown()
+
+    assert model.calls == ["busy", "promoted", "bulk"]
+
+
+def test_ticket_that_misses_its_start_is_dropped():
+    model = SteppingModel(steps=50)
+    cancelled = []
+    scheduler = BatchScheduler(lambda _: model, max_wait=0, on_cancel=cancelled.append)
+    busy = scheduler.submit({"text": "busy"})
+    assert model.started.wait(timeout=5)
+    token = CancelToken()
+    late = scheduler.submit(
+        {"text": "late"}, token=token, start_by=time.monotonic() + 0.05
+    )
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled) as excinfo:
+        late.result()
+    waited = time.monotonic() - started
+    busy.result()
+    scheduler.shutdown()
+
+    assert excinfo.value.reason == DEADLINE
+    assert token.reason == DEADLINE
+    assert waited < 0.4
+    assert cancelled == [late]
+    assert late.cancel_state == QUEUED
+
+
+def test_ticket_estimated_to_start_too_late_is_dropped_at_once():
+    model = GatedModel()
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=1, max_wait=0)
+    busy = scheduler.submit({"text": "busy"})
+    assert model.started.wait(timeout=5)
+    scheduler.seconds_per_char = 1.0
+    queued = scheduler.submit({"text": "ten chars!"})
+
+    start_by = time.monotonic() + 5
+    late = scheduler.submit({"text": "late"}, start_by=start_by)
+    # Bulk work does not hold up the interactive lane.
+    urgent = scheduler.submit(
+        {"text": "urgent"}, priority=INTERACTIVE, start_by=start_by
+    )
+
+    assert late.token.reason == DEADLINE
+    assert late.cancel_state == QUEUED
+    assert not urgent.token.cancelled
+    model.release.set()
+    for ticket in (busy, queued, urgent):
+        ticket.result()
+    scheduler.shutdown()
+    assert "late" not in model.calls
+
+
+def test_submit_after_shutdown_fails_until_started():
+    model = StubModel(chunks=1)
+    scheduler = BatchScheduler(lambda _: model, max_wait=0)
+    scheduler.shutdown()
+
+    with pytest.raises(RuntimeError, match="Scheduler shut down"):
+        scheduler.submit({"text": "late"}).result()
+    assert scheduler.pending_count == 0
+    assert model.single_calls == []
+
+    scheduler.start()
+    assert len(scheduler.submit({"text": "again"}).result()) == 4
+    scheduler.shutdown()
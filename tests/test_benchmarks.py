@@ -0,0 +1,76 @@
+import numpy as np
+
+from benchmarks.regression import compare, flatten
+from benchmarks.run import run_suite
+from benchmarks.stub_model import StubModel
+
+
+def results(ttfa=100.0, rtf=0.2, load=1.0):
+    return {
+        "load_seconds": load,
+        "peak_rss_mb": 500.0,
+        "scenarios": [
+            {"name": "short-voice", "ttfa_ms": ttfa, "rtf": rtf, "chunks": 4},
+        ],
+    }
+
+
+def test_flatten_keys_metrics_by_scenario():
+    assert flatten(results()) == {
+        "load_seconds": 1.0,
+        "peak_rss_mb": 500.0,
+        "short-voice.ttfa_ms": 100.0,
+        "short-voice.rtf": 0.2,
+    }
+
+
+def test_regressions_past_threshold_are_reported():
+    regressions = compare(results(ttfa=140.0), results(), threshold=0.25)
+    assert [r.metric for r in regressions] == ["short-voice.ttfa_ms"]
+    assert "+40%" in str(regressions[0])
+
+
+def test_small_or_improving_changes_pass():
+    assert compare(results(ttfa=120.0, rtf=0.1, load=0.5), results()) == []
+    # Relative change is large but below the absolute noise floor.
+    assert compare(results(ttfa=4.0), results(ttfa=1.0)) == []
+
+
+def test_stub_model_is_deterministic():
+    model = StubModel(rtf=0, first_chunk_latency=0)
+    first = [r.audio for r in model.generate("Hello there", stream=True)]
+    second = [r.audio for r in model.generate("Hello there", stream=True)]
+    assert len(first) > 1
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def test_suite_runs_end_to_end_against_stub():
+    out = run_suite(repeats=1, texts={"short": "Hello there, world."})
+
+    assert out["model"] == "stub"
+    assert out["load_seconds"] > 0
+    assert {"reading_weights", "tokenizer", "warmup"} <= set(out["startup_phases"])
+    names = [s["name"] for s in out["scenarios"]]
+    assert names == ["short-voice", "short-clone"]
+    for scenario in out["scenarios"]:
+        assert scenario["ttfa_ms"] > 0
+        assert scenario["audio_seconds"] > 0
+        assert 0 < scenario["rtf"] < 5
+    assert compare(out, out) == []
+
+
+def test_chunk_path_benchmark_coalesces_small_steps():
+    from benchmarks.chunk_path import run
+
+    rows = {
+        (r["step_ms"], r["format"], r["path"]): r
+        for r in run(seconds=1, coalesce_ms=80, repeats=1)
+    }
+    legacy = rows[(10.0, "s16le", "legacy")]
+    coalesced = rows[(10.0, "s16le", "pooled+80ms")]
+    # Same audio, a fraction of the writes (frame headers aside).
+    assert coalesced["writes_per_audio_s"] < legacy["writes_per_audio_s"] / 5
+    assert coalesced["bytes"] < legacy["bytes"]
+    assert rows[(10.0, "f32le", "pooled")]["bytes"] == (
+        rows[(10.0, "f32le", "legacy")]["bytes"]
+    )
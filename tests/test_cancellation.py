@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from tts_engine.cancellation import (
+    CLIENT,
+    DEADLINE,
+    ActiveRequests,
+    Cancelled,
+    CancelToken,
+)
+
+
+def test_cancel_runs_callbacks_once():
+    token = CancelToken()
+    calls = []
+    token.on_cancel(lambda: calls.append("registered"))
+
+    assert token.cancel(CLIENT)
+    assert not token.cancel("other")
+    token.on_cancel(lambda: calls.append("late"))
+
+    assert token.cancelled and token.reason == CLIENT
+    assert calls == ["registered", "late"]
+    with pytest.raises(Cancelled) as excinfo:
+        token.check()
+    assert excinfo.value.reason == CLIENT
+
+
+def test_deadline_cancels_lazily():
+    token = CancelToken(timeout=0.02)
+    calls = []
+    token.on_cancel(lambda: calls.append(token.reason))
+    assert not token.cancelled
+    assert 0 < token.remaining() <= 0.02
+
+    time.sleep(0.03)
+    assert token.expired()
+    assert token.cancelled
+    assert calls == [DEADLINE]
+    assert CancelToken().remaining() is None
+
+
+def test_active_requests_cancel_by_id():
+    requests = ActiveRequests()
+    token = CancelToken()
+    requests.register("abc", token)
+    assert len(requests) == 1
+
+    assert requests.cancel("abc")
+    assert token.reason == CLIENT
+    requests.unregister("abc", token)
+    assert not requests.cancel("abc")
+
+
+def test_requests_sharing_an_id_do_not_displace_each_other():
+    requests = ActiveRequests()
+    first, second = CancelToken(), CancelToken()
+    requests.register("abc", first)
+    requests.register("abc", second)
+    assert len(requests) == 2
+
+    # The first request finishing leaves the second one cancellable.
+    requests.unregister("abc", first)
+    assert requests.cancel("abc")
+    assert second.reason == CLIENT
+    assert first.reason is None
+    requests.unregister("abc", second)
+    assert len(requests) == 0
+    assert not requests.cancel("abc")
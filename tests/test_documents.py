@@ -0,0 +1,181 @@
+import threading
+import time
+
+import pytest
+
+from tts_engine import documents
+from tts_engine.cancellation import Cancelled, CancelToken
+from tts_engine.documents import (
+    PENDING,
+    READY,
+    RUNNING,
+    DocumentManager,
+    split_paragraphs,
+)
+
+
+class Reader:
+    """Stands in for synthesis: three chunks per paragraph, one per step."""
+
+    def __init__(self, step=0.0):
+        self.step = step
+        self.started = []
+        self.tokens = {}
+
+    def __call__(self, session, paragraph, token):
+        text = paragraph.text
+        self.started.append(text)
+        self.tokens[text] = token
+        return self.read(text, token)
+
+    def read(self, text, token):
+        for i in range(3):
+            time.sleep(self.step)
+            token.check()
+            yield f"{text}:{i}"
+
+
+@pytest.fixture
+def manager_factory(monkeypatch):
+    monkeypatch.setattr(documents, "IDLE_POLL_S", 0.01)
+    managers = []
+
+    def make(reader, **kwargs):
+        manager = DocumentManager(reader, **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.shutdown()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def states(session):
+    return [p.state for p in session.paragraphs]
+
+
+def test_split_paragraphs():
+    text = "First line\nstill first.\n\n\n  Second.  \n \nThird."
+    assert split_paragraphs(text) == [
+        "First line still first.",
+        "Second.",
+        "Third.",
+    ]
+
+
+def test_paragraphs_are_read_ahead_of_the_cursor(manager_factory):
+    reader = Reader()
+    manager = manager_factory(reader)
+    session = manager.create(["p0", "p1", "p2", "p3", "p4"], None, read_ahead=2)
+
+    wait_for(lambda: states(session)[:3] == [READY] * 3)
+    time.sleep(0.05)
+    assert states(session)[3:] == [PENDING, PENDING]
+
+    chunks, state = manager.play(session, 0)
+    assert state == READY
+    assert list(chunks) == ["p0:0", "p0:1", "p0:2"]
+
+    chunks, state = manager.play(session, 1)
+    assert state == READY
+    assert list(chunks) == ["p1:0", "p1:1", "p1:2"]
+    wait_for(lambda: session.paragraphs[3].state == READY)
+    # Audio behind the cursor is dropped.
+    assert session.paragraphs[0].state == PENDING
+    assert reader.started == ["p0", "p1", "p2", "p3"]
+
+
+def test_seek_cancels_read_ahead_outside_the_window(manager_factory):
+    reader = Reader(step=0.05)
+    manager = manager_factory(reader)
+    session = manager.create([f"p{i}" for i in range(6)], None, read_ahead=1)
+    wait_for(lambda: "p0" in reader.tokens)
+
+    chunks, state = manager.play(session, 4)
+
+    assert state == PENDING
+    assert list(chunks) == ["p4:0", "p4:1", "p4:2"]
+    wait_for(lambda: reader.tokens["p0"].cancelled)
+    wait_for(lambda: session.paragraphs[5].state == READY)
+    assert "p2" not in reader.started
+    assert states(session)[:4] == [PENDING] * 4
+
+
+def test_playback_joins_a_running_read_ahead(manager_factory):
+    reader = Reader(step=0.05)
+    manager = manager_factory(reader)
+    session = manager.create(["p0", "p1"], None, read_ahead=0)
+    wait_for(lambda: session.paragraphs[0].state == RUNNING)
+
+    chunks, state = manager.play(session, 0)
+
+    assert state == RUNNING
+    assert list(chunks) == ["p0:0", "p0:1", "p0:2"]
+    assert reader.started == ["p0"]
+
+
+def test_read_ahead_waits_for_an_idle_model(manager_factory):
+    idle = threading.Event()
+    reader = Reader()
+    manager = manager_factory(reader, idle=idle.is_set)
+    session = manager.create(["p0", "p1"], None, read_ahead=1)
+
+    time.sleep(0.1)
+    assert reader.started == []
+    # Playback does not wait.
+    assert list(manager.play(session, 0)[0]) == ["p0:0", "p0:1", "p0:2"]
+
+    idle.set()
+    wait_for(lambda: session.paragraphs[1].state == READY)
+
+
+def test_closing_cancels_read_ahead(manager_factory):
+    reader = Reader(step=0.05)
+    manager = manager_factory(reader)
+    session = manager.create(["p0", "p1"], None, read_ahead=1)
+    wait_for(lambda: "p0" in reader.tokens)
+
+    assert manager.close(session.id)
+
+    wait_for(lambda: reader.tokens["p0"].cancelled)
+    assert manager.get(session.id) is None
+    assert not manager.close(session.id)
+    with pytest.raises(KeyError):
+        manager.play(session, 0)
+
+
+def test_sessions_expire_and_are_capped(manager_factory):
+    manager = manager_factory(Reader(), idle=lambda: False, max_sessions=2)
+    first = manager.create(["a"], None, read_ahead=0)
+    second = manager.create(["b"], None, read_ahead=0)
+    manager.play(first, 0)
+    manager.create(["c"], None, read_ahead=0)
+
+    # The least recently used session made room.
+    assert manager.get(second.id) is None
+    assert manager.get(first.id) is first
+
+    manager.ttl = 0
+    assert manager.get(first.id) is None
+    assert len(manager) == 0
+
+
+def test_cancelled_playback_can_be_retried(manager_factory):
+    reader = Reader(step=0.02)
+    manager = manager_factory(reader, idle=lambda: False)
+    session = manager.create(["p0"], None, read_ahead=0)
+    token = CancelToken()
+    chunks, _ = manager.play(session, 0, token)
+    next(chunks)
+    token.cancel()
+    with pytest.raises(Cancelled):
+        list(chunks)
+
+    assert list(manager.play(session, 0)[0]) == ["p0:0", "p0:1", "p0:2"]
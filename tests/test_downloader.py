@@ -0,0 +1,265 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from tts_engine import downloader
+from tts_engine.downloader import (
+    DownloadError,
+    Progress,
+    RemoteFile,
+    download_all,
+    download_file,
+)
+
+FILES = {
+    "model.safetensors": os.urandom(300_000),
+    "config.json": b'{"sample_rate": 24000}',
+    "tokenizer.json": os.urandom(40_000),
+}
+
+
+class StandIn(ThreadingHTTPServer):
+    """Serves FILES with Range support, recording requests.
+
+    ``drop_after`` maps a path to a byte count after which the first
+    response for it is cut off, as a flaky connection would.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.requests = []
+        self.drop_after = {}
+        self.ignore_range = False
+        self.corrupt = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}/{path}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        path = self.path.lstrip("/")
+        byte_range = self.headers.get("Range")
+        with server.lock:
+            server.requests.append((path, byte_range))
+        body = FILES.get(path)
+        if body is None:
+            self.send_error(404)
+            return
+        if path in server.corrupt:
+            body = body[:-1] + bytes([body[-1] ^ 1])
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            start = 0
+            if byte_range and not server.ignore_range:
+                start = int(byte_range.removeprefix("bytes=").rstrip("-"))
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}"
+                )
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body) - start))
+            self.end_headers()
+            limit = server.drop_after.pop(path, None)
+            payload = body[start:]
+            if limit is not None:
+                self.wfile.write(payload[:limit])
+                self.wfile.flush()
+                self.connection.close()
+                return
+            for i in range(0, len(payload), 16384):
+                self.wfile.write(payload[i : i + 16384])
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(
+        target=server.serve_forever, args=(0.05,), daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(downloader, "RETRY_BACKOFF_S", 0)
+    monkeypatch.setattr(downloader, "CHUNK_BYTES", 8192)
+
+
+def remote(server, path, digest="sha256"):
+    body = FILES[path]
+    if digest == "sha256":
+        return RemoteFile(
+            path, server.url(path), len(body), sha256=hashlib.sha256(body).hexdigest()
+        )
+    oid = hashlib.sha1(b"blob %d\0" % len(body) + body).hexdigest()
+    return RemoteFile(path, server.url(path), len(body), git_oid=oid)
+
+
+def test_downloads_concurrently_and_verifies(server, tmp_path):
+    files = [
+        remote(server, "model.safetensors"),
+        remote(server, "config.json", digest="git"),
+        remote(server, "tokenizer.json"),
+    ]
+    events = []
+    with Progress(sum(f.size for f in files), events.append, interval=0.01) as p:
+        download_all(files, lambda f: str(tmp_path / f.path), progress=p, workers=2)
+
+    for path, body in FILES.items():
+        assert (tmp_path / path).read_bytes() == body
+    assert not list(tmp_path.glob("*.incomplete"))
+    assert server.max_active <= 2
+    assert events[-1]["percent"] == 100
+    assert events[-1]["downloadedBytes"] == sum(map(len, FILES.values()))
+
+
+def test_progress_is_reported_at_a_fixed_rate(server, tmp_path):
+    file = remote(server, "model.safetensors")
+    events = []
+    with Progress(file.size, events.append, interval=60) as progress:
+        download_file(file, str(tmp_path / file.path), progress=progress)
+    # ~37 blocks were written, but only the final report was emitted.
+    assert len(events) == 1
+    assert events[0]["downloadedBytes"] == file.size
+
+
+def test_resumes_partial_file_from_a_previous_run(server, tmp_path):
+    file = remote(server, "model.safetensors")
+    dest = tmp_path / file.path
+    (tmp_path / f"{file.path}.incomplete").write_bytes(FILES[file.path][:100_000])
+
+    download_file(file, str(dest))
+
+    assert dest.read_bytes() == FILES[file.path]
+    assert server.requests == [(file.path, "bytes=100000-")]
+
+
+def test_dropped_connection_resumes_on_retry(server, tmp_path):
+    file = remote(server, "model.safetensors")
+    server.drop_after[file.path] = 50_000
+    progress = Progress(file.size, lambda _: None)
+
+    download_file(file, str(tmp_path / file.path), progress=progress)
+
+    assert (tmp_path / file.path).read_bytes() == FILES[file.path]
+    assert server.requests[0] == (file.path, None)
+    assert server.requests[1][1].startswith("bytes=")
+    assert progress.downloaded == file.size
+
+
+def test_restarts_when_server_ignores_range(server, tmp_path):
+    file = remote(server, "tokenizer.json")
+    server.ignore_range = True
+    (tmp_path / f"{file.path}.incomplete").write_bytes(b"stale" * 100)
+
+    download_file(file, str(tmp_path / file.path))
+
+    assert (tmp_path / file.path).read_bytes() == FILES[file.path]
+
+
+def test_checksum_mismatch_fails_without_leaving_files(server, tmp_path):
+    file = remote(server, "tokenizer.json")
+    server.corrupt.add(file.path)
+
+    with pytest.raises(DownloadError, match="checksum mismatch"):
+        download_file(file, str(tmp_path / file.path), retries=1)
+
+    assert list(tmp_path.iterdir()) == []
+    assert len(server.requests) == 2
+
+
+def test_missing_files_fail_fast(server, tmp_path):
+    file = RemoteFile("absent.bin", server.url("absent.bin"), 10)
+    with pytest.raises(DownloadError, match="HTTP 404"):
+        download_all([file], lambda f: str(tmp_path / f.path))
+    assert len(server.requests) == 1
+
+
+def test_existing_files_are_skipped(server, tmp_path):
+    file = remote(server, "config.json")
+    (tmp_path / file.path).write_bytes(FILES[file.path])
+    progress = Progress(file.size, lambda _: None)
+
+    download_all([file], lambda f: str(tmp_path / f.path), progress=progress)
+
+    assert server.requests == []
+    assert progress.downloaded == file.size
+
+
+def test_download_model_builds_a_hub_cache_snapshot(
+    server, tmp_path, monkeypatch, capsys
+):
+    import download_model
+    from huggingface_hub.hf_api import RepoFile
+
+    model_body = FILES["model.safetensors"]
+    config_body = FILES["config.json"]
+    entries = [
+        RepoFile(
+            path="model.safetensors",
+            size=len(model_body),
+            oid="pointer-oid",
+            lfs={
+                "size": len(model_body),
+                "oid": hashlib.sha256(model_body).hexdigest(),
+                "pointerSize": 134,
+            },
+        ),
+        RepoFile(
+            path="config.json",
+            size=len(config_body),
+            oid=hashlib.sha1(
+                b"blob %d\0" % len(config_body) + config_body
+            ).hexdigest(),
+        ),
+    ]
+    class Api:
+        def model_info(self, repo_id, revision):
+            return SimpleNamespace(sha="c0ffee")
+
+        def list_repo_tree(self, repo_id, recursive, revision):
+            return entries
+
+    monkeypatch.setattr(download_model, "HfApi", Api)
+    monkeypatch.setattr(
+        download_model, "hf_hub_url", lambda repo_id, path, revision: server.url(path)
+    )
+    monkeypatch.setenv("HF_HUB_CACHE", str(tmp_path))
+    monkeypatch.setattr("sys.argv", ["download_model.py", "--model", "org/voice"])
+
+    download_model.main()
+
+    repo = tmp_path / "models--org--voice"
+    snapshot = repo / "snapshots" / "c0ffee"
+    assert (snapshot / "model.safetensors").read_bytes() == model_body
+    assert (snapshot / "config.json").read_bytes() == config_body
+    assert (snapshot / "config.json").is_symlink()
+    assert (repo / "refs" / "main").read_text() == "c0ffee"
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('MODEL_DOWNLOAD {"event": "start"')
+    assert lines[-1] == 'MODEL_DOWNLOAD {"event": "complete"}'
+    # A handful of aggregated reports, not one per block.
+    assert len(lines) <= 4
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+from contextlib import aclosing
+
+import pytest
+
+from tts_engine.executor import PipelineExecutor
+
+
+class Body:
+    """A sync pipeline that records where it ran and whether it was closed."""
+
+    def __init__(self, n=5, step=0.0, fail_at=None):
+        self.n = n
+        self.step = step
+        self.fail_at = fail_at
+        self.threads = set()
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        try:
+            for i in range(self.n):
+                self.threads.add(threading.current_thread().name)
+                time.sleep(self.step)
+                if i == self.fail_at:
+                    raise ValueError("encode failed")
+                self.produced += 1
+                yield i
+        finally:
+            self.closed.set()
+
+
+async def collect(executor, body, limit=None):
+    items = []
+    async with aclosing(executor.iterate(iter(body))) as pieces:
+        async for item in pieces:
+            items.append(item)
+            if len(items) == limit:
+                break
+    return items
+
+
+def test_items_arrive_in_order_from_a_pipeline_thread():
+    body = Body()
+    assert asyncio.run(collect(PipelineExecutor(), body)) == [0, 1, 2, 3, 4]
+    assert body.closed.is_set()
+    assert body.threads and all(t.startswith("tts-pipeline") for t in body.threads)
+
+
+def test_errors_reach_the_consumer():
+    body = Body(fail_at=2)
+    with pytest.raises(ValueError, match="encode failed"):
+        asyncio.run(collect(PipelineExecutor(), body))
+    assert body.closed.is_set()
+
+
+def test_event_loop_stays_free_while_the_pipeline_waits():
+    async def main():
+        ticks = 0
+        stream = asyncio.create_task(collect(PipelineExecutor(), Body(step=0.05)))
+        while not stream.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return await stream, ticks
+
+    items, ticks = asyncio.run(main())
+    assert items == [0, 1, 2, 3, 4]
+    assert ticks >= 10
+
+
+def test_stopping_early_closes_the_pipeline():
+    body = Body(n=1000)
+    executor = PipelineExecutor(buffer=2)
+
+    assert asyncio.run(collect(executor, body, limit=3)) == [0, 1, 2]
+    assert body.closed.wait(timeout=5)
+    # Production stopped within the buffer of the consumer.
+    assert body.produced <= 3 + executor.buffer + 1
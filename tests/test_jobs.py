@@ -0,0 +1,79 @@
+import threading
+import time
+
+from tts_engine.jobs import DONE, FAILED, QUEUED, RUNNING, JobManager
+
+
+def wait_for(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_items_are_rendered_with_timings():
+    def render(request, fmt):
+        return f"{request}:{fmt}".encode(), 1.5
+
+    manager = JobManager(render, workers=2)
+    job = wait_for(manager.submit(["a", "b", "c"], "flac"))
+    manager.shutdown()
+
+    info = job.to_dict()
+    assert info["status"] == DONE
+    assert info["completed"] == 3
+    assert info["progress"] == 1.0
+    assert [item.audio for item in job.items] == [b"a:flac", b"b:flac", b"c:flac"]
+    for item in info["items"]:
+        assert item["audio_seconds"] == 1.5
+        assert item["generation_seconds"] >= 0
+        assert "queue_seconds" in item
+
+
+def test_failed_items_are_reported_without_failing_the_rest():
+    def render(request, fmt):
+        if request == "bad":
+            raise RuntimeError("cannot speak")
+        return b"ok", 1.0
+
+    manager = JobManager(render, workers=1)
+    job = wait_for(manager.submit(["good", "bad"], "wav"))
+    manager.shutdown()
+
+    info = job.to_dict()
+    assert info["status"] == DONE
+    assert info["failed"] == 1
+    assert job.items[1].status == FAILED
+    assert info["items"][1]["error"] == "cannot speak"
+
+    all_bad = JobManager(render, workers=1)
+    assert wait_for(all_bad.submit(["bad"], "wav")).status == FAILED
+    all_bad.shutdown()
+
+
+def test_job_reports_progress_while_running():
+    release = threading.Event()
+
+    def render(request, fmt):
+        release.wait(5)
+        return b"x", 1.0
+
+    manager = JobManager(render, workers=1)
+    job = manager.submit(["a", "b"], "wav")
+    time.sleep(0.05)
+    assert job.status == RUNNING
+    assert job.items[1].status == QUEUED
+    release.set()
+    wait_for(job)
+    manager.shutdown()
+    assert job.status == DONE
+
+
+def test_old_finished_jobs_are_pruned():
+    manager = JobManager(lambda request, fmt: (b"x", 1.0), max_jobs=2)
+    jobs = [wait_for(manager.submit(["a"], "wav")) for _ in range(3)]
+    manager.submit(["a"], "wav")
+    manager.shutdown()
+
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[2].id) is not None
@@ -0,0 +1,113 @@
+import json
+import types
+from unittest.mock import patch
+
+import pytest
+
+mx = pytest.importorskip("mlx.core")
+nn = pytest.importorskip("mlx.nn")
+
+from tts_engine import loader
+from tts_engine.startup import READING_WEIGHTS, TOKENIZER, StartupState
+
+
+class TinyConfig:
+    def __init__(self, dims):
+        self.dims = dims
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(config["dims"])
+
+
+class TinyModel(nn.Module):
+    def __init__(self, config):
+        super().__init__()
+        self.first = nn.Linear(config.dims, config.dims)
+        self.second = nn.Linear(config.dims, 2)
+        self.tokenizer = None
+
+    @classmethod
+    def post_load_hook(cls, model, model_path):
+        model.tokenizer = "loaded"
+        return model
+
+
+TINY_ARCH = types.SimpleNamespace(Model=TinyModel, ModelConfig=TinyConfig)
+
+
+def write_checkpoint(path, extra=False, drop_second=False):
+    path.mkdir()
+    (path / "config.json").write_text(json.dumps({"model_type": "tiny", "dims": 4}))
+    first = {"first.weight": mx.full((4, 4), 1.0), "first.bias": mx.zeros((4,))}
+    second = {"second.weight": mx.full((2, 4), 2.0), "second.bias": mx.ones((2,))}
+    if extra:
+        second["unused.weight"] = mx.zeros((3,))
+    mx.save_safetensors(str(path / "model-00001.safetensors"), first)
+    if not drop_second:
+        mx.save_safetensors(str(path / "model-00002.safetensors"), second)
+    return path
+
+
+@pytest.fixture(autouse=True)
+def tiny_arch():
+    with patch("mlx_audio.utils.get_model_class", return_value=(TINY_ARCH, "tiny")):
+        yield
+
+
+def test_loads_shards_into_model(tmp_path):
+    model_dir = write_checkpoint(tmp_path / "tiny", extra=True)
+
+    model, stats = loader.load_model(str(model_dir))
+
+    assert mx.array_equal(model.first.weight, mx.full((4, 4), 1.0))
+    assert mx.array_equal(model.second.bias, mx.ones((2,)))
+    assert model.tokenizer == "loaded"
+    assert stats.shards == 2
+    assert stats.tensors == 4
+    assert stats.peak_rss_bytes > 0
+    assert stats.seconds >= 0
+
+
+def test_missing_parameters_fail_when_strict(tmp_path):
+    model_dir = write_checkpoint(tmp_path / "tiny", drop_second=True)
+
+    with pytest.raises(ValueError, match="missing from checkpoint"):
+        loader.load_model(str(model_dir))
+
+    model, stats = loader.load_model(str(model_dir), strict=False)
+    assert stats.tensors == 2
+
+
+def test_reports_weight_and_tokenizer_phases(tmp_path):
+    model_dir = write_checkpoint(tmp_path / "tiny")
+    state = StartupState()
+    state.start()
+
+    loader.load_model(str(model_dir), phase=state.phase)
+
+    assert list(state.timings) == [READING_WEIGHTS, TOKENIZER]
+
+
+def test_config_is_parsed_once_and_copied(tmp_path):
+    model_dir = write_checkpoint(tmp_path / "tiny")
+
+    with patch("tts_engine.loader.json.load", wraps=json.load) as parse:
+        first = loader.load_config(model_dir)
+        first["dims"] = 99
+        second = loader.load_config(model_dir)
+
+    assert parse.call_count == 1
+    assert second["dims"] == 4
+    assert second["model_path"] == str(model_dir)
+
+
+def test_safetensors_index_reads_header_only(tmp_path):
+    model_dir = write_checkpoint(tmp_path / "tiny")
+
+    index = loader.safetensors_index(model_dir / "model-00002.safetensors")
+
+    assert index == {
+        "second.weight": ("F32", (2, 4)),
+        "second.bias": ("F32", (2,)),
+    }
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from tts_engine.metrics import MetricsRegistry
+
+
+def test_counter_renders_labelled_totals():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["endpoint"])
+    requests.inc(endpoint="stream")
+    requests.inc(2, endpoint="stream")
+    requests.inc(endpoint='we"ird')
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{endpoint="stream"} 3' in text
+    assert 'requests_total{endpoint="we\\"ird"} 1' in text
+
+
+def test_labels_must_match_declaration():
+    counter = MetricsRegistry().counter("c", "C.", ["endpoint"])
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 3.65" in text
+    assert "latency_seconds_count 4" in text
+
+
+def test_callback_gauges_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    depth = [3]
+    registry.gauge("depth", "Depth.", fn=lambda: depth[0])
+    registry.gauge("unknown", "Skipped when None.", fn=lambda: None)
+    registry.gauge("phases", "Phases.", ["phase"], fn=lambda: {("load",): 1.5})
+
+    assert "depth 3\n" in registry.render()
+    depth[0] = 0
+    text = registry.render()
+    assert "depth 0\n" in text
+    assert "# TYPE unknown gauge\n# HELP" in text
+    assert 'phases{phase="load"} 1.5' in text
+
+
+def test_counters_are_thread_safe():
+    counter = MetricsRegistry().counter("c", "C.")
+
+    def work():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value() == 40000
@@ -1,6 +1,9 @@
+import io
 import os
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+import numpy as np
+import soundfile as sf
+from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 
 
@@ -11,32 +14,70 @@ def test_hf_hub_offline_env():
     assert os.environ.get("HF_HUB_OFFLINE") is None
 
 
+def make_model():
+    mock_model = MagicMock()
+    mock_model.sample_rate = 24000
+    mock_model.generate.side_effect = lambda **kwargs: iter(
+        [MagicMock(audio=np.linspace(-0.5, 0.5, 2400, dtype=np.float32))]
+    )
+    return mock_model
+
+
 @patch("tts_server.load_model")
-@patch("tts_server.generate_audio")
 @patch("pathlib.Path.glob")
-@patch("builtins.open", new_callable=mock_open, read_data=b"fake audio")
-def test_synthesize_endpoint_calls_generate(
-    mock_file, mock_glob, mock_generate, mock_load
-):
-    import tts_server
+@patch("os.remove")
+def test_synthesize_endpoint_calls_generate(mock_remove, mock_glob, mock_load):
     from tts_server import app
 
-    # Mock model
-    mock_model = MagicMock()
+    mock_model = make_model()
     mock_load.return_value = mock_model
 
-    # Mock glob to return a Path-like object
-    mock_path = MagicMock()
-    mock_path.name = "gen_123.wav"
-    mock_glob.return_value = [mock_path]
-
     # Mock the global model_instance
     with patch("tts_server.model_instance", mock_model):
         client = TestClient(app)
         payload = {"text": "test text", "output_path": "/tmp", "file_prefix": "prefix"}
-        # We need to ensure the executor finishes. TestClient should handle this.
         response = client.post("/generate", json=payload)
 
         assert response.status_code == 200
-        assert response.content == b"fake audio"
-        assert mock_generate.called
+        assert response.headers["content-type"] == "audio/wav"
+        assert response.content[:4] == b"RIFF"
+        audio, sample_rate = sf.read(io.BytesIO(response.content))
+        assert sample_rate == 24000
+        assert len(audio) == 2400
+        assert mock_model.generate.call_args.kwargs["text"] == "test text"
+        assert mock_model.generate.call_args.kwargs["stream"] is False
+        # Nothing is written, scanned or deleted on disk.
+        assert not mock_glob.called
+        assert not mock_remove.called
+
+
+@pytest.mark.parametrize(
+    "accept,media_type,magic",
+    [
+        ("audio/flac", "audio/flac", b"fLaC"),
+        ("audio/ogg; codecs=opus", "audio/ogg; codecs=opus", b"OggS"),
+        ("audio/flac;q=0.5, audio/wav", "audio/wav", b"RIFF"),
+    ],
+)
+def test_synthesize_negotiates_format(accept, media_type, magic):
+    from tts_server import app
+
+    with patch("tts_server.model_instance", make_model()):
+        client = TestClient(app)
+        response = client.post(
+            "/generate", json={"text": "hi"}, headers={"Accept": accept}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == media_type
+        assert response.content[:4] == magic
+
+
+def test_synthesize_rejects_unsupported_format():
+    from tts_server import app
+
+    with patch("tts_server.model_instance", make_model()):
+        client = TestClient(app)
+        response = client.post(
+            "/generate", json={"text": "hi"}, headers={"Accept": "audio/mpeg"}
+        )
+        assert response.status_code == 406
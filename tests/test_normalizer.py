@@ -0,0 +1,96 @@
+import pytest
+
+from tts_engine.normalizer import (
+    RULES,
+    normalize_text,
+    number_words,
+    ordinal_words,
+    resolve_rules,
+    year_words,
+)
+
+
+def test_number_words():
+    assert number_words(0) == "zero"
+    assert number_words(42) == "forty-two"
+    assert number_words(1234) == "one thousand two hundred thirty-four"
+    assert number_words(-3) == "minus three"
+    assert ordinal_words(12) == "twelfth"
+    assert ordinal_words(21) == "twenty-first"
+    assert ordinal_words(40) == "fortieth"
+    assert year_words(1999) == "nineteen ninety-nine"
+    assert year_words(2024) == "twenty twenty-four"
+
+
+def test_bare_years_are_read_in_pairs():
+    assert normalize_text("Founded in 1999, sold in 2024.").text == (
+        "Founded in nineteen ninety-nine, sold in twenty twenty-four."
+    )
+    assert normalize_text("From 1900 to 2005.").text == (
+        "From nineteen hundred to two thousand five."
+    )
+    # Amounts, decimals and other magnitudes stay cardinal.
+    assert normalize_text("Pay $1999 for 2024.5 or 12000 units.").text == (
+        "Pay one thousand nine hundred ninety-nine dollars for two thousand "
+        "twenty-four point five or twelve thousand units."
+    )
+
+
+def test_markdown_becomes_sentences():
+    text = (
+        "# Release notes\n\n"
+        "- Fixed **crash** on [startup](https://example.com/a/b)\n"
+        "- Added `--fast` flag\n"
+    )
+    assert normalize_text(text).text == (
+        "Release notes.\n\nFixed crash on startup.\nAdded --fast flag."
+    )
+
+
+def test_code_and_tables_are_summarized():
+    code = "```python\nimport os\nprint(os.getcwd())\n```\nThat prints the cwd."
+    assert normalize_text(code).text == (
+        "(Python code, two lines.)\n\nThat prints the cwd."
+    )
+    table = "| Name | Qty |\n|---|---|\n| apples | 3 |\n| pears | 12 |\n"
+    assert normalize_text(table).text == "(Table with two rows: Name and Qty.)"
+
+
+def test_urls_are_reduced_to_their_host():
+    text = "See https://github.com/org/repo/issues/42?x=1 for details."
+    result = normalize_text(text)
+    assert result.text == "See github.com for details."
+    assert result.chars_saved == len(text) - len(result.text)
+    assert result.tokens_saved > 0
+
+
+def test_numbers_dates_and_abbreviations_are_spelled_out():
+    assert normalize_text("Meeting on 2024-03-05 at 3:05 pm.").text == (
+        "Meeting on March fifth, twenty twenty-four at three oh five p m."
+    )
+    assert normalize_text(
+        "Dr. Smith paid $3.5M, i.e. 12% more than No. 7 & the 2nd bid."
+    ).text == (
+        "Doctor Smith paid three point five million dollars, that is twelve "
+        "percent more than number seven and the second bid."
+    )
+    assert normalize_text("$0.99, $2.50 and 007").text == (
+        "ninety-nine cents, two dollars fifty cents and zero zero seven"
+    )
+
+
+def test_whitespace_is_collapsed():
+    assert normalize_text("lots    of\n\n\n spaces").text == "lots of\n\nspaces"
+
+
+def test_rules_can_be_toggled():
+    assert resolve_rules(None) == frozenset(RULES)
+    assert resolve_rules(False) == frozenset()
+    assert resolve_rules({"urls": True}, default=False) == {"urls"}
+    text = "Visit https://a.com/x on 2024-01-02"
+    assert normalize_text(text, resolve_rules({"urls": False})).text == (
+        "Visit https://a.com/x on January second, twenty twenty-four"
+    )
+    assert normalize_text("**Bold** 42", resolve_rules(False)).text == "**Bold** 42"
+    with pytest.raises(ValueError, match="Unknown normalization rule: emoji"):
+        resolve_rules({"emoji": True})
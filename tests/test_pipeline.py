@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from tts_engine.pipeline import Crossfader, synthesize_segments
+
+
+def test_crossfader_passes_single_segment_through():
+    fader = Crossfader(4)
+    chunks = [np.arange(3, dtype=np.float32), np.arange(3, 10, dtype=np.float32)]
+    out = [fader.feed(c) for c in chunks] + [fader.flush()]
+    np.testing.assert_array_equal(np.concatenate(out), np.arange(10))
+
+
+def test_crossfader_blends_seams():
+    fader = Crossfader(4)
+    out = [fader.feed(np.ones(10, dtype=np.float32))]
+    out.append(fader.end_segment())
+    out.append(fader.feed(np.full(2, 3.0, dtype=np.float32)))
+    out.append(fader.feed(np.full(8, 3.0, dtype=np.float32)))
+    out.append(fader.flush())
+    audio = np.concatenate(out)
+
+    # The seam overlaps by the fade length.
+    assert len(audio) == 10 + 10 - 4
+    seam = audio[6:10]
+    np.testing.assert_allclose(seam[[0, -1]], [1.0, 3.0], atol=1e-6)
+    assert np.all(seam[1:3] > 1.0)
+    np.testing.assert_array_equal(audio[10:], np.full(6, 3.0))
+
+
+def test_crossfader_without_fade_is_passthrough():
+    fader = Crossfader(0)
+    chunk = np.ones(5, dtype=np.float32)
+    assert fader.feed(chunk) is chunk
+    assert len(fader.end_segment()) == 0
+
+
+class RecordingSubmit:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, kwargs):
+        text = kwargs["text"]
+        self.events.append(("submit", text))
+
+        def chunks():
+            for i in range(2):
+                self.events.append(("chunk", text, i))
+                yield np.full(5, len(text), dtype=np.float32)
+
+        return chunks()
+
+
+def test_next_segment_is_queued_once_audio_starts():
+    submit = RecordingSubmit()
+    out = list(synthesize_segments(submit, ["a", "bb", "ccc"], {"speed": 1.0}))
+
+    assert submit.events[:3] == [
+        ("submit", "a"),
+        ("chunk", "a", 0),
+        ("submit", "bb"),
+    ]
+    assert ("submit", "ccc") in submit.events
+    assert submit.events.index(("submit", "ccc")) > submit.events.index(
+        ("chunk", "bb", 0)
+    )
+    assert len(np.concatenate(out)) == 30
+
+
+def test_eager_submits_every_segment_up_front():
+    submit = RecordingSubmit()
+    out = list(
+        synthesize_segments(submit, ["a", "bb", "ccc"], {}, fade_samples=2, eager=True)
+    )
+    assert [e for e in submit.events[:3]] == [
+        ("submit", "a"),
+        ("submit", "bb"),
+        ("submit", "ccc"),
+    ]
+    assert len(np.concatenate(out)) == 30 - 2 * 2
+
+
+def test_shared_kwargs_are_passed_per_segment():
+    seen = []
+
+    def submit(kwargs):
+        seen.append(kwargs)
+        return iter([np.zeros(1, dtype=np.float32)])
+
+    list(synthesize_segments(submit, ["x", "y"], {"text": "full", "voice": "v"}))
+    assert [k["text"] for k in seen] == ["x", "y"]
+    assert all(k["voice"] == "v" for k in seen)
+
+
+def test_segment_source_is_polled_while_audio_plays():
+    submit = RecordingSubmit()
+    arrivals = {("chunk", "a", 1): "bb"}
+    ready = ["a"]
+    waits = []
+
+    def next_segment(wait):
+        # Text arrives as the pipeline plays earlier audio.
+        if submit.events and submit.events[-1] in arrivals:
+            ready.append(arrivals.pop(submit.events[-1]))
+        if ready:
+            return ready.pop(0)
+        if wait:
+            waits.append(len(submit.events))
+        return None
+
+    out = list(synthesize_segments(submit, next_segment, {}, fade_samples=2))
+
+    assert [e for e in submit.events if e[0] == "submit"] == [
+        ("submit", "a"),
+        ("submit", "bb"),
+    ]
+    # Queued while "a" was still playing; only the end waited for text.
+    assert submit.events.index(("submit", "bb")) < submit.events.index(
+        ("chunk", "bb", 0)
+    )
+    assert waits == [len(submit.events)]
+    assert len(np.concatenate(out)) == 20 - 2
+
+
+def test_failed_segment_cancels_the_segments_queued_behind_it():
+    submit = RecordingSubmit()
+
+    def submit_or_fail(kwargs):
+        chunks = submit(kwargs)
+        if kwargs["text"] != "bb":
+            return chunks
+
+        def fail():
+            yield next(chunks)
+            raise RuntimeError("generation failed")
+
+        return fail()
+
+    cancelled = []
+    audio = synthesize_segments(
+        submit_or_fail,
+        ["a", "bb", "ccc", "dddd"],
+        {},
+        eager=True,
+        cancel=lambda: cancelled.append(True),
+    )
+    with pytest.raises(RuntimeError, match="generation failed"):
+        list(audio)
+
+    assert cancelled == [True]
+    # Every segment was queued, but nothing after the failure was read.
+    assert ("submit", "dddd") in submit.events
+    assert [e[1] for e in submit.events if e[0] == "chunk"] == ["a", "a", "bb"]
+
+
+def test_finished_pipeline_does_not_cancel():
+    cancelled = []
+    submit = RecordingSubmit()
+    cancel = lambda: cancelled.append(True)  # noqa: E731
+    list(synthesize_segments(submit, ["a", "bb"], {}, eager=True, cancel=cancel))
+    assert cancelled == []
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+import pytest
+
+from tts_engine.ref_audio_cache import RefAudioCache
+
+
+@pytest.fixture
+def ref_files(tmp_path):
+    paths = []
+    for name in ("a.wav", "b.wav", "c.wav"):
+        path = tmp_path / name
+        path.write_bytes(b"riff")
+        paths.append(str(path))
+    return paths
+
+
+def counting_loader(calls, samples=100):
+    def load(path, sample_rate):
+        calls.append((path, sample_rate))
+        return np.zeros(samples, dtype=np.float32)
+
+    return load
+
+
+def test_repeat_requests_hit_the_cache(ref_files):
+    calls = []
+    cache = RefAudioCache(max_bytes=10_000, loader=counting_loader(calls))
+
+    first = cache.get(ref_files[0], 24000)
+    second = cache.get(ref_files[0], 24000)
+
+    assert first is second
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_sample_rate_and_mtime_are_part_of_the_key(ref_files):
+    calls = []
+    cache = RefAudioCache(max_bytes=10_000, loader=counting_loader(calls))
+
+    cache.get(ref_files[0], 24000)
+    cache.get(ref_files[0], 16000)
+    stat = os.stat(ref_files[0])
+    os.utime(ref_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    cache.get(ref_files[0], 24000)
+
+    assert len(calls) == 3
+
+
+def test_least_recently_used_entry_is_evicted(ref_files):
+    calls = []
+    # Each clip is 400 bytes; the budget holds two.
+    cache = RefAudioCache(max_bytes=800, loader=counting_loader(calls))
+
+    cache.get(ref_files[0], 24000)
+    cache.get(ref_files[1], 24000)
+    cache.get(ref_files[0], 24000)
+    cache.get(ref_files[2], 24000)
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 800
+
+    cache.get(ref_files[0], 24000)
+    assert cache.stats()["hits"] == 2
+    cache.get(ref_files[1], 24000)
+    assert cache.stats()["misses"] == 4
+
+
+def test_oversized_clips_are_not_cached(ref_files):
+    calls = []
+    cache = RefAudioCache(max_bytes=100, loader=counting_loader(calls))
+
+    cache.get(ref_files[0], 24000)
+    cache.get(ref_files[0], 24000)
+
+    assert len(calls) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_missing_file_raises(tmp_path):
+    cache = RefAudioCache(max_bytes=100, loader=counting_loader([]))
+    with pytest.raises(FileNotFoundError):
+        cache.get(str(tmp_path / "missing.wav"), 24000)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+from tts_engine.registry import ModelRegistry
+
+
+class FakeModel:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+
+
+SIZES = {"large": 60, "medium": 30, "small": 20}
+
+
+def make_registry(budget=100, pinned=()):
+    loaded = []
+
+    def load(model_id):
+        loaded.append(model_id)
+        return FakeModel(model_id, SIZES[model_id])
+
+    registry = ModelRegistry(
+        load, budget_bytes=budget, size_of=lambda m: m.size, pinned=pinned
+    )
+    return registry, loaded
+
+
+def test_models_are_loaded_once_and_reused():
+    registry, loaded = make_registry()
+    first = registry.get("small")
+    assert registry.get("small") is first
+    assert loaded == ["small"]
+    assert registry.stats()["loads"] == 1
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    registry, loaded = make_registry(budget=100)
+    registry.get("medium")
+    registry.get("small")
+    registry.get("medium")  # small is now least recently used
+    registry.get("large")
+
+    assert registry.resident() == ["medium", "large"]
+    stats = registry.stats()
+    assert stats["bytes"] == 90
+    assert stats["evictions"] == 1
+
+
+def test_pinned_models_survive_eviction():
+    registry, _ = make_registry(budget=70, pinned=["large"])
+    registry.add("large", FakeModel("large", 60))
+    registry.get("medium")
+
+    # Nothing unpinned can make room, so the new model stays over budget
+    # rather than evicting the pinned one.
+    assert registry.resident() == ["large", "medium"]
+    registry.get("small")
+    assert registry.resident() == ["large", "small"]
+
+
+def test_concurrent_requests_share_one_load():
+    calls = []
+
+    def slow_load(model_id):
+        calls.append(model_id)
+        time.sleep(0.05)
+        return FakeModel(model_id, 1)
+
+    registry = ModelRegistry(slow_load, size_of=lambda m: m.size)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get("small")))
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["small"]
+    assert len({id(m) for m in results}) == 1
+
+
+def test_unlimited_budget_never_evicts():
+    registry, _ = make_registry(budget=0)
+    for model_id in SIZES:
+        registry.get(model_id)
+    assert sorted(registry.resident()) == sorted(SIZES)
+    assert registry.evict("small")
+    assert not registry.evict("small")
@@ -0,0 +1,109 @@
+import threading
+
+from tts_engine.segmenter import (
+    TextStream,
+    estimate_tokens,
+    segment_text,
+    split_sentences,
+)
+
+
+def test_split_sentences_keeps_abbreviations():
+    text = "Dr. Smith met J. Doe, e.g. at noon. He said hi! Did you hear?"
+    assert split_sentences(text) == [
+        "Dr. Smith met J. Doe, e.g. at noon.",
+        "He said hi!",
+        "Did you hear?",
+    ]
+
+
+def test_split_sentences_handles_paragraphs_and_whitespace():
+    text = "First   line.\n\n\nSecond\nparagraph here."
+    assert split_sentences(text) == ["First line.", "Second paragraph here."]
+
+
+def test_first_segment_is_a_single_sentence():
+    text = "Short opener. " + "Then a longer follow up sentence. " * 3
+    segments = segment_text(text, max_tokens=80)
+    assert segments[0] == "Short opener."
+    assert len(segments) == 2
+    assert segments[1].count("follow up") == 3
+
+
+def test_segments_respect_token_cap():
+    text = "One sentence here. " * 40
+    segments = segment_text(text, max_tokens=20)
+    assert len(segments) > 1
+    assert all(estimate_tokens(s) <= 20 for s in segments)
+    assert " ".join(segments) == " ".join(text.split())
+
+
+def test_long_sentence_splits_at_clauses_then_words():
+    clause = "this clause keeps going for quite a while"
+    text = ", ".join([clause] * 6) + "."
+    segments = segment_text(text, max_tokens=15)
+    assert all(estimate_tokens(s) <= 15 for s in segments)
+    assert segments[0].endswith(",")
+    words = " ".join(segments).split()
+    assert words == text.split()
+
+
+def test_empty_text_has_no_segments():
+    assert segment_text("   \n\n  ") == []
+
+
+def committed(stream):
+    segments = []
+    while (segment := stream.next_segment(wait=False)) is not None:
+        segments.append(segment)
+    return segments
+
+
+def test_text_stream_commits_sentences_once_their_end_arrives():
+    stream = TextStream()
+    for delta in ["Hel", "lo there", ".", " Dr", ". Smith is ", "in", "!"]:
+        stream.write(delta)
+    # "Dr. " is not a boundary and "in!" may still continue.
+    assert committed(stream) == ["Hello there."]
+
+    stream.write(" Next")
+    assert committed(stream) == ["Dr. Smith is in!"]
+    stream.flush()
+    assert committed(stream) == ["Next"]
+
+
+def test_text_stream_packs_later_sentences_up_to_the_cap():
+    stream = TextStream(max_tokens=8)
+    stream.write("One. Two. Three. Four is a longer sentence.\n\nFive")
+    assert committed(stream) == ["One.", "Two. Three.", "Four is a longer sentence."]
+    stream.close()
+    assert committed(stream) == ["Five"]
+    assert stream.next_segment() is None
+
+
+def test_text_stream_cuts_runs_without_punctuation():
+    stream = TextStream(max_tokens=5)
+    stream.write("no punctuation arrives in this long run of wor")
+    segments = committed(stream)
+    assert segments and all(estimate_tokens(s) <= 5 for s in segments)
+    # The possibly partial last word is held back.
+    stream.write("ds")
+    stream.close()
+    assert committed(stream)[-1].endswith("words")
+
+
+def test_text_stream_wakes_waiting_readers():
+    stream = TextStream()
+    received = []
+    reader = threading.Thread(target=lambda: received.append(stream.next_segment()))
+    reader.start()
+    stream.write("Ready. ")
+    reader.join(timeout=5)
+    assert received == ["Ready."]
+
+    reader = threading.Thread(target=lambda: received.append(stream.next_segment()))
+    reader.start()
+    stream.write("Never finished")
+    stream.cancel()
+    reader.join(timeout=5)
+    assert received == ["Ready.", None]
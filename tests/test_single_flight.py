@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+from tts_engine.cancellation import CLIENT, Cancelled, CancelToken
+from tts_engine.single_flight import SingleFlight
+
+
+class Source:
+    """Counts generations and yields ``n`` numbered chunks, one per step."""
+
+    def __init__(self, n=5, step=0.0, fail_at=None):
+        self.n = n
+        self.step = step
+        self.fail_at = fail_at
+        self.started = 0
+        self.produced = 0
+        self.tokens = []
+
+    def __call__(self, token):
+        self.started += 1
+        self.tokens.append(token)
+        return self.run(token)
+
+    def run(self, token):
+        for i in range(self.n):
+            time.sleep(self.step)
+            token.check()
+            if i == self.fail_at:
+                raise ValueError("model failed")
+            self.produced += 1
+            yield i
+
+
+def test_late_subscriber_replays_then_follows_live():
+    source = Source()
+    flights = SingleFlight()
+    first, shared_first = flights.join("k", source)
+    assert [next(first), next(first)] == [0, 1]
+
+    second, shared_second = flights.join("k", source)
+
+    assert (shared_first, shared_second) == (False, True)
+    assert list(second) == [0, 1, 2, 3, 4]
+    assert list(first) == [2, 3, 4]
+    assert source.started == 1
+    assert source.produced == 5
+    assert len(flights) == 0
+
+
+def test_concurrent_subscribers_share_one_generation():
+    source = Source(n=10, step=0.01)
+    flights = SingleFlight()
+    results = []
+    readers = [flights.join("k", source)[0] for _ in range(4)]
+    threads = [
+        threading.Thread(target=lambda r=r: results.append(list(r))) for r in readers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == [list(range(10))] * 4
+    assert source.started == 1
+
+
+def test_different_keys_and_finished_flights_are_not_shared():
+    source = Source(n=2)
+    flights = SingleFlight()
+    assert list(flights.join("a", source)[0]) == [0, 1]
+    assert list(flights.join("a", source)[0]) == [0, 1]
+    b, shared = flights.join("b", source)
+    assert not shared
+    list(b)
+    assert source.started == 3
+
+
+def test_errors_reach_every_subscriber():
+    source = Source(fail_at=2)
+    flights = SingleFlight()
+    first, _ = flights.join("k", source)
+    second, _ = flights.join("k", source)
+    with pytest.raises(ValueError, match="model failed"):
+        list(first)
+    with pytest.raises(ValueError, match="model failed"):
+        list(second)
+    assert source.started == 1
+
+
+def test_cancelling_one_subscriber_leaves_the_generation_running():
+    source = Source()
+    flights = SingleFlight()
+    token = CancelToken()
+    first, _ = flights.join("k", source, token)
+    second, _ = flights.join("k", source)
+    next(first)
+
+    token.cancel(CLIENT)
+
+    with pytest.raises(Cancelled):
+        next(first)
+    assert list(second) == [0, 1, 2, 3, 4]
+    assert not source.tokens[0].cancelled
+
+
+def test_generation_stops_once_every_subscriber_is_gone():
+    source = Source(n=1000)
+    flights = SingleFlight()
+    token = CancelToken()
+    first, _ = flights.join("k", source, token)
+    second, _ = flights.join("k", source)
+    next(first)
+    next(second)
+
+    second.close()
+    assert not source.tokens[0].cancelled
+    token.cancel(CLIENT)
+
+    assert source.tokens[0].reason == CLIENT
+    with pytest.raises(Cancelled):
+        next(first)
+    # A new arrival starts afresh instead of joining the cancelled flight.
+    third, shared = flights.join("k", source)
+    assert not shared
+    assert next(third) == 0
+    assert source.started == 2
+
+
+def test_shared_deadline_is_the_latest_subscribers():
+    flights = SingleFlight()
+    source = Source()
+    flights.join("k", source, CancelToken(timeout=1))
+    flights.join("k", source, CancelToken(timeout=60))
+    assert source.started == 0
+    flight = flights._flights["k"]
+    assert flight.token.remaining() > 30
+    flights.join("k", source, CancelToken())
+    assert flight.token.deadline is None
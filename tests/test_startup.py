@@ -0,0 +1,60 @@
+import pytest
+
+from tts_engine.startup import (
+    IMPORTING,
+    PHASES,
+    READING_WEIGHTS,
+    StartupState,
+)
+
+
+def test_phases_are_timed_and_reported():
+    state = StartupState()
+    assert state.to_dict()["status"] == "pending"
+
+    state.start()
+    with state.phase(IMPORTING):
+        info = state.to_dict()
+        assert info["status"] == "loading"
+        assert info["phase"] == IMPORTING
+        assert info["progress"] == 0
+
+    info = state.to_dict()
+    assert info["phase"] is None
+    assert info["progress"] == pytest.approx(1 / len(PHASES), abs=1e-4)
+    assert list(info["phases"]) == [IMPORTING]
+
+    state.mark_ready()
+    assert state.wait(timeout=0)
+    assert state.to_dict()["status"] == "ready"
+    assert "importing" in state.summary()
+
+
+def test_failed_phase_stays_current():
+    state = StartupState()
+    state.start()
+    with pytest.raises(OSError):
+        with state.phase(READING_WEIGHTS):
+            raise OSError("missing weights")
+    state.mark_failed(OSError("missing weights"))
+
+    info = state.to_dict()
+    assert info["status"] == "failed"
+    assert info["phase"] == READING_WEIGHTS
+    assert info["error"] == "missing weights"
+    assert READING_WEIGHTS not in info["phases"]
+
+
+def test_reset_clears_previous_run():
+    state = StartupState()
+    state.start()
+    state.mark_ready()
+    state.reset()
+    assert not state.wait(timeout=0)
+    assert state.to_dict() == {
+        "status": "pending",
+        "phase": None,
+        "progress": 0.0,
+        "elapsed_seconds": 0.0,
+        "phases": {},
+    }
@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+
+from tts_engine.synthesis_cache import SynthesisCache, cache_key, file_digest
+
+
+def tone(seconds=0.5, sample_rate=24000):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_cache_key_is_order_independent_and_parameter_sensitive():
+    a = cache_key({"text": "hi", "speed": 1.0, "voice": None})
+    b = cache_key({"voice": None, "speed": 1.0, "text": "hi"})
+    c = cache_key({"text": "hi", "speed": 1.1, "voice": None})
+    assert a == b
+    assert a != c
+
+
+def test_round_trip_and_counters(tmp_path):
+    cache = SynthesisCache(str(tmp_path), max_bytes=10_000_000)
+    assert cache.get("k") is None
+
+    cache.put("k", tone(), 24000)
+    audio, sample_rate = cache.get("k")
+
+    assert sample_rate == 24000
+    np.testing.assert_allclose(audio, tone(), atol=1e-5)
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+    assert os.path.exists(tmp_path / "k.flac")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    probe = SynthesisCache(str(tmp_path / "probe"), max_bytes=10_000_000)
+    probe.put("x", tone(), 24000)
+    entry_size = probe.stats()["bytes"]
+
+    cache = SynthesisCache(str(tmp_path / "c"), max_bytes=int(entry_size * 2.5))
+    cache.put("a", tone(), 24000)
+    cache.put("b", tone(), 24000)
+    cache.get("a")
+    cache.put("c", tone(), 24000)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+    assert not os.path.exists(tmp_path / "c" / "b.flac")
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    SynthesisCache(str(tmp_path), max_bytes=10_000_000).put("k", tone(), 24000)
+    reopened = SynthesisCache(str(tmp_path), max_bytes=10_000_000)
+    assert reopened.get("k") is not None
+
+
+def test_disabled_cache_touches_nothing(tmp_path):
+    cache = SynthesisCache(str(tmp_path / "off"), max_bytes=0)
+    cache.put("k", tone(), 24000)
+    assert cache.get("k") is None
+    assert not cache.stats()["enabled"]
+    assert not os.path.exists(tmp_path / "off")
+
+
+def test_file_digest_tracks_content(tmp_path):
+    path = tmp_path / "ref.wav"
+    path.write_bytes(b"one")
+    first = file_digest(str(path))
+    path.write_bytes(b"two!")
+    assert file_digest(str(path)) != first
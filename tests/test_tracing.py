@@ -0,0 +1,75 @@
+import json
+import time
+from types import SimpleNamespace
+
+from tts_engine.tracing import NULL_TRACE, Trace, Tracer
+
+
+def test_server_timing_sums_spans_per_stage():
+    trace = Trace("generate")
+    for _ in range(2):
+        with trace.span("encode"):
+            time.sleep(0.01)
+    with trace.span("cache"):
+        pass
+
+    header = trace.server_timing()
+    stages = dict(part.split(";dur=") for part in header.split(", "))
+    assert list(stages) == ["encode", "cache", "total"]
+    assert float(stages["encode"]) >= 20
+    assert float(stages["total"]) >= float(stages["encode"])
+
+
+def test_finished_tickets_become_queue_and_generate_spans():
+    trace = Trace("stream")
+    now = time.monotonic()
+    ticket = SimpleNamespace(
+        submitted_at=now,
+        started_at=now + 0.5,
+        finished_at=now + 2.0,
+        convert_seconds=0.1,
+    )
+    pending = SimpleNamespace(
+        submitted_at=now, started_at=None, finished_at=None, convert_seconds=0.0
+    )
+    assert trace.ticket(ticket) is ticket
+    trace.ticket(pending)
+    trace.finish()
+
+    totals = trace.totals()
+    assert round(totals["queue"], 3) == 0.5
+    assert round(totals["generate"], 3) == 1.5
+    assert round(totals["convert"], 3) == 0.1
+
+
+def test_chrome_trace_has_complete_events_and_thread_names():
+    trace = Trace("generate")
+    with trace.span("encode"):
+        pass
+    trace.add("generate", trace.started, trace.started + 0.002, "scheduler")
+
+    events = trace.to_chrome()["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    names = {e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert {e["name"] for e in spans} == {"encode", "generate"}
+    assert all(e["dur"] >= 0 for e in spans)
+    assert "scheduler" in names
+
+
+def test_tracer_only_traces_opted_in_or_sampled_requests(tmp_path):
+    tracer = Tracer()
+    assert tracer.start("stream") is NULL_TRACE
+    with NULL_TRACE.span("encode"):
+        pass
+
+    trace = tracer.start("stream", requested=True)
+    tracer.finish(trace)
+    assert tracer.get(trace.id) is trace
+    assert not list(tmp_path.iterdir())
+
+    sampling = Tracer(sample_rate=1.0, dump_dir=str(tmp_path))
+    sampled = sampling.start("generate")
+    assert sampled.sampled
+    sampling.finish(sampled)
+    dumped = json.loads((tmp_path / f"generate-{sampled.id}.json").read_text())
+    assert dumped["otherData"]["trace_id"] == sampled.id
@@ -0,0 +1,58 @@
+import numpy as np
+
+from tts_engine.trimming import SilenceTrimmer, drop_leading, trim_silence
+
+SR = 1000  # 10-sample frames, 30-sample pads
+
+
+def tone(n, level=0.5):
+    return np.full(n, level, np.float32)
+
+
+def silence(n):
+    return np.zeros(n, np.float32)
+
+
+def run(chunks, **kwargs):
+    out = list(trim_silence(chunks, SilenceTrimmer(SR, **kwargs)))
+    return np.concatenate(out) if out else np.zeros(0, np.float32)
+
+
+def test_drop_leading_spans_chunks():
+    chunks = [np.arange(3), np.arange(3, 5), np.arange(5, 9)]
+    out = np.concatenate(list(drop_leading(chunks, 6)))
+    np.testing.assert_array_equal(out, np.arange(6, 9))
+
+
+def test_trims_both_ends_keeping_pads():
+    audio = np.concatenate([silence(200), tone(100), silence(200)])
+    out = run(np.array_split(audio, 7))
+    assert len(out) == 30 + 100 + 30
+    np.testing.assert_array_equal(out[30:130], tone(100))
+
+
+def test_inner_pauses_are_kept():
+    audio = np.concatenate([tone(50), silence(120), tone(50)])
+    out = run(np.array_split(audio, 9))
+    np.testing.assert_array_equal(out, audio)
+
+
+def test_result_does_not_depend_on_chunking():
+    rng = np.random.default_rng(0)
+    audio = np.concatenate(
+        [silence(137), rng.normal(0, 0.3, 411).astype(np.float32), silence(93)]
+    )
+    whole = run([audio])
+    for parts in (2, 5, 17, 64):
+        np.testing.assert_array_equal(run(np.array_split(audio, parts)), whole)
+
+
+def test_only_quiet_audio_yields_nothing():
+    assert len(run([silence(500), tone(100, level=1e-4)])) == 0
+
+
+def test_silence_is_released_as_soon_as_speech_resumes():
+    trimmer = SilenceTrimmer(SR, pad_ms=0)
+    assert len(trimmer.feed(tone(20))) == 20
+    assert len(trimmer.feed(silence(40))) == 0
+    assert len(trimmer.feed(tone(20))) == 60
@@ -1,15 +1,33 @@
+import io
+import threading
+import time
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
+import numpy as np
+import soundfile as sf
 import tts_server
+from tts_engine import loader
+from tts_engine.batching import GenerationTicket
+from tts_engine.cancellation import ABANDONED
+from tts_engine.startup import IMPORTING, READING_WEIGHTS, WARMUP
 
 @pytest.fixture
-def client():
+def no_backend():
+    # Startup tests replace the model; skip importing mlx, which needs the
+    # real audio stack.
+    with patch("tts_server.import_backend") as import_backend:
+        yield import_backend
+
+
+@pytest.fixture
+def client(no_backend):
     # We want to avoid the lifespan logic during simple unit tests if possible,
     # or at least mock the model loading within it.
     with patch("tts_server.load_model") as mock_load:
         mock_load.return_value = MagicMock()
         with TestClient(tts_server.app) as c:
+            assert tts_server.startup.wait(timeout=30)
             yield c
 
 def test_health_check_ready(client):
@@ -17,20 +35,1008 @@ def test_health_check_ready(client):
     with patch("tts_server.model_instance", MagicMock()):
         response = client.get("/health")
         assert response.status_code == 200
-        assert response.json() == {"status": "ready", "model": tts_server.MODEL_ID}
+        body = response.json()
+        assert body["status"] == "ready"
+        assert body["model"] == tts_server.MODEL_ID
+        assert set(body["startup"]["phases"]) >= {IMPORTING, WARMUP}
 
 def test_health_check_not_ready():
     # Test without the client fixture to avoid lifespan loading the model
     # and ensuring model_instance is None
+    tts_server.startup.reset()
     with patch("tts_server.model_instance", None):
         client = TestClient(tts_server.app)
         response = client.get("/health")
         assert response.status_code == 503
-        assert response.json()["detail"] == "Model not loaded"
+        assert response.json()["detail"]["status"] in ("pending", "loading")
 
-def test_lifespan_loading():
+def test_lifespan_loading(no_backend):
     with patch("tts_server.load_model") as mock_load:
         mock_load.return_value = MagicMock()
         # Using TestClient as a context manager triggers lifespan events
         with TestClient(tts_server.app):
-            mock_load.assert_called_once_with(tts_server.MODEL_ID)
+            assert tts_server.startup.wait(timeout=30)
+            no_backend.assert_called_once_with()
+            mock_load.assert_called_once_with(
+                tts_server.MODEL_ID, phase=tts_server.startup.phase
+            )
+
+def test_startup_binds_before_model_is_loaded(no_backend):
+    release = threading.Event()
+    model = MagicMock()
+
+    def slow_load(model_id, phase):
+        with phase(READING_WEIGHTS):
+            release.wait(timeout=10)
+        return model
+
+    with patch("tts_server.load_model", side_effect=slow_load):
+        with TestClient(tts_server.app) as client:
+            response = client.get("/health")
+            assert response.status_code == 503
+            detail = response.json()["detail"]
+            assert detail["status"] == "loading"
+            assert detail["phase"] in (IMPORTING, READING_WEIGHTS)
+            assert detail["progress"] < 1
+
+            release.set()
+            assert tts_server.startup.wait(timeout=30)
+            response = client.get("/health")
+            assert response.status_code == 200
+            assert response.json()["startup"]["progress"] == 1
+
+    # The warm-up ran one short synthesis before the server reported ready.
+    model.generate.assert_called_once()
+    assert model.generate.call_args.kwargs["text"] == tts_server.WARMUP_TEXT
+
+def test_startup_failure_is_reported(no_backend):
+    def failing_load(model_id, phase):
+        with phase(READING_WEIGHTS):
+            raise RuntimeError("disk full")
+
+    with patch("tts_server.load_model", side_effect=failing_load):
+        with TestClient(tts_server.app) as client:
+            assert tts_server.startup.wait(timeout=30)
+            response = client.get("/health")
+            assert response.status_code == 503
+            detail = response.json()["detail"]
+            assert detail["status"] == "failed"
+            assert detail["phase"] == READING_WEIGHTS
+            assert detail["error"] == "disk full"
+
+def test_stream_runs_through_scheduler():
+    model = MagicMock()
+    model.sample_rate = 24000
+    model.generate.return_value = iter(
+        [MagicMock(audio=[0.0, 0.5]), MagicMock(audio=[1.0])]
+    )
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream",
+            json={"text": "hello", "output_path": "/tmp", "file_prefix": "p"},
+        )
+        assert response.status_code == 200
+        assert response.headers["x-format"] == "f32le"
+        assert response.content == np.array([0.0, 0.5, 1.0], np.float32).tobytes()
+        assert model.generate.call_args.kwargs["text"] == "hello"
+
+def test_clone_requests_reuse_cached_reference_audio(tmp_path):
+    ref = tmp_path / "voice.wav"
+    ref.write_bytes(b"riff")
+    model = MagicMock()
+    model.sample_rate = 24000
+    model.generate.side_effect = lambda **kwargs: iter([MagicMock(audio=[0.0])])
+    tts_server.ref_audio_cache.clear()
+    with patch("tts_server.model_instance", model), patch(
+        "tts_server.load_audio", return_value=np.zeros(10, np.float32)
+    ) as mock_load:
+        client = TestClient(tts_server.app)
+        payload = {"text": "hi", "ref_audio": str(ref), "ref_text": "hello"}
+        for _ in range(2):
+            assert client.post("/stream", json=payload).status_code == 200
+
+        assert mock_load.call_count == 1
+        stats = client.get("/cache/stats").json()["ref_audio"]
+        assert stats["hits"] >= 1
+
+def test_missing_reference_audio_is_rejected(tmp_path):
+    payload = {"text": "hi", "ref_audio": str(tmp_path / "gone.wav")}
+    with patch("tts_server.model_instance", cached_model()):
+        client = TestClient(tts_server.app)
+        for path in ("/stream", "/generate"):
+            response = client.post(path, json=payload)
+            assert response.status_code == 400
+            assert "Reference audio not found" in response.json()["detail"]
+
+def test_stream_synthesizes_sentence_by_sentence():
+    model = MagicMock()
+    model.sample_rate = 24000
+    model.generate.side_effect = lambda **kwargs: iter(
+        [MagicMock(audio=np.ones(2400, np.float32))]
+    )
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream", json={"text": "First sentence. Second one follows here."}
+        )
+        assert response.status_code == 200
+        texts = [c.kwargs["text"] for c in model.generate.call_args_list]
+        assert texts == ["First sentence.", "Second one follows here."]
+        # Two segments joined by a 20 ms crossfade.
+        assert len(response.content) == (2 * 2400 - 480) * 4
+
+@pytest.fixture
+def synthesis_cache(tmp_path):
+    from tts_engine.synthesis_cache import SynthesisCache
+
+    cache = SynthesisCache(str(tmp_path / "cache"), max_bytes=50 * 1024 * 1024)
+    with patch("tts_server.synthesis_cache", cache):
+        yield cache
+
+
+def cached_model():
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+    model.generate.side_effect = lambda **kwargs: iter(
+        [MagicMock(audio=np.full(2400, 0.25, np.float32))]
+    )
+    return model
+
+
+def test_generate_serves_repeats_from_cache(synthesis_cache):
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        first = client.post("/generate", json={"text": "Same  notification"})
+        second = client.post("/generate", json={"text": "Same notification"})
+
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert first.headers["etag"] == second.headers["etag"]
+        assert model.generate.call_count == 1
+
+        not_modified = client.post(
+            "/generate",
+            json={"text": "Same notification"},
+            headers={"If-None-Match": first.headers["etag"]},
+        )
+        assert not_modified.status_code == 304
+        assert model.generate.call_count == 1
+
+        other = client.post(
+            "/generate", json={"text": "Same notification", "speed": 1.2}
+        )
+        assert other.headers["x-cache"] == "MISS"
+        assert other.headers["etag"] != first.headers["etag"]
+
+        stats = client.get("/cache/stats").json()["synthesis"]
+        assert stats["hits"] == 1
+
+
+def test_wildcard_if_none_match_needs_cached_audio(synthesis_cache):
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        body = {"text": "Fresh notification"}
+        first = client.post("/generate", json=body, headers={"If-None-Match": "*"})
+        second = client.post("/generate", json=body, headers={"If-None-Match": "*"})
+
+    assert first.status_code == 200
+    assert first.headers["x-cache"] == "MISS"
+    assert second.status_code == 304
+    assert model.generate.call_count == 1
+
+
+def test_cache_key_covers_server_audio_settings():
+    req = tts_server.TtsRequest(text="Hello there.")
+    key = tts_server.request_key(req, "m")
+    for setting, value in [
+        ("TRIM_SILENCE", not tts_server.TRIM_SILENCE),
+        ("CROSSFADE_MS", tts_server.CROSSFADE_MS + 10),
+        ("SEGMENT_MAX_TOKENS", tts_server.SEGMENT_MAX_TOKENS + 10),
+    ]:
+        with patch(f"tts_server.{setting}", value):
+            assert tts_server.request_key(req, "m") != key
+    # An explicit trim flag does not depend on the server default.
+    explicit = req.model_copy(update={"trim_silence": True})
+    with patch("tts_server.TRIM_SILENCE", False):
+        off = tts_server.request_key(explicit, "m")
+    with patch("tts_server.TRIM_SILENCE", True):
+        assert tts_server.request_key(explicit, "m") == off
+
+
+def test_stream_replays_cached_audio(synthesis_cache):
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        first = client.post("/stream", json={"text": "Hello there"})
+        second = client.post("/stream", json={"text": "Hello there"})
+
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert model.generate.call_count == 1
+        replay = np.frombuffer(second.content, np.float32)
+        np.testing.assert_allclose(
+            replay, np.frombuffer(first.content, np.float32), atol=1e-5
+        )
+
+
+def test_cache_can_be_bypassed(synthesis_cache):
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        for _ in range(2):
+            client.post("/generate", json={"text": "hi", "cache": False})
+        assert model.generate.call_count == 2
+
+def test_requests_are_normalized_before_synthesis(synthesis_cache):
+    model = socket_model()
+    text = "See  https://example.com/very/long/path?id=abc now."
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        streamed = client.post("/stream", json={"text": text, "normalize": True})
+        generated = client.post(
+            "/generate", json={"text": text, "cache": False, "normalize": True}
+        )
+        some = client.post(
+            "/generate",
+            json={"text": text, "normalize": {"whitespace": True}, "cache": False},
+        )
+        raw = client.post("/generate", json={"text": text})
+        metrics = client.get("/metrics").text
+
+    assert model.texts[0] == "See example.com now."
+    assert model.texts[1] == model.texts[0]
+    assert model.texts[2] == "See https://example.com/very/long/path?id=abc now."
+    # Normalization is opt-in.
+    assert model.texts[3] == model.texts[2]
+    saved = int(streamed.headers["x-text-chars-saved"])
+    assert saved == len(text) - len(model.texts[0])
+    assert generated.headers["x-text-chars-saved"] == str(saved)
+    assert int(generated.headers["x-text-tokens-saved"]) > 0
+    assert some.headers["x-text-chars-saved"] == "1"
+    assert raw.headers["x-text-chars-saved"] == "0"
+    assert 'tts_text_chars_total{endpoint="stream",stage="input"}' in metrics
+
+
+def test_unknown_normalization_rule_is_rejected():
+    with patch("tts_server.model_instance", socket_model()):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/generate", json={"text": "hi", "normalize": {"emoji": True}}
+        )
+        empty = client.post("/generate", json={"text": "<br>", "normalize": True})
+    assert response.status_code == 400
+    assert "emoji" in response.json()["detail"]
+    assert empty.status_code == 400
+
+
+def test_stream_negotiates_compact_framed_format():
+    from tts_engine.wire import FRAME_AUDIO, FRAME_END, parse_frames
+
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream",
+            json={"text": "hi", "stream_format": "s16le", "framed": True},
+        )
+        assert response.status_code == 200
+        assert response.headers["x-format"] == "s16le"
+        assert response.headers["x-framing"] == "v1"
+        frames = parse_frames(response.content)
+        assert [f[0] for f in frames[:-1]] == [FRAME_AUDIO] * (len(frames) - 1)
+        assert frames[-1][0] == FRAME_END
+        assert sum(len(f[3]) for f in frames[:-1]) == 2400 * 2
+
+
+def test_stream_coalesces_model_steps():
+    from tts_engine.wire import parse_frames
+
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+    model.generate.side_effect = lambda **kwargs: iter(
+        [MagicMock(audio=np.full(480, 0.25, np.float32)) for _ in range(20)]
+    )
+    payload = {"text": "hi", "cache": False, "framed": True, "trim_silence": False}
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        each = client.post("/stream", json={**payload, "stream_coalesce_ms": 0})
+        coalesced = client.post("/stream", json={**payload, "stream_coalesce_ms": 100})
+        negative = client.post("/stream", json={**payload, "stream_coalesce_ms": -1})
+
+    each, coalesced = parse_frames(each.content), parse_frames(coalesced.content)
+    # 20 ms steps; at 100 ms the first goes out alone, then 5 per frame.
+    assert len(each) == 20 + 1
+    assert len(coalesced) == 1 + 4 + 1
+    assert b"".join(f[3] for f in each[:-1]) == b"".join(
+        f[3] for f in coalesced[:-1]
+    )
+    assert negative.status_code == 400
+
+
+def test_stream_error_is_signalled_in_framed_mode():
+    from tts_engine.wire import FRAME_ERROR, parse_frames
+
+    model = MagicMock()
+    model.sample_rate = 24000
+    model.generate.side_effect = RuntimeError("generation failed")
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post("/stream", json={"text": "hi", "framed": True})
+        frames = parse_frames(response.content)
+        assert frames[-1][0] == FRAME_ERROR
+
+
+def test_stream_rejects_unknown_format():
+    with patch("tts_server.model_instance", cached_model()):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream", json={"text": "hi", "stream_format": "mp3"}
+        )
+        assert response.status_code == 400
+
+def test_job_api_renders_items_against_resident_model():
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        created = client.post(
+            "/jobs",
+            json={"items": [{"text": "one"}, {"text": "two"}], "format": "flac"},
+        )
+        assert created.status_code == 202
+        job_id = created.json()["id"]
+
+        for _ in range(200):
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] == "done":
+                break
+            time.sleep(0.01)
+
+        assert job["completed"] == 2
+        assert all("generation_seconds" in item for item in job["items"])
+        result = client.get(f"/jobs/{job_id}/result/1")
+        assert result.status_code == 200
+        assert result.headers["content-type"] == "audio/flac"
+        assert result.content[:4] == b"fLaC"
+        assert client.get(f"/jobs/{job_id}/result/5").status_code == 404
+        assert client.get("/jobs/missing").status_code == 404
+
+
+def test_job_api_validates_input():
+    with patch("tts_server.model_instance", cached_model()):
+        client = TestClient(tts_server.app)
+        assert client.post("/jobs", json={"items": []}).status_code == 400
+        bad_format = {"items": [{"text": "hi"}], "format": "mp3"}
+        assert client.post("/jobs", json=bad_format).status_code == 400
+
+
+@pytest.fixture
+def model_registry():
+    loaded = []
+
+    def load(model_id):
+        loaded.append(model_id)
+        return cached_model()
+
+    registry = tts_server.ModelRegistry(load, pinned=[tts_server.MODEL_ID])
+    registry.loaded = loaded
+    with patch("tts_server.model_registry", registry):
+        yield registry
+
+
+def test_requests_can_pick_a_model(model_registry):
+    default = cached_model()
+    with patch("tts_server.model_instance", default):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/generate",
+            json={"text": "Quick read", "model": tts_server.FALLBACK_MODEL_ID},
+        )
+
+        assert response.status_code == 200
+        assert response.headers["x-model"] == tts_server.FALLBACK_MODEL_ID
+        assert model_registry.loaded == [tts_server.FALLBACK_MODEL_ID]
+        small = model_registry.peek(tts_server.FALLBACK_MODEL_ID)
+        assert small.generate.call_count == 1
+        assert default.generate.call_count == 0
+
+        response = client.post("/stream", json={"text": "Export"})
+        assert response.headers["x-model"] == tts_server.MODEL_ID
+        assert default.generate.call_count == 1
+
+
+def test_unknown_model_is_rejected(model_registry):
+    with patch("tts_server.model_instance", cached_model()):
+        client = TestClient(tts_server.app)
+        response = client.post("/generate", json={"text": "Hi", "model": "nope"})
+        assert response.status_code == 400
+        assert model_registry.loaded == []
+
+
+def test_deep_queue_falls_back_to_small_model(model_registry):
+    with patch("tts_server.model_instance", cached_model()), patch(
+        "tts_server.FALLBACK_QUEUE_DEPTH", 2
+    ):
+        req = tts_server.TtsRequest(text="Hi", voice="Ryan", instruct="Calm")
+        scheduler_type = type(tts_server.scheduler)
+        with patch.object(scheduler_type, "pending_count", new=1):
+            assert tts_server.select_model(req) == tts_server.MODEL_ID
+        with patch.object(scheduler_type, "pending_count", new=3):
+            assert tts_server.select_model(req) == tts_server.FALLBACK_MODEL_ID
+            # Exports and explicit choices keep their model.
+            assert tts_server.select_model(req, allow_fallback=False) == (
+                tts_server.MODEL_ID
+            )
+            pinned = tts_server.TtsRequest(text="Hi", model=tts_server.MODEL_ID)
+            assert tts_server.select_model(pinned) == tts_server.MODEL_ID
+
+
+def test_fallback_only_takes_requests_its_model_type_can_serve(model_registry):
+    with patch("tts_server.MODEL_ID", loader.DEFAULT_MODEL_ID), patch(
+        "tts_server.FALLBACK_MODEL_ID", loader.SMALL_MODEL_ID
+    ), patch("tts_server.FALLBACK_QUEUE_DEPTH", 2), patch.object(
+        type(tts_server.scheduler), "pending_count", new=3
+    ):
+        # The VoiceDesign default needs instruct, the CustomVoice fallback
+        # needs a speaker; only a request with a speaker can move over.
+        designed = tts_server.TtsRequest(text="Hi", instruct="A warm narrator")
+        assert tts_server.select_model(designed) == loader.DEFAULT_MODEL_ID
+        spoken = tts_server.TtsRequest(text="Hi", voice="Ryan", instruct="Warm")
+        assert tts_server.select_model(spoken) == loader.SMALL_MODEL_ID
+        # A model whose type is unknown is never a fallback.
+        with patch("tts_server.FALLBACK_MODEL_ID", "org/custom-tts"):
+            assert tts_server.select_model(spoken) == loader.DEFAULT_MODEL_ID
+
+
+def test_unloadable_fallback_uses_default_model():
+    def broken(model_id):
+        raise FileNotFoundError("not downloaded")
+
+    registry = tts_server.ModelRegistry(broken)
+    default = cached_model()
+    with patch("tts_server.model_instance", default), patch(
+        "tts_server.model_registry", registry
+    ), patch("tts_server.FALLBACK_QUEUE_DEPTH", 1), patch.object(
+        type(tts_server.scheduler), "pending_count", new=5
+    ):
+        client = TestClient(tts_server.app)
+        response = client.post("/generate", json={"text": "Hi"})
+        assert response.status_code == 200
+        assert response.headers["x-model"] == tts_server.MODEL_ID
+
+
+def test_metrics_cover_stream_and_generate():
+    model = cached_model()
+    stream_ok = tts_server.REQUESTS.value(endpoint="stream", outcome="ok")
+    generate_ok = tts_server.REQUESTS.value(endpoint="generate", outcome="ok")
+    rejected = tts_server.REQUESTS.value(endpoint="stream", outcome="rejected")
+    streamed = tts_server.BYTES_STREAMED.value(endpoint="stream")
+    waits = tts_server.QUEUE_WAIT.count()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        stream = client.post("/stream", json={"text": "hi", "cache": False})
+        client.post("/generate", json={"text": "hi", "cache": False})
+        client.post("/stream", json={"text": "hi", "stream_format": "mp3"})
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert tts_server.REQUESTS.value(endpoint="stream", outcome="ok") == stream_ok + 1
+    assert (
+        tts_server.REQUESTS.value(endpoint="generate", outcome="ok")
+        == generate_ok + 1
+    )
+    assert (
+        tts_server.REQUESTS.value(endpoint="stream", outcome="rejected")
+        == rejected + 1
+    )
+    assert tts_server.BYTES_STREAMED.value(endpoint="stream") == streamed + len(
+        stream.content
+    )
+    assert tts_server.QUEUE_WAIT.count() == waits + 2
+    assert tts_server.REQUESTS_IN_FLIGHT.value(endpoint="stream") == 0
+    text = response.text
+    for name in (
+        "tts_time_to_first_audio_seconds_bucket",
+        "tts_request_duration_seconds_count",
+        "tts_audio_seconds_total",
+        "tts_real_time_factor_bucket",
+        "tts_queued_generations",
+        "process_peak_resident_memory_bytes",
+    ):
+        assert name in text
+
+
+def test_metrics_count_stream_errors():
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+    model.generate.side_effect = RuntimeError("generation failed")
+    errors = tts_server.REQUESTS.value(endpoint="stream", outcome="error")
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        client.post("/stream", json={"text": "hi", "cache": False})
+    assert tts_server.REQUESTS.value(endpoint="stream", outcome="error") == errors + 1
+
+
+def test_traced_generate_returns_server_timing():
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        untraced = client.post("/generate", json={"text": "hi", "cache": False})
+        traced = client.post(
+            "/generate",
+            json={"text": "First one. Second one.", "cache": False},
+            headers={"X-Trace": "1"},
+        )
+
+    assert "server-timing" not in untraced.headers
+    stages = [p.split(";")[0] for p in traced.headers["server-timing"].split(", ")]
+    for stage in ("resolve_model", "segment", "queue", "generate", "encode"):
+        assert stage in stages
+    assert stages[-1] == "total"
+
+
+def test_traced_stream_is_available_after_it_ends():
+    model = cached_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream", json={"text": "hi", "cache": False}, headers={"X-Trace": "1"}
+        )
+        assert "resolve_model" in response.headers["server-timing"]
+        trace = client.get(f"/traces/{response.headers['x-trace-id']}").json()
+        assert client.get("/traces/unknown").status_code == 404
+
+    names = {e["name"] for e in trace["traceEvents"] if e["ph"] == "X"}
+    assert {"queue", "generate", "encode"} <= names
+    assert "generate;dur=" in trace["serverTiming"]
+
+
+def stepping_model(steps=200, step_seconds=0.01):
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+
+    def generate(**kwargs):
+        for _ in range(steps):
+            time.sleep(step_seconds)
+            yield MagicMock(audio=np.zeros(240, np.float32))
+
+    model.generate.side_effect = generate
+    return model
+
+
+def test_identical_overlapping_requests_share_one_generation(synthesis_cache):
+    model = stepping_model(steps=50)
+    responses = {}
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+
+        def post(name, path, body):
+            responses[name] = client.post(path, json=body)
+
+        body = {"text": "Same  notification", "trim_silence": False}
+        threads = [threading.Thread(target=post, args=("first", "/stream", body))]
+        threads[0].start()
+        deadline = time.monotonic() + 5
+        while not model.generate.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        threads += [
+            threading.Thread(
+                target=post,
+                args=("second", "/stream", dict(body, stream_format="s16le")),
+            ),
+            threading.Thread(target=post, args=("third", "/generate", body)),
+        ]
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        metrics = client.get("/metrics").text
+
+    assert model.generate.call_count == 1
+    first, second = responses["first"], responses["second"]
+    assert first.headers["x-coalesced"] == "0"
+    assert second.headers["x-coalesced"] == "1"
+    assert responses["third"].headers["x-coalesced"] == "1"
+    assert len(first.content) == 50 * 240 * 4
+    assert len(second.content) == 50 * 240 * 2
+    assert 'outcome="coalesced"' in metrics
+
+
+def test_delete_cancels_in_flight_generate():
+    model = stepping_model()
+    client_cancels = tts_server.CANCELLATIONS.value(reason="client")
+    running = tts_server.CANCELLED_GENERATIONS.value(state="running")
+    results = {}
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+
+        def post():
+            results["response"] = client.post(
+                "/generate",
+                json={"text": "hi", "cache": False},
+                headers={"X-Request-Id": "read-1"},
+            )
+
+        started = time.monotonic()
+        thread = threading.Thread(target=post)
+        thread.start()
+        deadline = time.monotonic() + 5
+        while not model.generate.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert client.delete("/requests/read-1").status_code == 200
+        thread.join(timeout=5)
+        elapsed = time.monotonic() - started
+
+        assert results["response"].status_code == 409
+        assert elapsed < 1.5
+        assert client.delete("/requests/read-1").status_code == 404
+    assert tts_server.CANCELLATIONS.value(reason="client") == client_cancels + 1
+    # The scheduler notices at the model's next step.
+    deadline = time.monotonic() + 5
+    while tts_server.CANCELLED_GENERATIONS.value(state="running") < running + 1:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_request_deadline_returns_504():
+    model = stepping_model()
+    deadlines = tts_server.CANCELLATIONS.value(reason="deadline")
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/generate", json={"text": "hi", "cache": False, "timeout": 0.1}
+        )
+    assert response.status_code == 504
+    assert tts_server.CANCELLATIONS.value(reason="deadline") == deadlines + 1
+
+
+def test_request_that_cannot_start_in_time_returns_504():
+    model = stepping_model()
+    deadlines = tts_server.CANCELLATIONS.value(reason="deadline")
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        busy = threading.Thread(
+            target=client.post,
+            args=("/generate",),
+            kwargs={
+                "json": {"text": "busy", "cache": False},
+                "headers": {"X-Request-Id": "busy"},
+            },
+        )
+        busy.start()
+        deadline = time.monotonic() + 5
+        while not model.generate.called:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        # The event loop is free while the model works.
+        assert client.get("/health").status_code == 200
+
+        started = time.monotonic()
+        response = client.post(
+            "/generate", json={"text": "late", "cache": False, "start_timeout": 0.1}
+        )
+        waited = time.monotonic() - started
+        client.delete("/requests/busy")
+        busy.join(timeout=5)
+
+    assert response.status_code == 504
+    assert waited < 1.0
+    assert model.generate.call_count == 1
+    assert tts_server.CANCELLATIONS.value(reason="deadline") == deadlines + 1
+
+
+def test_stream_reports_request_id():
+    with patch("tts_server.model_instance", cached_model()):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream", json={"text": "hi"}, headers={"X-Request-Id": "abc"}
+        )
+    assert response.headers["x-request-id"] == "abc"
+    assert len(tts_server.active_requests) == 0
+
+
+def padded_model(echo=0, silence=2400):
+    """Emits an echo of ``echo`` samples, then speech between silences."""
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+    audio = np.concatenate(
+        [
+            np.full(echo, 0.9, np.float32),
+            np.zeros(silence, np.float32),
+            np.full(4800, 0.25, np.float32),
+            np.zeros(silence, np.float32),
+        ]
+    )
+    model.generate.side_effect = lambda **kwargs: iter(
+        [MagicMock(audio=part) for part in np.array_split(audio, 4)]
+    )
+    return model
+
+
+def test_silence_is_trimmed_unless_disabled():
+    model = padded_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        trimmed = client.post("/stream", json={"text": "hi", "cache": False})
+        kept = client.post(
+            "/stream", json={"text": "hi", "cache": False, "trim_silence": False}
+        )
+    pad = int(24000 * 0.03)
+    assert len(trimmed.content) == (4800 + 2 * pad) * 4
+    assert len(kept.content) == (4800 + 2 * 2400) * 4
+
+
+def test_failed_segment_drops_the_segments_queued_behind_it():
+    tickets = []
+
+    def submit(kwargs, model=None, token=None, priority=None, start_by=None):
+        ticket = GenerationTicket(kwargs, model, token)
+        if not tickets:
+            ticket.finish(RuntimeError("generation failed"))
+        tickets.append(ticket)
+        return ticket
+
+    req = tts_server.TtsRequest(text="One. Two. Three.", cache=False)
+    with patch.object(tts_server.scheduler, "submit", submit), patch(
+        "tts_server.SEGMENT_MAX_TOKENS", 2
+    ):
+        audio = tts_server.synthesize_request(req, stream=False, model=cached_model())
+        with pytest.raises(RuntimeError, match="generation failed"):
+            list(audio)
+
+    # Each segment has its own token here; the queued ones were cancelled.
+    assert [t.token.reason for t in tickets] == [None, ABANDONED, ABANDONED]
+
+
+def test_prompt_echo_is_dropped_from_cloned_audio(tmp_path):
+    ref = tmp_path / "voice.wav"
+    ref.write_bytes(b"riff")
+    model = padded_model(echo=1200, silence=0)
+    tts_server.ref_audio_cache.clear()
+    with patch("tts_server.model_instance", model), patch(
+        "tts_server.load_audio", return_value=np.zeros(1200, np.float32)
+    ):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/generate",
+            json={
+                "text": "hi",
+                "ref_audio": str(ref),
+                "ref_text": "hello",
+                "trim_prompt_echo": True,
+                "cache": False,
+            },
+            headers={"Accept": "audio/wav"},
+        )
+    tts_server.ref_audio_cache.clear()
+    audio, _ = sf.read(io.BytesIO(response.content), dtype="float32")
+    assert len(audio) == 4800
+    assert np.all(np.abs(audio - 0.25) < 1e-3)
+
+
+def test_worker_path_downmixes_stereo_references(tmp_path):
+    ref = tmp_path / "voice.wav"
+    stereo = np.full((1200, 2), 0.1, np.float32)
+    stereo[:, 1] = 0.3
+    sf.write(str(ref), stereo, 24000)
+    with patch("tts_server.WORKERS", 2):
+        audio = tts_server.load_audio(str(ref), 24000)
+    # One channel, so the prompt echo is measured in frames, not samples.
+    assert audio.shape == (1200,)
+    assert np.allclose(audio, 0.2, atol=1e-3)
+
+
+@pytest.fixture
+def voice_store(tmp_path):
+    store = tts_server.VoiceStore(str(tmp_path / "voices"))
+    with patch("tts_server.voice_store", store):
+        yield store
+
+
+def wav_bytes(audio, rate):
+    buf = io.BytesIO()
+    sf.write(buf, audio, rate, format="WAV")
+    return buf.getvalue()
+
+
+def test_voices_are_ingested_and_used_for_cloning(voice_store):
+    model = padded_model()
+    t = np.arange(48000) / 48000
+    take = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    tts_server.ref_audio_cache.clear()
+    with patch("tts_server.model_instance", model), patch(
+        "tts_server.load_audio", return_value=np.zeros(10, np.float32)
+    ) as mock_load:
+        client = TestClient(tts_server.app)
+        created = client.post(
+            "/voices?name=Ada&transcript=Hello",
+            content=wav_bytes(take, 48000),
+        )
+        assert created.status_code == 201
+        voice = created.json()
+        assert voice["sample_rate"] == 24000
+        assert client.get("/voices").json()["voices"][0]["id"] == voice["id"]
+
+        response = client.post(
+            "/stream", json={"text": "hi", "voice_id": voice["id"], "cache": False}
+        )
+        assert response.status_code == 200
+        mock_load.assert_called_once_with(voice["path"], 24000)
+        kwargs = model.generate.call_args.kwargs
+        assert kwargs["ref_text"] == "Hello"
+
+        assert client.delete(f"/voices/{voice['id']}").status_code == 200
+        missing = client.post("/stream", json={"text": "hi", "voice_id": voice["id"]})
+        assert missing.status_code == 404
+    tts_server.ref_audio_cache.clear()
+
+
+def test_unusable_voice_uploads_are_rejected(voice_store):
+    model = padded_model()
+    with patch("tts_server.model_instance", model), patch(
+        "tts_server.VOICE_MAX_MB", 1
+    ):
+        client = TestClient(tts_server.app)
+        silent = client.post("/voices", content=wav_bytes(np.zeros(48000), 24000))
+        assert silent.status_code == 422
+        assert silent.json()["detail"]["problems"] == ["recording is silent"]
+        assert client.post("/voices", content=b"not audio").status_code == 415
+        too_big = client.post("/voices", content=b"\0" * (1024 * 1024 + 1))
+        assert too_big.status_code == 413
+    assert voice_store.list() == []
+
+
+def socket_model(chunks=1, delay=0.0):
+    model = MagicMock(spec=["generate", "sample_rate"])
+    model.sample_rate = 24000
+    model.texts = []
+
+    def generate(**kwargs):
+        model.texts.append(kwargs["text"])
+        for _ in range(chunks):
+            time.sleep(delay)
+            yield MagicMock(audio=np.full(2400, 0.25, np.float32))
+
+    model.generate.side_effect = generate
+    return model
+
+
+def receive_utterance(ws):
+    from tts_engine.wire import FRAME_AUDIO, parse_frames
+
+    frames = []
+    while not frames or frames[-1][0] == FRAME_AUDIO:
+        frames.extend(parse_frames(ws.receive_bytes()))
+    return frames
+
+
+def test_ws_stream_speaks_sentences_before_the_text_is_complete():
+    from tts_engine.wire import FRAME_END, parse_frames
+
+    model = socket_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        with client.websocket_connect("/ws/stream") as ws:
+            ws.send_json({"type": "start", "stream_format": "s16le"})
+            ws.send_json({"type": "text", "text": "Hello there. How"})
+            started = ws.receive_json()
+            first = parse_frames(ws.receive_bytes())
+            # Audio for the first sentence while the second is unwritten.
+            assert model.texts == ["Hello there."]
+
+            ws.send_json({"type": "text", "text": " are you"})
+            ws.send_json({"type": "flush"})
+            ws.send_json({"type": "end"})
+            frames = first + receive_utterance(ws)
+
+    assert started["type"] == "started"
+    assert started["sample_rate"] == 24000 and started["format"] == "s16le"
+    assert model.texts == ["Hello there.", "How are you"]
+    assert [f[1] for f in frames] == list(range(len(frames)))
+    assert frames[-1][0] == FRAME_END
+    assert sum(len(f[3]) for f in frames[:-1]) == 2 * 2400 * 2
+
+
+def test_ws_stream_cancel_stops_the_utterance_but_not_the_socket():
+    from tts_engine.wire import FRAME_END, FRAME_ERROR
+
+    model = socket_model(chunks=100, delay=0.02)
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        with client.websocket_connect("/ws/stream") as ws:
+            ws.send_json({"type": "text", "text": "A long answer. "})
+            assert ws.receive_json()["type"] == "started"
+            ws.receive_bytes()
+            ws.send_json({"type": "cancel"})
+            cancelled = receive_utterance(ws)
+
+            model.generate.side_effect = socket_model().generate.side_effect
+            ws.send_json({"type": "text", "text": "Sorry, go ahead."})
+            ws.send_json({"type": "end"})
+            assert ws.receive_json()["type"] == "started"
+            after = receive_utterance(ws)
+
+    assert cancelled[-1][0] == FRAME_ERROR
+    assert sum(len(f[3]) for f in cancelled[:-1]) < 100 * 2400 * 4
+    assert after[-1][0] == FRAME_END
+
+
+def test_ws_stream_reports_bad_messages():
+    with patch("tts_server.model_instance", socket_model()):
+        client = TestClient(tts_server.app)
+        with client.websocket_connect("/ws/stream") as ws:
+            ws.send_text("not json")
+            assert "JSON" in ws.receive_json()["error"]
+            ws.send_json({"type": "start", "stream_format": "mp3"})
+            assert "stream formats" in ws.receive_json()["error"]
+            ws.send_json({"type": "shout"})
+            assert ws.receive_json() == {
+                "type": "error",
+                "error": "Unknown message type: shout",
+            }
+
+
+def test_ws_stream_normalizes_each_segment():
+    model = socket_model()
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        with client.websocket_connect("/ws/stream") as ws:
+            ws.send_json({"type": "start", "normalize": True})
+            ws.send_json({"type": "text", "text": "It costs **$5**. "})
+            ws.send_json({"type": "text", "text": "`---`"})
+            ws.send_json({"type": "end"})
+            assert ws.receive_json()["type"] == "started"
+            receive_utterance(ws)
+
+    assert model.texts == ["It costs five dollars.", "---"]
+
+
+def test_document_sessions_read_paragraphs_ahead(synthesis_cache):
+    model = socket_model()
+    text = "# Chapter one\n\nIt cost $5.\n\nThe end."
+    with patch("tts_server.model_instance", model):
+        client = TestClient(tts_server.app)
+        created = client.post(
+            "/documents",
+            json={"text": text, "read_ahead": 1, "cache": False, "normalize": True},
+        )
+        assert created.status_code == 201
+        doc = created.json()
+        assert doc["total"] == 3
+        deadline = time.monotonic() + 5
+        while client.get(f"/documents/{doc['id']}").json()["paragraphs"][1][
+            "state"
+        ] != "ready":
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        first = client.get(f"/documents/{doc['id']}/paragraphs/0")
+        last = client.get(f"/documents/{doc['id']}/paragraphs/2")
+        missing = client.get(f"/documents/{doc['id']}/paragraphs/3")
+        assert client.delete(f"/documents/{doc['id']}").status_code == 200
+        gone = client.get(f"/documents/{doc['id']}")
+
+    assert model.texts[:2] == ["Chapter one.", "It cost five dollars."]
+    assert "The end." in model.texts
+    assert first.headers["x-read-ahead"] == "ready"
+    assert last.headers["x-read-ahead"] in ("pending", "running", "ready")
+    assert len(first.content) == 2400 * 4
+    assert len(last.content) == 2400 * 4
+    assert missing.status_code == 404
+    assert gone.status_code == 404
+
+
+def test_document_requests_are_validated():
+    with patch("tts_server.model_instance", socket_model()):
+        client = TestClient(tts_server.app)
+        empty = client.post("/documents", json={"text": "\n\n"})
+        negative = client.post("/documents", json={"text": "Hi.", "read_ahead": -1})
+        unknown = client.get("/documents/nope")
+    assert empty.status_code == 400
+    assert negative.status_code == 400
+    assert unknown.status_code == 404
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tts_engine import voices
+from tts_engine.voices import (
+    AudioStats,
+    VoiceRejected,
+    VoiceStore,
+    is_voice_file,
+    load_voice,
+)
+
+
+def speech(seconds, rate, level=0.1, noise=0.0, seed=0):
+    """A tone between silences, with optional background noise."""
+    t = np.arange(int(seconds * rate)) / rate
+    audio = level * np.sin(2 * np.pi * 220 * t)
+    pad = np.zeros(rate // 4)
+    audio = np.concatenate([pad, audio, pad])
+    rng = np.random.default_rng(seed)
+    return (audio + noise * rng.standard_normal(len(audio))).astype(np.float32)
+
+
+def write(tmp_path, audio, rate, name="take.wav"):
+    path = tmp_path / name
+    sf.write(path, audio, rate)
+    return str(path)
+
+
+def test_stats_match_whole_signal_across_blocks():
+    rate = 1000
+    audio = speech(2, rate, level=0.5)
+    stats = AudioStats(rate)
+    for block in np.array_split(audio, 7):
+        stats.feed(block)
+    summary = stats.summary()
+    assert summary["duration"] == len(audio) / rate
+    assert summary["peak_db"] == pytest.approx(20 * np.log10(0.5), abs=0.1)
+    assert summary["speech_ratio"] == pytest.approx(2 / 2.5, abs=0.05)
+    assert summary["clipped_ratio"] == 0
+
+
+def test_ingest_resamples_trims_and_normalizes(tmp_path):
+    store = VoiceStore(str(tmp_path / "voices"))
+    source = write(tmp_path, speech(2, 48000, level=0.05), 48000)
+
+    voice = store.ingest(source, 24000, name="Ada", transcript="Hello there.")
+
+    assert voice["name"] == "Ada"
+    assert voice["source_sample_rate"] == 48000
+    assert voice["warnings"] == []
+    assert is_voice_file(voice["path"])
+    info = sf.info(voice["path"])
+    assert (info.samplerate, info.channels, info.subtype) == (24000, 1, "PCM_16")
+    # Leading and trailing quarter seconds of silence are trimmed to pads.
+    assert voice["duration"] == pytest.approx(2.06, abs=0.02)
+    audio = load_voice(voice["path"], 24000)
+    speech_db = 10 * np.log10(np.mean(audio[audio != 0] ** 2))
+    assert speech_db == pytest.approx(-20, abs=1)
+    assert store.get(voice["id"])["transcript"] == "Hello there."
+
+
+def test_peaks_cap_normalization_gain(tmp_path):
+    store = VoiceStore(str(tmp_path))
+    audio = speech(2, 16000, level=0.01)
+    audio[16000] = 0.5  # One loud transient.
+    voice = store.ingest(write(tmp_path, audio, 16000), 16000)
+    peak = np.max(np.abs(load_voice(voice["path"], 16000)))
+    assert peak == pytest.approx(10 ** (-1 / 20), abs=0.01)
+
+
+def test_stereo_uploads_are_mixed_to_mono(tmp_path):
+    store = VoiceStore(str(tmp_path))
+    mono = speech(2, 16000)
+    voice = store.ingest(write(tmp_path, np.stack([mono, mono], 1), 16000), 16000)
+    assert sf.info(voice["path"]).channels == 1
+
+
+def test_clipping_and_noise_are_flagged(tmp_path):
+    store = VoiceStore(str(tmp_path))
+    clipped = np.clip(speech(2, 16000, level=2.0), -1, 1)
+    assert store.ingest(write(tmp_path, clipped, 16000), 16000)["warnings"] == [
+        "clipping"
+    ]
+    noisy = speech(2, 16000, level=0.1, noise=0.03)
+    voice = store.ingest(write(tmp_path, noisy, 16000, "noisy.wav"), 16000)
+    assert "low_snr" in voice["warnings"]
+
+
+@pytest.mark.parametrize(
+    "audio, problem",
+    [
+        (np.zeros(32000, np.float32), "silent"),
+        (speech(0.3, 16000), "shorter"),
+    ],
+)
+def test_unusable_recordings_are_rejected(tmp_path, audio, problem):
+    store = VoiceStore(str(tmp_path / "voices"))
+    with pytest.raises(VoiceRejected) as e:
+        store.ingest(write(tmp_path, audio, 16000), 16000)
+    assert problem in str(e.value)
+    assert store.list() == []
+
+
+def test_long_recordings_are_rejected_while_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(voices, "MAX_SECONDS", 2.0)
+    monkeypatch.setattr(voices, "BLOCK_FRAMES", 8000)
+    store = VoiceStore(str(tmp_path / "voices"))
+    with pytest.raises(VoiceRejected) as e:
+        store.ingest(write(tmp_path, speech(10.0, 16000), 16000), 16000)
+    assert "longer than 2s" in str(e.value)
+    # Reading stopped at the first block past the limit.
+    assert e.value.analysis["duration"] == 2.5
+    assert store.list() == []
+
+
+def test_list_and_delete(tmp_path):
+    store = VoiceStore(str(tmp_path / "voices"))
+    source = write(tmp_path, speech(2, 16000), 16000)
+    first = store.ingest(source, 16000, name="a")
+    second = store.ingest(source, 16000, name="b")
+    assert [v["name"] for v in store.list()] == ["a", "b"]
+
+    assert store.delete(first["id"])
+    assert not store.delete(first["id"])
+    assert [v["id"] for v in store.list()] == [second["id"]]
+    assert store.get("../secrets") is None
+
+
+def test_load_voice_resamples_to_other_models(tmp_path):
+    store = VoiceStore(str(tmp_path))
+    voice = store.ingest(write(tmp_path, speech(2, 24000), 24000), 24000)
+    audio = load_voice(voice["path"], 16000)
+    assert audio.dtype == np.float32
+    assert len(audio) == pytest.approx(voice["duration"] * 16000, abs=2)
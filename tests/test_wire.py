@@ -0,0 +1,132 @@
+import io
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from tts_engine.wire import (
+    FRAME_AUDIO,
+    FRAME_END,
+    FRAME_ERROR,
+    POOL_SLOTS,
+    PcmPacker,
+    StreamEncoder,
+    encode_stream,
+    parse_frames,
+)
+
+
+def chunks(n=5, size=2400):
+    for i in range(n):
+        yield np.full(size, 0.1 * (i + 1), dtype=np.float32)
+
+
+def test_s16le_halves_the_bandwidth():
+    f32 = b"".join(encode_stream(chunks(), "f32le", 24000))
+    s16 = b"".join(encode_stream(chunks(), "s16le", 24000))
+    assert len(s16) * 2 == len(f32)
+    decoded = np.frombuffer(s16, "<i2")
+    assert decoded[0] == int(0.1 * 32767)
+
+
+def test_s16le_clips_out_of_range_samples():
+    data = StreamEncoder("s16le", 24000).encode(np.array([2.0, -2.0], np.float32))
+    assert list(np.frombuffer(data, "<i2")) == [32767, -32767]
+
+
+def test_opus_stream_decodes_as_ogg():
+    data = b"".join(encode_stream(chunks(10), "opus", 24000))
+    audio, sample_rate = sf.read(io.BytesIO(data))
+    assert data[:4] == b"OggS"
+    assert sample_rate == 24000
+    assert abs(len(audio) - 24000) < 2400
+    f32_size = 24000 * 4
+    assert len(data) < f32_size / 10
+
+
+def test_framed_stream_has_sequence_offsets_and_end_frame():
+    data = b"".join(encode_stream(chunks(3), "f32le", 24000, framed=True))
+    frames = parse_frames(data)
+
+    assert [f[0] for f in frames] == [FRAME_AUDIO] * 3 + [FRAME_END]
+    assert [f[1] for f in frames] == [0, 1, 2, 3]
+    assert [f[2] for f in frames] == [0, 2400, 4800, 7200]
+    assert json.loads(frames[-1][3]) == {"status": "ok", "samples": 7200}
+    assert len(frames[0][3]) == 2400 * 4
+
+
+def test_framed_stream_reports_errors():
+    def failing():
+        yield np.zeros(10, np.float32)
+        raise RuntimeError("model exploded")
+
+    frames = parse_frames(b"".join(encode_stream(failing(), "s16le", 24000, True)))
+    assert frames[-1][0] == FRAME_ERROR
+    assert json.loads(frames[-1][3])["error"] == "model exploded"
+
+
+def test_unframed_stream_ends_quietly_on_error():
+    def failing():
+        yield np.zeros(10, np.float32)
+        raise RuntimeError("boom")
+
+    assert b"".join(encode_stream(failing(), "f32le", 24000)) == bytes(40)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        StreamEncoder("mp3", 24000)
+
+
+@pytest.mark.parametrize("fmt", ["f32le", "s16le"])
+def test_pooled_pcm_matches_the_reference_encoder(fmt):
+    rng = np.random.default_rng(0)
+    audio = [rng.uniform(-1.5, 1.5, n).astype(np.float32) for n in (7, 2400, 300)]
+    expected = b"".join(StreamEncoder(fmt, 24000).encode(a) for a in audio)
+    assert b"".join(encode_stream(audio, fmt, 24000)) == expected
+    assert b"".join(encode_stream(audio, fmt, 24000, coalesce_ms=50)) == expected
+
+
+def test_small_steps_are_coalesced_after_the_first():
+    steps = (np.full(240, i / 100, np.float32) for i in range(40))
+    frames = parse_frames(
+        b"".join(encode_stream(steps, "f32le", 24000, framed=True, coalesce_ms=80))
+    )
+
+    audio = frames[:-1]
+    # 10 ms steps: the first goes out alone, then one frame per 80 ms.
+    assert [len(f[3]) // 4 for f in audio] == [240] + [1920] * 4 + [1680]
+    assert [f[2] for f in audio] == [0, 240, 2160, 4080, 6000, 7920]
+    assert json.loads(frames[-1][3])["samples"] == 9600
+    assert np.frombuffer(audio[1][3], np.float32)[0] == np.float32(0.01)
+
+
+def test_coalesced_audio_is_flushed_before_an_error_frame():
+    def failing():
+        yield np.zeros(100, np.float32)
+        yield np.ones(100, np.float32)
+        raise RuntimeError("boom")
+
+    frames = parse_frames(
+        b"".join(encode_stream(failing(), "f32le", 24000, True, coalesce_ms=80))
+    )
+    assert [f[0] for f in frames] == [FRAME_AUDIO, FRAME_AUDIO, FRAME_ERROR]
+    assert frames[1][2] == 100 and len(frames[1][3]) == 400
+
+
+def test_packer_reuses_buffers_only_once_views_are_released():
+    packer = PcmPacker("f32le")
+    owners = []
+    for i in range(2 * POOL_SLOTS):
+        block, _ = packer.add(np.full(10, i, np.float32))
+        owners.append(id(block.obj))
+        del block
+    # Released views: the same few buffers go round.
+    assert owners[:POOL_SLOTS] == owners[POOL_SLOTS:]
+
+    held = [packer.add(np.full(10, i, np.float32))[0] for i in range(2 * POOL_SLOTS)]
+    # Held views are never overwritten; their slots got new buffers.
+    assert [np.frombuffer(b, np.float32)[0] for b in held] == list(
+        range(2 * POOL_SLOTS)
+    )
@@ -0,0 +1,200 @@
+import os
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from tts_engine import workers
+from tts_engine.batching import BatchScheduler
+from tts_engine.workers import (
+    PooledModel,
+    WorkerCrashed,
+    WorkerError,
+    WorkerPool,
+    read_ring,
+)
+
+STUB = "test_workers:make_stub"
+
+
+class StubModel:
+    """Yields chunks tagged with the worker pid; some texts misbehave."""
+
+    sample_rate = 24000
+
+    def __init__(self, chunk, delay):
+        self.chunk = chunk
+        self.delay = delay
+
+    def generate(self, text, chunks=3, **kwargs):
+        if text == "crash":
+            os._exit(3)
+        if text == "boom":
+            raise ValueError("boom")
+        for i in range(chunks):
+            time.sleep(self.delay)
+            if text == "crash-midway" and i == 1:
+                os._exit(4)
+            if text == "hang-midway" and i == 1:
+                time.sleep(60)
+            audio = np.full(self.chunk, i, np.float32)
+            audio[0] = os.getpid()
+            yield SimpleNamespace(audio=audio)
+
+
+def make_stub(chunk=2400, delay=0.0):
+    return StubModel(chunk, delay)
+
+
+def broken_stub():
+    raise RuntimeError("no weights")
+
+
+@pytest.fixture
+def pool_factory(monkeypatch):
+    monkeypatch.setattr(workers, "MONITOR_INTERVAL_S", 0.05)
+    monkeypatch.setattr(workers, "MAX_RESTART_DELAY_S", 0.1)
+    pools = []
+
+    def make(size=1, factory=STUB, args=(), **kwargs):
+        pool = WorkerPool(size, factory, args=args, **kwargs)
+        pools.append(pool)
+        pool.start()
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def collect(model, **kwargs):
+    return [chunk.audio for chunk in model.generate(**kwargs)]
+
+
+def test_read_ring_wraps_around():
+    ring = np.arange(10, dtype=np.float32)
+    np.testing.assert_array_equal(read_ring(ring, 8, 4), [8, 9, 0, 1])
+    np.testing.assert_array_equal(read_ring(ring, 13, 2), [3, 4])
+
+
+def test_audio_round_trips_through_shared_memory(pool_factory):
+    # A 64 KiB ring holds 16384 samples; 10000-sample chunks wrap and the
+    # worker waits for the router to free space.
+    pool = pool_factory(args=(10000,), ring_bytes=64 * 1024)
+    pool.wait_ready(timeout=30)
+    model = PooledModel(pool)
+    assert model.sample_rate == 24000
+
+    audio = collect(model, text="hello", chunks=6)
+
+    assert sum(len(a) for a in audio) == 60000
+    samples = np.concatenate(audio)
+    for i in range(6):
+        np.testing.assert_array_equal(samples[i * 10000 + 1 : (i + 1) * 10000], i)
+
+
+def test_requests_spread_over_least_loaded_workers(pool_factory):
+    pool = pool_factory(size=2, args=(2400, 0.2))
+    pool.wait_ready(timeout=30)
+    while not all(w["state"] == "ready" for w in pool.stats()):
+        time.sleep(0.05)
+    model = PooledModel(pool)
+    scheduler = BatchScheduler(lambda _: model, max_batch_size=1, concurrency=2)
+
+    started = time.monotonic()
+    tickets = [scheduler.submit({"text": f"t{i}"}) for i in range(2)]
+    pids = {int(ticket.result()[0]) for ticket in tickets}
+    elapsed = time.monotonic() - started
+    scheduler.shutdown()
+
+    assert len(pids) == 2
+    # Two 0.6 s generations ran side by side.
+    assert elapsed < 1.1
+    assert [w["dispatched"] for w in pool.stats()] == [1, 1]
+
+
+def test_generation_errors_stay_in_the_worker(pool_factory):
+    pool = pool_factory()
+    pool.wait_ready(timeout=30)
+    model = PooledModel(pool)
+    with pytest.raises(WorkerError, match="ValueError: boom"):
+        collect(model, text="boom")
+    assert len(collect(model, text="fine")) == 3
+    assert pool.stats()[0]["restarts"] == 0
+
+
+def test_crashed_worker_restarts_and_unstarted_request_is_retried(pool_factory):
+    pool = pool_factory(size=2)
+    pool.wait_ready(timeout=30)
+    model = PooledModel(pool)
+
+    with pytest.raises(WorkerCrashed):
+        # Crashes on every worker it is tried on.
+        collect(model, text="crash")
+    with pytest.raises(WorkerCrashed):
+        # Audio was already delivered, so this is not retried.
+        collect(model, text="crash-midway")
+
+    assert len(collect(model, text="after")) == 3
+    assert sum(w["restarts"] for w in pool.stats()) == 3
+
+
+def test_stalled_worker_is_killed(pool_factory):
+    pool = pool_factory(stall_timeout=0.3)
+    pool.wait_ready(timeout=30)
+    model = PooledModel(pool)
+    started = time.monotonic()
+    with pytest.raises(WorkerCrashed):
+        collect(model, text="hang-midway")
+    assert time.monotonic() - started < 10
+    assert pool.stats()[0]["restarts"] == 1
+
+
+def test_closing_the_stream_cancels_in_the_worker(pool_factory):
+    pool = pool_factory(args=(2400, 0.05))
+    pool.wait_ready(timeout=30)
+    model = PooledModel(pool)
+
+    stream = model.generate(text="long", chunks=200)
+    next(stream)
+    stream.close()
+
+    # The worker is free again well before 200 chunks would have taken.
+    started = time.monotonic()
+    assert len(collect(model, text="next")) == 3
+    assert time.monotonic() - started < 2
+
+
+def test_startup_failure_is_reported(pool_factory):
+    pool = pool_factory(size=2, factory="test_workers:broken_stub")
+    with pytest.raises(RuntimeError, match="no weights"):
+        pool.wait_ready(timeout=30)
+    assert [w["state"] for w in pool.stats()] == ["failed", "failed"]
+
+
+def test_server_routes_requests_to_the_pool(pool_factory):
+    # Imported here: workers import this module, and should not pay for the
+    # server's imports.
+    from fastapi.testclient import TestClient
+
+    import tts_server
+
+    pool = pool_factory()
+    pool.wait_ready(timeout=30)
+    with patch("tts_server.worker_pool", pool), patch(
+        "tts_server.model_instance", PooledModel(pool)
+    ):
+        client = TestClient(tts_server.app)
+        response = client.post(
+            "/stream", json={"text": "hi", "cache": False, "trim_silence": False}
+        )
+        states = tts_server.worker_states()
+        metrics = client.get("/metrics").text
+
+    assert response.status_code == 200
+    assert len(response.content) == 3 * 2400 * 4
+    assert states == {("ready",): 1}
+    assert pool.stats()[0]["dispatched"] == 1
+    assert 'tts_workers{state="ready"} 1' in metrics
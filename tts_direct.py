@@ -1,11 +1,8 @@
 import argparse
-import os
-import sys
-from pathlib import Path
-import mlx.core as mx
+
 import soundfile as sf
-from mlx_audio.tts import utils
-from mlx_audio.tts.models.qwen3.qwen3 import Model, ModelConfig
+
+from tts_engine.loader import load_model
 
 
 def main():
@@ -19,11 +16,9 @@ def main():
     model_path = "./Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
 
     print(f"Loading model from {model_path} (non-strict)...")
-    # load_model internally handles the remapping if we updated config.json
-    model = utils.load_model(model_path, strict=False)
-
-    # Post load hook for tokenizer
-    model = model.__class__.post_load_hook(model, model_path)
+    # Non-strict: parameters missing from the checkpoint keep their init values.
+    model, stats = load_model(model_path, strict=False)
+    print(f"Loaded in {stats.seconds:.2f}s")
 
     print(f"Generating audio for: '{args.text}'...")
     results = model.generate(text=args.text, voice="default", verbose=True)
@@ -0,0 +1 @@
+"""Inference building blocks for the Qwen3 TTS sidecar server."""
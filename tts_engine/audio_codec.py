@@ -0,0 +1,80 @@
+"""In-memory audio encoding and ``Accept`` negotiation for ``/generate``."""
+
+import io
+from typing import Dict, NamedTuple, Optional
+
+import numpy as np
+import soundfile as sf
+
+
+class AudioFormat(NamedTuple):
+    name: str
+    media_type: str
+    container: str
+    subtype: str
+
+
+FORMATS: Dict[str, AudioFormat] = {
+    "wav": AudioFormat("wav", "audio/wav", "WAV", "PCM_16"),
+    "flac": AudioFormat("flac", "audio/flac", "FLAC", "PCM_16"),
+    "opus": AudioFormat("opus", "audio/ogg; codecs=opus", "OGG", "OPUS"),
+}
+
+DEFAULT_FORMAT = "wav"
+
+_MEDIA_TYPES = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/*": DEFAULT_FORMAT,
+    "*/*": DEFAULT_FORMAT,
+}
+
+
+def negotiate_format(accept: Optional[str]) -> Optional[str]:
+    """Picks the best supported format for an ``Accept`` header.
+
+    Args:
+        accept: Raw header value; empty or missing means the default format.
+
+    Returns:
+        A key of ``FORMATS``, or None when nothing acceptable is supported.
+    """
+    if not accept or not accept.strip():
+        return DEFAULT_FORMAT
+
+    best, best_q = None, 0.0
+    for item in accept.split(","):
+        parts = [p.strip() for p in item.split(";")]
+        media_type = parts[0].lower()
+        q = 1.0
+        for param in parts[1:]:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        fmt = _MEDIA_TYPES.get(media_type)
+        # Earlier entries win ties, matching the client's stated order.
+        if fmt is not None and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def encode_audio(audio: np.ndarray, sample_rate: int, fmt: str) -> bytes:
+    """Encodes mono float audio into a complete file held in memory."""
+    spec = FORMATS[fmt]
+    buffer = io.BytesIO()
+    sf.write(
+        buffer,
+        np.asarray(audio, dtype=np.float32),
+        sample_rate,
+        format=spec.container,
+        subtype=spec.subtype,
+    )
+    return buffer.getvalue()
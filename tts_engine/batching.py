@@ -0,0 +1,542 @@
+"""Dynamic batching scheduler in front of the resident TTS model.
+
+Requests are queued as tickets. A worker thread owns the model: it waits a
+short window for compatible tickets to pile up and runs them as one
+``batch_generate`` pass, routing each sequence's audio back to its ticket.
+A model that runs generations in parallel (a worker pool) gets one
+scheduler thread per concurrent generation.
+
+Tickets wait in priority lanes: a worker always starts the oldest ticket
+of the most urgent lane, so someone listening is not stuck behind bulk
+exports. A ticket may also carry a start deadline; if it cannot start in
+time it is dropped instead of producing audio nobody is waiting for.
+"""
+
+import inspect
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+
+from tts_engine.cancellation import DEADLINE, Cancelled, CancelToken
+
+logger = logging.getLogger("tts-server")
+
+# Generation arguments that may differ between sequences of one batch.
+PER_ITEM_KEYS = ("text", "voice", "instruct")
+
+# Values of model extras that leave the audio as if they were not passed,
+# for extras that ``generate`` does not declare itself: the defaults the
+# server builds requests with. ``batch_generate`` drops the extras it does
+# not take, so a ticket only batches while they have these values.
+EXTRA_DEFAULTS = {
+    "speed": 1.0,
+    "pitch": 1.0,
+    "gender": None,
+    "exaggeration": 1.0,
+    "cfg_scale": 1.0,
+    "ddpm_steps": 30,
+}
+
+_MISSING = object()
+
+_DONE = object()
+
+# Where a cancelled ticket was when it was stopped.
+QUEUED = "queued"
+RUNNING = "running"
+
+# Smoothing for the compute-per-character estimate of saved work.
+COST_SMOOTHING = 0.2
+
+# Priority lanes, most urgent first: audio someone is listening to, files
+# a client is waiting for, and work nobody is waiting for yet.
+INTERACTIVE = 0
+BULK = 1
+BACKGROUND = 2
+
+# A lane, or a callable asked for the current lane whenever the scheduler
+# picks the next batch.
+Priority = Union[int, Callable[[], int]]
+
+
+def _hashable(value: Any) -> Any:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        # Arrays (e.g. decoded reference audio) only batch with themselves.
+        return ("id", id(value))
+
+
+def batch_key(gen_kwargs: Dict[str, Any]) -> tuple:
+    """Returns the key that decides which requests can share a batch."""
+    shared = {k: v for k, v in gen_kwargs.items() if k not in PER_ITEM_KEYS}
+    return tuple(sorted((k, _hashable(v)) for k, v in shared.items()))
+
+
+def _is_default(value: Any, default: Any) -> bool:
+    if value is default:
+        return True
+    if default is _MISSING or isinstance(value, np.ndarray):
+        return False
+    try:
+        return bool(value == default)
+    except Exception:
+        return False
+
+
+def _declared_defaults(fn: Callable) -> Dict[str, Any]:
+    try:
+        params = inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return {}
+    return {
+        name: p.default for name, p in params.items() if p.default is not p.empty
+    }
+
+
+def to_float32(audio: Any) -> np.ndarray:
+    """Returns ``audio`` as float32, copying only if it is not already."""
+    return np.asarray(audio, dtype=np.float32)
+
+
+class GenerationTicket:
+    """Handle for one queued generation; iterate it to receive audio chunks."""
+
+    def __init__(
+        self,
+        gen_kwargs: Dict[str, Any],
+        model: Optional[str] = None,
+        token: Optional[CancelToken] = None,
+        priority: Priority = BULK,
+        start_by: Optional[float] = None,
+    ):
+        self.gen_kwargs = gen_kwargs
+        self.model = model
+        self.token = token if token is not None else CancelToken()
+        self.key = (model, batch_key(gen_kwargs))
+        self._priority = priority
+        # Monotonic time after which the ticket is dropped if not started.
+        self.start_by = start_by
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Time spent converting model output to float32 arrays.
+        self.convert_seconds = 0.0
+        # Set when cancelled: QUEUED or RUNNING, the generation time spent
+        # and the estimated time that was skipped.
+        self.cancel_state: Optional[str] = None
+        self.spent_seconds = 0.0
+        self.saved_seconds = 0.0
+        self._chunks: "queue.Queue[Any]" = queue.Queue()
+
+    @property
+    def queue_wait(self) -> Optional[float]:
+        """Seconds between submission and the start of generation."""
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    @property
+    def priority(self) -> int:
+        priority = self._priority
+        return priority() if callable(priority) else priority
+
+    def missed_start(self) -> bool:
+        """Whether the ticket is still waiting past its start deadline."""
+        return (
+            self.start_by is not None
+            and self.started_at is None
+            and time.monotonic() >= self.start_by
+        )
+
+    def _wait_timeout(self) -> Optional[float]:
+        timeout = self.token.remaining()
+        if self.start_by is not None and self.started_at is None:
+            until_start = max(0.0, self.start_by - time.monotonic())
+            timeout = until_start if timeout is None else min(timeout, until_start)
+        return timeout
+
+    def put(self, audio: np.ndarray) -> None:
+        if self.finished_at is None:
+            self._chunks.put(audio)
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Ends the ticket; only the first call has an effect."""
+        if self.finished_at is not None:
+            return
+        self.finished_at = time.monotonic()
+        self._chunks.put(error if error is not None else _DONE)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        while True:
+            try:
+                item = self._chunks.get(timeout=self._wait_timeout())
+            except queue.Empty:
+                # Past a deadline: cancelling wakes this loop with an error.
+                if self.missed_start():
+                    self.token.cancel(DEADLINE)
+                self.token.check()
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def result(self) -> np.ndarray:
+        """Blocks until generation ends and returns the joined audio."""
+        chunks = list(self)
+        if not chunks:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(chunks)
+
+
+class BatchScheduler:
+    """Collects compatible pending requests and runs them as one batch.
+
+    Args:
+        model_getter: Returns the model for a model id, where None means the
+            default model (or None when it is not loaded).
+        max_batch_size: Upper bound on sequences per forward pass.
+        max_wait: Seconds to wait for more requests once one is pending.
+        on_start: Called with each ticket as its generation starts.
+        on_cancel: Called with each ticket stopped by its cancel token.
+        concurrency: Batches run at the same time, each on its own thread.
+            Only models with a true ``concurrent`` attribute (a worker pool)
+            run batches in parallel; others still run one at a time.
+    """
+
+    def __init__(
+        self,
+        model_getter: Callable[[Optional[str]], Any],
+        max_batch_size: int = 4,
+        max_wait: float = 0.02,
+        on_start: Optional[Callable[[GenerationTicket], None]] = None,
+        on_cancel: Optional[Callable[[GenerationTicket], None]] = None,
+        concurrency: int = 1,
+    ):
+        self._model_getter = model_getter
+        self._on_start = on_start
+        self._on_cancel = on_cancel
+        # Generation seconds per input character, learned from completed
+        # tickets; used to estimate the work a cancellation skipped.
+        self.seconds_per_char: Optional[float] = None
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: List[GenerationTicket] = []
+        self._cond = threading.Condition()
+        self.concurrency = max(1, concurrency)
+        self._workers: List[threading.Thread] = []
+        self._model_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def submit(
+        self,
+        gen_kwargs: Dict[str, Any],
+        model: Optional[str] = None,
+        token: Optional[CancelToken] = None,
+        priority: Priority = BULK,
+        start_by: Optional[float] = None,
+    ) -> GenerationTicket:
+        """Queues a generation on ``model`` and returns its ticket.
+
+        Cancelling ``token`` drops the ticket if it is still queued, or
+        stops its generation at the next step. After :meth:`shutdown` the
+        ticket fails at once, as queued tickets did.
+
+        Args:
+            priority: The ticket's lane, INTERACTIVE, BULK or BACKGROUND.
+            start_by: Monotonic time by which generation must start. A
+                ticket that misses it, or is estimated to, cancels
+                ``token`` with reason DEADLINE.
+        """
+        ticket = GenerationTicket(
+            gen_kwargs, model=model, token=token, priority=priority, start_by=start_by
+        )
+        with self._cond:
+            if self._closed:
+                ticket.finish(RuntimeError("Scheduler shut down"))
+                return ticket
+            late = (
+                start_by is not None
+                and time.monotonic() + self._estimated_wait(ticket.priority)
+                > start_by
+            )
+            if not late:
+                self._pending.append(ticket)
+                self._ensure_worker()
+                self._cond.notify_all()
+        ticket.token.on_cancel(lambda: self._cancel(ticket))
+        if late:
+            logger.info("Dropping a generation that would start past its deadline")
+            ticket.token.cancel(DEADLINE)
+            self._record_cancel(ticket, QUEUED)
+        return ticket
+
+    def _estimated_wait(self, priority: int) -> float:
+        """Seconds of queued work that would run before a new ticket."""
+        if self.seconds_per_char is None:
+            return 0.0
+        chars = sum(
+            len(t.gen_kwargs.get("text", ""))
+            for t in self._pending
+            if t.priority <= priority
+        )
+        return chars * self.seconds_per_char / self.concurrency
+
+    def _cancel(self, ticket: GenerationTicket) -> None:
+        with self._cond:
+            queued = ticket in self._pending
+            if queued:
+                self._pending.remove(ticket)
+        if queued:
+            self._record_cancel(ticket, QUEUED)
+        # Wakes the consumer now; a running generation stops at its next step.
+        ticket.finish(Cancelled(ticket.token.reason))
+
+    def _record_cancel(self, ticket: GenerationTicket, state: str) -> None:
+        if ticket.cancel_state is not None:
+            return
+        ticket.cancel_state = state
+        if ticket.started_at is not None:
+            ticket.spent_seconds = time.monotonic() - ticket.started_at
+        if self.seconds_per_char is not None:
+            estimate = len(ticket.gen_kwargs.get("text", "")) * self.seconds_per_char
+            ticket.saved_seconds = max(0.0, estimate - ticket.spent_seconds)
+        if self._on_cancel is not None:
+            try:
+                self._on_cancel(ticket)
+            except Exception:
+                logger.exception("Ticket cancel callback failed")
+
+    def _learn_cost(self, seconds: float, chars: int) -> None:
+        if chars <= 0:
+            return
+        sample = seconds / chars
+        if self.seconds_per_char is None:
+            self.seconds_per_char = sample
+        else:
+            self.seconds_per_char += COST_SMOOTHING * (sample - self.seconds_per_char)
+
+    def start(self) -> None:
+        """Accepts tickets again after :meth:`shutdown`."""
+        with self._cond:
+            self._closed = False
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stops the worker; queued and later tickets are failed."""
+        with self._cond:
+            self._closed = True
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+            workers, self._workers = self._workers, []
+        for ticket in pending:
+            ticket.finish(RuntimeError("Scheduler shut down"))
+        for worker in workers:
+            worker.join(timeout=timeout)
+
+    def _ensure_worker(self) -> None:
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.concurrency:
+            worker = threading.Thread(
+                target=self._run, name="tts-batch-scheduler", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _next_batch(self) -> Optional[List[GenerationTicket]]:
+        with self._cond:
+            while True:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                for ticket in list(self._pending):
+                    if ticket.token.expired() or ticket.missed_start():
+                        ticket.token.cancel(DEADLINE)
+                if self._pending:
+                    break
+
+            # The oldest ticket of the most urgent lane; ties keep FIFO order.
+            key = min(self._pending, key=lambda t: t.priority).key
+            deadline = time.monotonic() + self.max_wait
+            while True:
+                batch = [t for t in self._pending if t.key == key]
+                batch.sort(key=lambda t: t.priority)
+                batch = batch[: self.max_batch_size]
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+                if self._closed:
+                    return None
+
+            self._pending = [t for t in self._pending if t not in batch]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._run_batch(batch)
+
+    def _run_batch(self, batch: List[GenerationTicket]) -> None:
+        for ticket in batch:
+            if ticket.token.cancelled:
+                self._record_cancel(ticket, QUEUED)
+        batch = [t for t in batch if t.cancel_state is None]
+        if not batch:
+            return
+        try:
+            model = self._model_getter(batch[0].model)
+        except Exception as e:
+            for ticket in batch:
+                ticket.finish(e)
+            return
+        if model is None:
+            for ticket in batch:
+                ticket.finish(RuntimeError("Model not loaded"))
+            return
+        # Only models that declare it run more than one batch at a time.
+        if getattr(model, "concurrent", False):
+            self._generate(model, batch)
+        else:
+            with self._model_lock:
+                self._generate(model, batch)
+
+    def _generate(self, model: Any, batch: List[GenerationTicket]) -> None:
+        batch_generate = getattr(model, "batch_generate", None)
+        batched = []
+        if len(batch) > 1 and callable(batch_generate):
+            batched = [t for t in batch if self._batchable(model, batch_generate, t)]
+        if len(batched) < 2:
+            batched = []
+        for ticket in batch:
+            if ticket not in batched:
+                self._run_single(model, ticket)
+        if batched:
+            self._generate_batch(batch_generate, batched)
+
+    @staticmethod
+    def _batchable(
+        model: Any, batch_generate: Callable, ticket: GenerationTicket
+    ) -> bool:
+        """Whether batching the ticket generates what ``generate`` would."""
+        supports = getattr(model, "supports_tts_batch", None)
+        if callable(supports):
+            try:
+                if not supports(**ticket.gen_kwargs):
+                    return False
+            except Exception:
+                return False
+        params = inspect.signature(batch_generate).parameters
+        if any(p.kind == p.VAR_KEYWORD for p in params.values()):
+            return True
+        defaults = {**EXTRA_DEFAULTS, **_declared_defaults(model.generate)}
+        return all(
+            _is_default(value, defaults.get(key, _MISSING))
+            for key, value in ticket.gen_kwargs.items()
+            if key not in PER_ITEM_KEYS and key not in params
+        )
+
+    def _generate_batch(
+        self, batch_generate: Callable, batch: List[GenerationTicket]
+    ) -> None:
+        logger.info(f"Running batched generation for {len(batch)} requests")
+        for ticket in batch:
+            self._start(ticket)
+        started = time.monotonic()
+        try:
+            kwargs = self._batch_kwargs(batch_generate, batch)
+            results = batch_generate(**kwargs)
+            for result in results:
+                ticket = batch[result.sequence_idx]
+                if not ticket.token.cancelled:
+                    self._put(ticket, result.audio)
+                    continue
+                self._record_cancel(ticket, RUNNING)
+                if all(t.token.cancelled for t in batch):
+                    for t in batch:
+                        self._record_cancel(t, RUNNING)
+                    getattr(results, "close", lambda: None)()
+                    return
+        except Exception as e:
+            for ticket in batch:
+                ticket.finish(e)
+            return
+        live = [t for t in batch if not t.token.cancelled]
+        if len(live) == len(batch):
+            chars = sum(len(t.gen_kwargs.get("text", "")) for t in batch)
+            self._learn_cost(time.monotonic() - started, chars)
+        for ticket in batch:
+            ticket.finish()
+
+    def _start(self, ticket: GenerationTicket) -> None:
+        ticket.started_at = time.monotonic()
+        if self._on_start is not None:
+            try:
+                self._on_start(ticket)
+            except Exception:
+                logger.exception("Ticket start callback failed")
+
+    @staticmethod
+    def _put(ticket: GenerationTicket, audio: Any) -> None:
+        started = time.monotonic()
+        converted = to_float32(audio)
+        ticket.convert_seconds += time.monotonic() - started
+        ticket.put(converted)
+
+    def _run_single(self, model: Any, ticket: GenerationTicket) -> None:
+        if ticket.token.cancelled:
+            self._record_cancel(ticket, QUEUED)
+            return
+        self._start(ticket)
+        try:
+            results = model.generate(**ticket.gen_kwargs)
+            for result in results:
+                # Each yielded chunk is a step boundary.
+                if ticket.token.cancelled:
+                    self._record_cancel(ticket, RUNNING)
+                    getattr(results, "close", lambda: None)()
+                    return
+                self._put(ticket, result.audio)
+        except Exception as e:
+            ticket.finish(e)
+            return
+        if ticket.token.cancelled:
+            # Cancelled after the last step; nothing was saved.
+            self._record_cancel(ticket, RUNNING)
+            return
+        self._learn_cost(
+            time.monotonic() - ticket.started_at,
+            len(ticket.gen_kwargs.get("text", "")),
+        )
+        ticket.finish()
+
+    @staticmethod
+    def _batch_kwargs(
+        batch_generate: Callable, batch: List[GenerationTicket]
+    ) -> Dict[str, Any]:
+        kwargs = {
+            k: v for k, v in batch[0].gen_kwargs.items() if k not in PER_ITEM_KEYS
+        }
+        # batch_generate has an explicit signature; drop model-specific extras
+        # (cfg_scale, ddpm_steps, ...) that only the per-item path accepts.
+        params = inspect.signature(batch_generate).parameters
+        if not any(p.kind == p.VAR_KEYWORD for p in params.values()):
+            kwargs = {k: v for k, v in kwargs.items() if k in params}
+        kwargs["texts"] = [t.gen_kwargs["text"] for t in batch]
+        kwargs["voices"] = [t.gen_kwargs.get("voice") for t in batch]
+        kwargs["instructs"] = [t.gen_kwargs.get("instruct") for t in batch]
+        return kwargs
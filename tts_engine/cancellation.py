@@ -0,0 +1,117 @@
+"""Cancellation tokens for in-flight generations.
+
+Every request carries a :class:`CancelToken`. The scheduler checks it at
+each generation step and drops queued work as soon as it is cancelled, so
+a stopped read releases the model for the next one right away.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Cancellation reasons.
+CLIENT = "client"
+DISCONNECTED = "disconnected"
+DEADLINE = "deadline"
+# Queued segments of a pipeline that stopped before reaching them.
+ABANDONED = "abandoned"
+
+
+class Cancelled(Exception):
+    """Raised to consumers of a generation that was cancelled."""
+
+    def __init__(self, reason: Optional[str]):
+        super().__init__(f"Generation cancelled ({reason})")
+        self.reason = reason
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with an optional deadline.
+
+    Args:
+        timeout: Seconds from now after which the token cancels itself with
+            reason ``DEADLINE``. The deadline is checked lazily, whenever
+            :attr:`cancelled` is read.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def cancel(self, reason: str = CLIENT) -> bool:
+        """Cancels the token; returns False if it was already cancelled."""
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+        return True
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self) -> bool:
+        if self.reason is None and self.expired():
+            self.cancel(DEADLINE)
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline, or None without one."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self) -> None:
+        """Raises :class:`Cancelled` if the token has been cancelled."""
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Runs ``callback`` on cancellation, or now if already cancelled."""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+
+class ActiveRequests:
+    """Tokens of in-flight requests, by request id.
+
+    Ids come from clients and need not be unique: requests sharing an id
+    are tracked side by side and cancelled together.
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, List[CancelToken]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, request_id: str, token: CancelToken) -> None:
+        with self._lock:
+            self._tokens.setdefault(request_id, []).append(token)
+
+    def unregister(self, request_id: str, token: CancelToken) -> None:
+        """Forgets ``token``; other requests with the same id stay in flight."""
+        with self._lock:
+            tokens = self._tokens.get(request_id, [])
+            if token in tokens:
+                tokens.remove(token)
+            if not tokens:
+                self._tokens.pop(request_id, None)
+
+    def cancel(self, request_id: str, reason: str = CLIENT) -> bool:
+        """Cancels the requests with an id; returns False if none is in flight."""
+        with self._lock:
+            tokens = list(self._tokens.get(request_id, []))
+        for token in tokens:
+            token.cancel(reason)
+        return bool(tokens)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(tokens) for tokens in self._tokens.values())
@@ -0,0 +1,277 @@
+"""Document sessions: long-form reading with server-side read-ahead.
+
+A client submits a whole document once and then asks for its paragraphs
+one at a time. While one plays, the server synthesizes up to
+``read_ahead`` following paragraphs, so the next one's audio is ready, or
+well under way, by the time it is asked for. Read-ahead only starts new
+work when the scheduler has nothing else queued, so it fills idle model
+time instead of delaying other requests.
+
+Asking for a paragraph moves the session's cursor there. Read-ahead that
+falls outside the new window, behind the cursor or too far ahead of it,
+is cancelled and its audio dropped.
+"""
+
+import logging
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tts_engine.cancellation import CLIENT, CancelToken
+from tts_engine.single_flight import Flight
+
+logger = logging.getLogger("tts-server")
+
+PENDING = "pending"
+RUNNING = "running"
+READY = "ready"
+FAILED = "failed"
+
+# How often read-ahead checks whether the model has become idle.
+IDLE_POLL_S = 0.05
+
+# start(session, paragraph, token) -> the audio chunks of the paragraph.
+Starter = Callable[["DocumentSession", "Paragraph", CancelToken], Iterable]
+
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """Splits text at blank lines, dropping empty paragraphs."""
+    paragraphs = (" ".join(p.split()) for p in _PARAGRAPH_BREAK_RE.split(text))
+    return [p for p in paragraphs if p]
+
+
+class Paragraph:
+    """One paragraph of a document and its audio, once started."""
+
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.text = text
+        self.flight: Optional[Flight] = None
+        # The read-ahead's subscription to ``flight``, while it has one.
+        self.read_ahead: Optional[CancelToken] = None
+
+    @property
+    def state(self) -> str:
+        flight = self.flight
+        if flight is None:
+            return PENDING
+        if not flight.done:
+            return RUNNING
+        return READY if flight.complete else FAILED
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"index": self.index, "chars": len(self.text), "state": self.state}
+
+
+class DocumentSession:
+    """A document being read, split into paragraphs, and its cursor."""
+
+    def __init__(self, paragraphs: List[str], options: Any, read_ahead: int):
+        self.id = uuid.uuid4().hex
+        self.options = options
+        self.read_ahead = max(0, read_ahead)
+        self.paragraphs = [Paragraph(i, text) for i, text in enumerate(paragraphs)]
+        self.cursor = 0
+        self.closed = False
+        self.used_at = time.monotonic()
+
+    def window(self) -> range:
+        """Paragraphs to have audio for: the cursor and read-ahead after it."""
+        end = min(len(self.paragraphs), self.cursor + self.read_ahead + 1)
+        return range(self.cursor, end)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "cursor": self.cursor,
+            "read_ahead": self.read_ahead,
+            "total": len(self.paragraphs),
+            "paragraphs": [p.to_dict() for p in self.paragraphs],
+        }
+
+
+class DocumentManager:
+    """Holds document sessions and reads ahead of their cursors.
+
+    A single background thread does the read-ahead, one paragraph at a
+    time, nearest to its session's cursor first.
+
+    Args:
+        start: Starts synthesizing a paragraph of a session, cancelled
+            through the given token.
+        idle: Whether the model has spare capacity for read-ahead.
+        max_sessions: Sessions kept before the least recently used closes.
+        ttl: Seconds a session may go unused before it closes.
+    """
+
+    def __init__(
+        self,
+        start: Starter,
+        idle: Callable[[], bool] = lambda: True,
+        max_sessions: int = 32,
+        ttl: float = 600.0,
+    ):
+        self._start = start
+        self._idle = idle
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, DocumentSession]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def create(self, paragraphs: List[str], options: Any, read_ahead: int):
+        session = DocumentSession(paragraphs, options, read_ahead)
+        with self._cond:
+            self._expire()
+            while len(self._sessions) >= self.max_sessions:
+                self._close(next(iter(self._sessions.values())))
+            self._sessions[session.id] = session
+            self._closed = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="tts-read-ahead", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+        logger.info(
+            f"Opened document {session.id} with {len(paragraphs)} paragraph(s)"
+        )
+        return session
+
+    def get(self, session_id: str) -> Optional[DocumentSession]:
+        with self._cond:
+            self._expire()
+            return self._sessions.get(session_id)
+
+    def play(
+        self,
+        session: DocumentSession,
+        index: int,
+        token: Optional[CancelToken] = None,
+    ) -> Tuple[Iterator, str]:
+        """Moves the cursor to paragraph ``index`` and returns its audio.
+
+        Returns:
+            The paragraph's chunks, from its start, and its state before
+            the call: READY or RUNNING when read-ahead got there first.
+
+        Raises:
+            KeyError: If the session was closed.
+        """
+        token = token or CancelToken()
+        with self._cond:
+            if session.closed:
+                raise KeyError(session.id)
+            session.used_at = time.monotonic()
+            self._sessions.move_to_end(session.id)
+            paragraph = session.paragraphs[index]
+            state = paragraph.state
+            session.cursor = index
+            for other in session.paragraphs:
+                if other.index not in session.window():
+                    self._discard(other)
+            flight = paragraph.flight
+            if flight is None or not (flight.joinable or flight.complete):
+                flight = self._new_flight(session, paragraph)
+                state = PENDING
+            flight.add(token)
+            self._cond.notify_all()
+        return flight.read(token), state
+
+    def close(self, session_id: str) -> bool:
+        """Closes a session, cancelling its read-ahead."""
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            self._close(session)
+            return True
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            for session in list(self._sessions.values()):
+                self._close(session)
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._sessions)
+
+    def _close(self, session: DocumentSession) -> None:
+        session.closed = True
+        del self._sessions[session.id]
+        for paragraph in session.paragraphs:
+            self._discard(paragraph)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        for session in list(self._sessions.values()):
+            if session.used_at < cutoff:
+                logger.info(f"Closing idle document {session.id}")
+                self._close(session)
+
+    def _discard(self, paragraph: Paragraph) -> None:
+        """Drops a paragraph's audio; a running read-ahead is cancelled."""
+        if paragraph.read_ahead is not None:
+            paragraph.read_ahead.cancel(CLIENT)
+            paragraph.read_ahead = None
+        # Playback already reading it keeps its own reference.
+        paragraph.flight = None
+
+    def _new_flight(self, session: DocumentSession, paragraph: Paragraph) -> Flight:
+        flight = Flight(
+            f"{session.id}/{paragraph.index}",
+            lambda token: self._start(session, paragraph, token),
+            CancelToken(),
+        )
+        paragraph.flight = flight
+        paragraph.read_ahead = None
+        return flight
+
+    def _next_paragraph(self) -> Optional[Tuple[Paragraph, Flight, CancelToken]]:
+        """Waits for a paragraph to read ahead and for the model to be idle."""
+        with self._cond:
+            while not self._closed:
+                candidates = [
+                    (index - session.cursor, -session.used_at, session, index)
+                    for session in self._sessions.values()
+                    for index in session.window()
+                    if session.paragraphs[index].flight is None
+                ]
+                if not candidates:
+                    self._cond.wait()
+                elif not self._idle():
+                    self._cond.wait(IDLE_POLL_S)
+                else:
+                    _, _, session, index = min(candidates, key=lambda c: c[:2])
+                    paragraph = session.paragraphs[index]
+                    flight = self._new_flight(session, paragraph)
+                    token = paragraph.read_ahead = CancelToken()
+                    flight.add(token)
+                    return paragraph, flight, token
+        return None
+
+    def _run(self) -> None:
+        while True:
+            work = self._next_paragraph()
+            if work is None:
+                return
+            paragraph, flight, token = work
+            try:
+                for _ in flight.read(token):
+                    # Submit the paragraph's next segment only when nothing
+                    # else is waiting for the model.
+                    while not self._idle() and not token.cancelled:
+                        time.sleep(IDLE_POLL_S)
+            except Exception as e:
+                logger.debug(f"Read-ahead of paragraph {paragraph.index} ended: {e}")
+            with self._cond:
+                if paragraph.read_ahead is token:
+                    paragraph.read_ahead = None
@@ -0,0 +1,311 @@
+"""Parallel, resumable, verified file downloads.
+
+Files download concurrently on a bounded thread pool into ``.incomplete``
+siblings. An interrupted transfer resumes with an HTTP Range request, both
+within a run (on retry) and across runs. Each file is hashed while it is
+written and checked against its expected digest before it is moved into
+place. Progress from all workers is added up and reported at a fixed rate.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from http.client import HTTPException
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+logger = logging.getLogger("tts-server")
+
+DEFAULT_WORKERS = 8
+CHUNK_BYTES = 1 << 20
+RETRIES = 3
+RETRY_BACKOFF_S = 1.0
+PROGRESS_INTERVAL_S = 0.5
+TIMEOUT_S = 30.0
+# Weight of the latest interval in the smoothed download rate.
+RATE_SMOOTHING = 0.15
+
+
+class RemoteFile(NamedTuple):
+    """A file to download.
+
+    ``sha256`` is checked when given; otherwise ``git_oid`` (the git blob
+    hash Hugging Face reports for files not stored in LFS) is.
+    """
+
+    path: str
+    url: str
+    size: int
+    sha256: Optional[str] = None
+    git_oid: Optional[str] = None
+
+
+class DownloadError(Exception):
+    """A file could not be downloaded or failed verification."""
+
+
+class Progress:
+    """Aggregates progress across concurrent downloads.
+
+    Workers call :meth:`add` for every block; a reporter thread calls
+    ``emit`` with the totals every ``interval`` seconds, so the event rate
+    does not depend on the number of workers or the block size.
+
+    Args:
+        total_bytes: Size of everything being downloaded.
+        emit: Receives progress dicts.
+        interval: Seconds between reports.
+    """
+
+    def __init__(
+        self,
+        total_bytes: int,
+        emit: Callable[[dict], None],
+        interval: float = PROGRESS_INTERVAL_S,
+    ):
+        self.total_bytes = total_bytes
+        self.emit = emit
+        self.interval = interval
+        self.downloaded = 0
+        self._active: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._rate: Optional[float] = None
+        self._last = (time.monotonic(), 0)
+        self._reported = None
+
+    def file_started(self, path: str, size: int) -> None:
+        with self._lock:
+            self._active[path] = [0, size]
+
+    def file_finished(self, path: str) -> None:
+        with self._lock:
+            self._active.pop(path, None)
+
+    def reset(self, path: str) -> None:
+        """Takes back the bytes counted so far for ``path``."""
+        with self._lock:
+            if path in self._active:
+                self.downloaded -= self._active[path][0]
+                self._active[path][0] = 0
+
+    def add(self, path: str, nbytes: int) -> None:
+        """Records ``nbytes`` for ``path``; negative when a transfer restarts."""
+        with self._lock:
+            self.downloaded += nbytes
+            if path in self._active:
+                self._active[path][0] += nbytes
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            downloaded = self.downloaded
+            # The file furthest from done is the one the user is waiting on.
+            current = max(
+                self._active.items(),
+                key=lambda item: item[1][1] - item[1][0],
+                default=None,
+            )
+        last_at, last_bytes = self._last
+        if now > last_at and downloaded > last_bytes:
+            rate = (downloaded - last_bytes) / (now - last_at)
+            self._rate = (
+                rate
+                if self._rate is None
+                else self._rate * (1 - RATE_SMOOTHING) + rate * RATE_SMOOTHING
+            )
+        self._last = (now, downloaded)
+        remaining = max(self.total_bytes - downloaded, 0)
+        snapshot = {
+            "percent": int(downloaded * 100 / self.total_bytes)
+            if self.total_bytes
+            else 100,
+            "downloadedBytes": downloaded,
+            "totalBytes": self.total_bytes,
+            "etaSeconds": int(remaining / self._rate) if self._rate else None,
+        }
+        if current is not None:
+            path, (done, size) = current
+            snapshot.update(
+                currentFile=path, currentFileBytes=done, currentFileTotal=size
+            )
+        return snapshot
+
+    def report(self) -> None:
+        """Emits the current totals unless nothing moved since the last report."""
+        snapshot = self.snapshot()
+        key = (snapshot["downloadedBytes"], snapshot.get("currentFile"))
+        if key != self._reported:
+            self._reported = key
+            self.emit(snapshot)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def __enter__(self) -> "Progress":
+        self._thread = threading.Thread(
+            target=self._run, name="download-progress", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.report()
+
+
+def _hasher(remote: RemoteFile):
+    if remote.sha256:
+        return hashlib.sha256(), remote.sha256
+    if remote.git_oid:
+        digest = hashlib.sha1(b"blob %d\0" % remote.size)
+        return digest, remote.git_oid
+    return None, None
+
+
+def _resume_state(remote: RemoteFile, partial: str):
+    """Returns (offset, hasher, expected) for an existing partial file."""
+    hasher, expected = _hasher(remote)
+    try:
+        offset = os.path.getsize(partial)
+    except OSError:
+        return 0, hasher, expected
+    if offset > remote.size:
+        os.remove(partial)
+        return 0, hasher, expected
+    if hasher is not None:
+        # Re-reading local bytes is far cheaper than downloading them again.
+        with open(partial, "rb") as f:
+            while block := f.read(CHUNK_BYTES):
+                hasher.update(block)
+    return offset, hasher, expected
+
+
+def _transfer(
+    remote: RemoteFile,
+    partial: str,
+    headers: Dict[str, str],
+    progress: Progress,
+) -> None:
+    offset, hasher, expected = _resume_state(remote, partial)
+    progress.add(remote.path, offset)
+    if offset < remote.size or not remote.size:
+        request_headers = dict(headers)
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+        request = urllib.request.Request(remote.url, headers=request_headers)
+        with urllib.request.urlopen(request, timeout=TIMEOUT_S) as response:
+            if offset and response.status != 206:
+                # The server ignored the range; start over.
+                logger.info(f"{remote.path}: server cannot resume, restarting")
+                progress.add(remote.path, -offset)
+                offset, hasher, expected = 0, *_hasher(remote)
+            with open(partial, "ab" if offset else "wb") as f:
+                while block := response.read(CHUNK_BYTES):
+                    f.write(block)
+                    if hasher is not None:
+                        hasher.update(block)
+                    progress.add(remote.path, len(block))
+
+    size = os.path.getsize(partial)
+    if size != remote.size:
+        raise DownloadError(
+            f"{remote.path}: expected {remote.size} bytes, got {size}"
+        )
+    if hasher is not None and hasher.hexdigest() != expected:
+        os.remove(partial)
+        raise DownloadError(f"{remote.path}: checksum mismatch")
+
+
+def download_file(
+    remote: RemoteFile,
+    dest: str,
+    headers: Optional[Dict[str, str]] = None,
+    progress: Optional[Progress] = None,
+    retries: int = RETRIES,
+) -> None:
+    """Downloads ``remote`` to ``dest``, resuming and verifying it.
+
+    Network errors and short reads are retried from where they stopped; a
+    checksum mismatch discards the partial file and retries from scratch.
+
+    Raises:
+        DownloadError: If the file still fails after ``retries`` retries.
+    """
+    progress = progress or Progress(remote.size, lambda _: None)
+    partial = f"{dest}.incomplete"
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    progress.file_started(remote.path, remote.size)
+    try:
+        for attempt in range(retries + 1):
+            try:
+                _transfer(remote, partial, headers or {}, progress)
+                break
+            except (DownloadError, HTTPException, OSError) as e:
+                # Bytes already on disk are counted again when the retry
+                # picks up the partial file.
+                progress.reset(remote.path)
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise DownloadError(f"{remote.path}: HTTP {e.code}") from e
+                if attempt == retries:
+                    raise DownloadError(f"{remote.path}: {e}") from e
+                logger.warning(f"{remote.path}: {e}; retrying")
+                time.sleep(RETRY_BACKOFF_S * 2**attempt)
+        os.replace(partial, dest)
+    finally:
+        progress.file_finished(remote.path)
+
+
+def download_all(
+    files: Iterable[RemoteFile],
+    dest_for: Callable[[RemoteFile], str],
+    headers: Optional[Dict[str, str]] = None,
+    progress: Optional[Progress] = None,
+    workers: int = DEFAULT_WORKERS,
+    retries: int = RETRIES,
+) -> None:
+    """Downloads ``files`` concurrently on at most ``workers`` threads.
+
+    Files whose destination already exists with the expected size are
+    skipped. The largest files start first so that a big shard is not left
+    running alone at the end. The first failure cancels files that have not
+    started and is raised once running ones finish.
+
+    Args:
+        files: Files to download.
+        dest_for: Maps a file to its destination path.
+        headers: Extra request headers (e.g. authorization).
+        progress: Aggregated progress; counts skipped files as done.
+        workers: Maximum concurrent downloads.
+        retries: Per-file retries.
+    """
+    files = sorted(files, key=lambda remote: remote.size, reverse=True)
+    progress = progress or Progress(sum(f.size for f in files), lambda _: None)
+    pending = []
+    for remote in files:
+        dest = dest_for(remote)
+        if os.path.exists(dest) and os.path.getsize(dest) == remote.size:
+            progress.add(remote.path, remote.size)
+        else:
+            pending.append((remote, dest))
+    if not pending:
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(download_file, remote, dest, headers, progress, retries)
+            for remote, dest in pending
+        ]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+    for future in futures:
+        if not future.cancelled() and future.exception() is not None:
+            raise future.exception()
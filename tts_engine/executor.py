@@ -0,0 +1,84 @@
+"""Runs blocking audio pipelines on owned threads, off the event loop.
+
+A /stream body spends most of its life waiting for the model. Iterated
+with Starlette's ``iterate_in_threadpool``, every one of those waits holds
+a thread of the shared pool that also serves ``run_in_threadpool`` calls,
+so a handful of long generations can starve unrelated requests. Here each
+body runs on a thread of a dedicated pool and hands its items to the event
+loop through an ``asyncio.Queue``; the response only awaits the queue.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+_END = object()
+
+
+class PipelineExecutor:
+    """A thread pool for blocking generation pipelines.
+
+    Args:
+        max_workers: Pipelines run at the same time; more wait their turn.
+        buffer: Items a pipeline may run ahead of its consumer.
+    """
+
+    def __init__(self, max_workers: int = 64, buffer: int = 8):
+        self.buffer = max(1, buffer)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="tts-pipeline"
+        )
+
+    def run(self, fn: Callable[[], Any]) -> "asyncio.Future":
+        """Runs ``fn`` on the pool; await the returned future for its result."""
+        return asyncio.get_running_loop().run_in_executor(self._pool, fn)
+
+    async def iterate(self, body: Iterator) -> AsyncIterator:
+        """Yields the items of the sync iterator ``body``.
+
+        ``body`` is advanced, and closed, on a pool thread only. Once the
+        consumer stops, the pipeline is closed after the item it is
+        producing; use ``contextlib.aclosing`` so that happens right away.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        space = threading.Semaphore(self.buffer)
+        stopped = threading.Event()
+
+        def deliver(item: Any, error: Optional[BaseException] = None) -> None:
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+            except RuntimeError:
+                # The event loop is gone; nobody is left to deliver to.
+                stopped.set()
+
+        def pump() -> None:
+            try:
+                for item in body:
+                    space.acquire()
+                    if stopped.is_set():
+                        return
+                    deliver(item)
+                deliver(_END)
+            except BaseException as e:
+                deliver(_END, e)
+            finally:
+                close = getattr(body, "close", None)
+                if close is not None:
+                    close()
+
+        self._pool.submit(pump)
+        try:
+            while True:
+                item, error = await items.get()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                space.release()
+                yield item
+        finally:
+            stopped.set()
+            # Wakes a pump waiting for room so it can see it was stopped.
+            space.release()
@@ -0,0 +1,147 @@
+"""Background batch jobs run against the resident model."""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("tts-server")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# render(request, fmt) -> (encoded audio, audio seconds)
+Renderer = Callable[[Any, str], Tuple[bytes, float]]
+
+
+class JobItem:
+    """One utterance of a job, with its result and timings."""
+
+    def __init__(self, index: int, request: Any):
+        self.index = index
+        self.request = request
+        self.status = QUEUED
+        self.audio: Optional[bytes] = None
+        self.audio_seconds = 0.0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self, created_at: float) -> Dict[str, Any]:
+        info: Dict[str, Any] = {"index": self.index, "status": self.status}
+        if self.started_at is not None:
+            info["queue_seconds"] = round(self.started_at - created_at, 4)
+        if self.finished_at is not None and self.started_at is not None:
+            generation = self.finished_at - self.started_at
+            info["generation_seconds"] = round(generation, 4)
+            info["audio_seconds"] = round(self.audio_seconds, 4)
+            if self.audio_seconds:
+                rtf = generation / self.audio_seconds
+                info["real_time_factor"] = round(rtf, 4)
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class Job:
+    """A group of utterances submitted together."""
+
+    def __init__(self, items: List[Any], fmt: str):
+        self.id = uuid.uuid4().hex
+        self.format = fmt
+        self.created_at = time.time()
+        self.items = [JobItem(i, request) for i, request in enumerate(items)]
+
+    @property
+    def finished(self) -> bool:
+        return all(item.status in (DONE, FAILED) for item in self.items)
+
+    @property
+    def status(self) -> str:
+        statuses = {item.status for item in self.items}
+        if statuses == {QUEUED}:
+            return QUEUED
+        if not self.finished:
+            return RUNNING
+        return FAILED if statuses == {FAILED} else DONE
+
+    def to_dict(self) -> Dict[str, Any]:
+        completed = sum(item.status in (DONE, FAILED) for item in self.items)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "format": self.format,
+            "total": len(self.items),
+            "completed": completed,
+            "failed": sum(item.status == FAILED for item in self.items),
+            "progress": completed / len(self.items) if self.items else 1.0,
+            "items": [item.to_dict(self.created_at) for item in self.items],
+        }
+
+
+class JobManager:
+    """Runs job items on a small worker pool and keeps recent results.
+
+    Items are handed to the worker pool as soon as they are submitted so
+    the batch scheduler can group utterances from the same job.
+
+    Args:
+        render: Synthesizes one item into encoded audio.
+        workers: Items rendered concurrently.
+        max_jobs: Finished jobs kept before the oldest are dropped.
+    """
+
+    def __init__(self, render: Renderer, workers: int = 4, max_jobs: int = 64):
+        self._render = render
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, items: List[Any], fmt: str) -> Job:
+        job = Job(items, fmt)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers, thread_name_prefix="tts-job"
+                )
+            for item in job.items:
+                self._executor.submit(self._run_item, job, item)
+        logger.info(f"Queued job {job.id} with {len(job.items)} item(s)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    def _run_item(self, job: Job, item: JobItem) -> None:
+        item.status = RUNNING
+        item.started_at = time.time()
+        try:
+            item.audio, item.audio_seconds = self._render(item.request, job.format)
+            item.status = DONE
+        except Exception as e:
+            logger.error(f"Job {job.id} item {item.index} failed: {e}")
+            item.error = str(e)
+            item.status = FAILED
+        finally:
+            item.finished_at = time.time()
@@ -0,0 +1,237 @@
+"""One model loader for the server, the Gradio UI and the CLI scripts.
+
+Weights are read shard by shard. Each ``*.safetensors`` file is opened
+lazily with ``mx.load`` and its tensors are evaluated straight into the
+model's parameters before the next shard is touched, so no dict holding
+every weight is built and peak memory stays close to the model's size.
+"""
+
+import copy
+import functools
+import json
+import logging
+import resource
+import struct
+import sys
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from tts_engine.startup import READING_WEIGHTS, TOKENIZER
+
+logger = logging.getLogger("tts-server")
+
+DEFAULT_MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
+SMALL_MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-0.6B-CustomVoice-6bit"
+
+# Qwen3-TTS checkpoints name their ``tts_model_type`` in the repo id.
+_MODEL_TYPES = {
+    "VoiceDesign": "voice_design",
+    "CustomVoice": "custom_voice",
+    "Base": "base",
+}
+
+PhaseFactory = Callable[[str], ContextManager]
+
+
+class LoadStats(NamedTuple):
+    model_path: str
+    seconds: float
+    peak_rss_bytes: int
+    shards: int
+    tensors: int
+
+
+def model_type(model_id: str) -> Optional[str]:
+    """Returns the ``tts_model_type`` a model id or path names, if any."""
+    for part in Path(model_id).name.split("-"):
+        if part in _MODEL_TYPES:
+            return _MODEL_TYPES[part]
+    return None
+
+
+def peak_rss_bytes() -> int:
+    """Returns the process's peak resident set size so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def resolve_model_path(model: str) -> Path:
+    """Returns a local directory for a path or Hugging Face repo id."""
+    from mlx_audio.utils import get_model_path
+
+    return get_model_path(model)
+
+
+@functools.lru_cache(maxsize=8)
+def _normalized_config(config_file: str, mtime_ns: int) -> Dict[str, Any]:
+    with open(config_file, encoding="utf-8") as f:
+        config = json.load(f)
+    model_path = Path(config_file).parent
+    config["model_path"] = str(model_path)
+    model_type = config.get("model_type") or config.get("architecture")
+    if model_type is None:
+        from mlx_audio.utils import get_model_name_parts
+
+        model_type = get_model_name_parts(model_path)[0].lower()
+    config["model_type"] = model_type
+    return config
+
+
+def load_config(model_path: Path) -> Dict[str, Any]:
+    """Returns the normalized config of a model directory.
+
+    Parsing is cached per file and modification time; callers get a copy
+    they are free to mutate.
+    """
+    config_file = Path(model_path) / "config.json"
+    if not config_file.exists():
+        raise FileNotFoundError(f"Config not found at {model_path}")
+    config = _normalized_config(str(config_file), config_file.stat().st_mtime_ns)
+    return copy.deepcopy(config)
+
+
+def safetensors_index(path: Path) -> Dict[str, Tuple[str, Tuple[int, ...]]]:
+    """Reads tensor names, dtypes and shapes from a shard's header only."""
+    with open(path, "rb") as f:
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+    return {
+        name: (info["dtype"], tuple(info["shape"])) for name, info in header.items()
+    }
+
+
+def weight_shards(model_path: Path) -> List[Path]:
+    shards = sorted(Path(model_path).glob("*.safetensors"))
+    if not shards:
+        shards = sorted(Path(model_path).glob("*.npz"))
+    if not shards:
+        raise FileNotFoundError(f"No weight files found in {model_path}")
+    return shards
+
+
+def load_model(
+    model: str = DEFAULT_MODEL_ID,
+    strict: bool = True,
+    phase: Optional[PhaseFactory] = None,
+) -> Tuple[Any, LoadStats]:
+    """Loads a TTS model with streamed, shard-by-shard weights.
+
+    Tensors in the checkpoint that the model has no parameter for are
+    skipped (the VoiceDesign checkpoints ship a few); with ``strict`` a
+    parameter missing from every shard is an error.
+
+    Args:
+        model: Local directory or Hugging Face repo id.
+        strict: Fail when the checkpoint does not cover every parameter.
+        phase: Optional ``phase(name)`` context manager factory, used to
+            report the weights and tokenizer stages (see ``StartupState``).
+
+    Returns:
+        The model, ready for ``generate()``, and its load statistics.
+    """
+    import mlx.core as mx
+    from mlx.utils import tree_flatten
+    from mlx_audio.tts.utils import MODEL_REMAPPING
+    from mlx_audio.utils import (
+        apply_quantization,
+        get_model_class,
+        get_model_name_parts,
+    )
+
+    phase = phase or (lambda name: nullcontext())
+    started = time.perf_counter()
+
+    with phase(READING_WEIGHTS):
+        model_path = resolve_model_path(model)
+        config = load_config(model_path)
+        arch, _ = get_model_class(
+            model_type=config["model_type"],
+            model_name=get_model_name_parts(model),
+            category="tts",
+            model_remapping=MODEL_REMAPPING,
+        )
+        model_config = (
+            arch.ModelConfig.from_dict(config)
+            if hasattr(arch, "ModelConfig")
+            else config
+        )
+        instance = arch.Model(model_config)
+
+        shards = weight_shards(model_path)
+        checkpoint_names = set()
+        for shard in shards:
+            if shard.suffix == ".safetensors":
+                checkpoint_names.update(safetensors_index(shard))
+        apply_quantization(
+            instance,
+            config,
+            checkpoint_names,
+            getattr(instance, "model_quant_predicate", None),
+        )
+
+        expected = dict(tree_flatten(instance.parameters()))
+        loaded = set()
+        skipped = 0
+        for shard in shards:
+            weights = mx.load(str(shard))
+            if hasattr(instance, "sanitize"):
+                weights = instance.sanitize(weights)
+            items = []
+            for name, value in weights.items():
+                if name not in expected:
+                    skipped += 1
+                    continue
+                if value.shape != expected[name].shape:
+                    raise ValueError(
+                        f"Shape mismatch for {name}: checkpoint {value.shape}, "
+                        f"model {expected[name].shape}"
+                    )
+                items.append((name, value))
+            del weights
+            instance.load_weights(items, strict=False)
+            mx.eval([value for _, value in items])
+            loaded.update(name for name, _ in items)
+            del items
+
+        missing = sorted(set(expected) - loaded)
+        if missing:
+            message = (
+                f"{len(missing)} parameter(s) missing from checkpoint, "
+                f"e.g. {missing[:3]}"
+            )
+            if strict:
+                raise ValueError(message)
+            logger.warning(message)
+        if skipped:
+            logger.info(f"Skipped {skipped} checkpoint tensor(s) unused by the model")
+        instance.eval()
+
+    with phase(TOKENIZER):
+        if hasattr(arch.Model, "post_load_hook"):
+            instance = arch.Model.post_load_hook(instance, model_path)
+
+    stats = LoadStats(
+        model_path=str(model_path),
+        seconds=time.perf_counter() - started,
+        peak_rss_bytes=peak_rss_bytes(),
+        shards=len(shards),
+        tensors=len(loaded),
+    )
+    logger.info(
+        f"Loaded {model} from {stats.shards} shard(s) in {stats.seconds:.2f}s, "
+        f"peak RSS {stats.peak_rss_bytes / (1 << 20):.0f} MiB"
+    )
+    return instance, stats
@@ -0,0 +1,474 @@
+"""Text front-end: turns pasted text into what the model should say.
+
+Clipboard text is full of things that are expensive to speak and useless to
+hear: markdown syntax, code, URLs read character by character, tables. The
+rules here strip or summarize those and spell out numbers, dates and
+abbreviations, so the model spends its frames on words. Every rule is a
+pure function of its input; results are cached per (text, rules).
+
+The server only runs rules a request asks for, or all of them with
+TTS_NORMALIZE=1; by default text reaches the model as written.
+"""
+
+import html
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, NamedTuple, Optional, Union
+
+from tts_engine.segmenter import estimate_tokens
+
+# Rules in the order they run; normalize_text runs all of them by default.
+RULES = (
+    "code",
+    "tables",
+    "markdown",
+    "urls",
+    "dates",
+    "abbreviations",
+    "numbers",
+    "whitespace",
+)
+CACHE_SIZE = 256
+
+
+class Normalized(NamedTuple):
+    """Normalized text and how much shorter it is than the input."""
+
+    text: str
+    input_chars: int
+    input_tokens: int
+
+    @property
+    def chars_saved(self) -> int:
+        return self.input_chars - len(self.text)
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.input_tokens - estimate_tokens(self.text)
+
+
+def resolve_rules(
+    toggles: Union[bool, Dict[str, bool], None], default: bool = True
+) -> FrozenSet[str]:
+    """Picks the rules to run from a request's ``normalize`` value.
+
+    ``True``/``False`` turn every rule on or off, a dict toggles single
+    rules on top of ``default``, and None means ``default``.
+
+    Raises:
+        ValueError: For a rule name that does not exist.
+    """
+    if isinstance(toggles, bool):
+        return frozenset(RULES) if toggles else frozenset()
+    rules = set(RULES) if default else set()
+    for name, enabled in (toggles or {}).items():
+        if name not in RULES:
+            raise ValueError(
+                f"Unknown normalization rule: {name} (known: {', '.join(RULES)})"
+            )
+        if enabled:
+            rules.add(name)
+        else:
+            rules.discard(name)
+    return frozenset(rules)
+
+
+def normalize_text(text: str, rules: Optional[FrozenSet[str]] = None) -> Normalized:
+    """Applies ``rules`` (all by default) to ``text``."""
+    rules = frozenset(RULES) if rules is None else rules
+    return Normalized(_normalize(text, rules), len(text), estimate_tokens(text))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _normalize(text: str, rules: FrozenSet[str]) -> str:
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    for name in RULES:
+        if name in rules:
+            text = _APPLY[name](text)
+    return text.strip()
+
+
+_INVISIBLE_RE = re.compile("[​‌‍⁠﻿]")
+
+
+def _whitespace(text: str) -> str:
+    text = _INVISIBLE_RE.sub("", text).replace(" ", " ").replace("\t", " ")
+    text = re.sub(r" {2,}", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    # Paragraph breaks survive; the segmenter splits on them.
+    return re.sub(r"\n{3,}", "\n\n", text)
+
+
+_FENCE_RE = re.compile(
+    r"^ *(```|~~~)[ \t]*([\w+#.-]*)[^\n]*\n(.*?)(?:^ *\1[ \t]*$|\Z)",
+    re.MULTILINE | re.DOTALL,
+)
+
+
+def _describe_code(match: re.Match) -> str:
+    language = match.group(2)
+    lines = len([line for line in match.group(3).splitlines() if line.strip()])
+    what = f"{language} code" if language else "Code"
+    what = what[0].upper() + what[1:]
+    size = f", {lines} {'line' if lines == 1 else 'lines'}" if lines else ""
+    return f"\n\n({what}{size}.)\n\n"
+
+
+def _code(text: str) -> str:
+    return _FENCE_RE.sub(_describe_code, text)
+
+
+_TABLE_RE = re.compile(
+    r"^ *\|?(.+\|.+?)\|? *\n *\|?(?: *:?-{3,}:? *\|)+ *(?::?-{3,}:?)? *\|? *\n"
+    r"((?: *\|?.+\|.*\n?)*)",
+    re.MULTILINE,
+)
+
+
+def _cells(row: str):
+    return [cell.strip() for cell in row.strip().strip("|").split("|")]
+
+
+def _describe_table(match: re.Match) -> str:
+    columns = [cell for cell in _cells(match.group(1)) if cell]
+    rows = len([row for row in match.group(2).splitlines() if row.strip()])
+    listed = _join(columns)
+    return (
+        f"\n\n(Table with {rows} {'row' if rows == 1 else 'rows'}"
+        f"{': ' + listed if listed else ''}.)\n\n"
+    )
+
+
+def _tables(text: str) -> str:
+    return _TABLE_RE.sub(_describe_table, text)
+
+
+def _join(words) -> str:
+    words = list(words)
+    if len(words) < 2:
+        return "".join(words)
+    return f"{', '.join(words[:-1])} and {words[-1]}"
+
+
+_END_PUNCTUATION = ".!?…:;,"
+_IMAGE_RE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)]*\)")
+_AUTOLINK_RE = re.compile(r"<((?:https?|mailto):[^>\s]+)>")
+_REFERENCE_RE = re.compile(r"^ *\[[^\]]+\]: *\S+.*$", re.MULTILINE)
+_RULE_RE = re.compile(r"^ *([-*_])( *\1){2,} *$", re.MULTILINE)
+_HEADING_RE = re.compile(r"^ *#{1,6} +(.+?)[ #]*$", re.MULTILINE)
+_ITEM_RE = re.compile(
+    r"^ *(?:[-*+]|\d{1,3}[.)]) +(?:\[[ xX]\] +)?(.+)$", re.MULTILINE
+)
+_QUOTE_RE = re.compile(r"^ *>+ ?", re.MULTILINE)
+_TAG_RE = re.compile(r"</?[A-Za-z][^>]*>")
+_INLINE_CODE_RE = re.compile(r"`+([^`]+)`+")
+_EMPHASIS_RE = (
+    re.compile(r"(\*\*|__)(\S.*?\S|\S)\1"),
+    re.compile(r"(?<![\w*])\*(\S[^*\n]*?)\*(?!\w)"),
+    re.compile(r"(?<![\w_])_(\S[^_\n]*?)_(?![\w])"),
+    re.compile(r"~~(\S.*?)~~"),
+)
+
+
+def _as_sentence(line: str) -> str:
+    line = line.strip()
+    return line if not line or line[-1] in _END_PUNCTUATION else f"{line}."
+
+
+def _markdown(text: str) -> str:
+    text = _REFERENCE_RE.sub("", text)
+    text = _IMAGE_RE.sub(r"\1", text)
+    text = _LINK_RE.sub(r"\1", text)
+    text = _AUTOLINK_RE.sub(r"\1", text)
+    text = _RULE_RE.sub("", text)
+    text = _QUOTE_RE.sub("", text)
+    # Headings and list items become sentences of their own.
+    text = _HEADING_RE.sub(lambda m: f"\n{_as_sentence(m.group(1))}\n", text)
+    text = _ITEM_RE.sub(lambda m: _as_sentence(m.group(1)), text)
+    text = _TAG_RE.sub("", text)
+    text = _INLINE_CODE_RE.sub(r"\1", text)
+    for pattern in _EMPHASIS_RE:
+        text = pattern.sub(lambda m: m.group(m.lastindex), text)
+    return html.unescape(text)
+
+
+_URL_RE = re.compile(r"\b(?:https?://|www\.)[^\s<>\"']+", re.IGNORECASE)
+_URL_TRAILING = ".,;:!?)]}'\""
+
+
+def _speak_url(match: re.Match) -> str:
+    url = match.group()
+    trailing = ""
+    while url and url[-1] in _URL_TRAILING:
+        trailing = url[-1] + trailing
+        url = url[:-1]
+    host = re.sub(r"^(?:https?://)?(?:www\.)?", "", url, flags=re.IGNORECASE)
+    host = re.split(r"[/?#:]", host, maxsplit=1)[0]
+    return f"{host}{trailing}" if host else trailing
+
+
+def _urls(text: str) -> str:
+    return _URL_RE.sub(_speak_url, text)
+
+
+_ONES = (
+    "zero one two three four five six seven eight nine ten eleven twelve "
+    "thirteen fourteen fifteen sixteen seventeen eighteen nineteen"
+).split()
+_TENS = "_ _ twenty thirty forty fifty sixty seventy eighty ninety".split()
+_SCALES = (
+    (10**12, "trillion"),
+    (10**9, "billion"),
+    (10**6, "million"),
+    (10**3, "thousand"),
+)
+_ORDINALS = {
+    "one": "first",
+    "two": "second",
+    "three": "third",
+    "five": "fifth",
+    "eight": "eighth",
+    "nine": "ninth",
+    "twelve": "twelfth",
+}
+
+
+def number_words(n: int) -> str:
+    """Spells out an integer whose magnitude is below 10**15."""
+    if n < 0:
+        return f"minus {number_words(-n)}"
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        tens, ones = divmod(n, 10)
+        return _TENS[tens] + (f"-{_ONES[ones]}" if ones else "")
+    if n < 1000:
+        hundreds, rest = divmod(n, 100)
+        return f"{_ONES[hundreds]} hundred" + (f" {number_words(rest)}" if rest else "")
+    for scale, name in _SCALES:
+        if n >= scale:
+            high, rest = divmod(n, scale)
+            words = f"{number_words(high)} {name}"
+            return words + (f" {number_words(rest)}" if rest else "")
+    raise ValueError(n)
+
+
+def ordinal_words(n: int) -> str:
+    words = number_words(n)
+    cut = max(words.rfind(" "), words.rfind("-")) + 1
+    head, last = words[:cut], words[cut:]
+    if last in _ORDINALS:
+        return head + _ORDINALS[last]
+    if last.endswith("y"):
+        return f"{head}{last[:-1]}ieth"
+    return f"{head}{last}th"
+
+
+def year_words(year: int) -> str:
+    if 2000 <= year < 2010 or year % 1000 == 0 or not 1000 <= year < 10000:
+        return number_words(year)
+    high, low = divmod(year, 100)
+    if low == 0:
+        return f"{number_words(high)} hundred"
+    low_words = f"oh {_ONES[low]}" if low < 10 else number_words(low)
+    return f"{number_words(high)} {low_words}"
+
+
+def _digits(digits: str) -> str:
+    return " ".join(_ONES[int(d)] for d in digits)
+
+
+def _cardinal(digits: str) -> str:
+    digits = digits.replace(",", "")
+    if len(digits) > 1 and digits.startswith("0") or len(digits) > 15:
+        return _digits(digits)
+    return number_words(int(digits))
+
+
+_CURRENCIES = {
+    "$": ("dollar", "cent"),
+    "€": ("euro", "cent"),
+    "£": ("pound", "penny"),
+}
+_CURRENCY_RE = re.compile(
+    r"([$€£])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?"
+    r"(?:\s?(million|billion|[kKmMbB])\b)?"
+)
+_MAGNITUDES = {"k": "thousand", "m": "million", "b": "billion"}
+_YEAR_RE = re.compile(r"1[1-9]\d\d|20\d\d")
+_NUMBER_RE = re.compile(
+    r"(?<![\w.,])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?(st|nd|rd|th)?(%)?"
+    r"(?![\w%]|[.,]\d)"
+)
+
+
+def _plural(word: str, n: int) -> str:
+    if n == 1:
+        return word
+    return "pence" if word == "penny" else f"{word}s"
+
+
+def _speak_currency(match: re.Match) -> str:
+    symbol, whole, fraction, magnitude = match.groups()
+    unit, minor = _CURRENCIES[symbol]
+    amount = int(whole.replace(",", ""))
+    if magnitude:
+        scale = _MAGNITUDES.get(magnitude[0].lower(), magnitude)
+        number = _cardinal(whole) + (f" point {_digits(fraction)}" if fraction else "")
+        return f"{number} {scale} {_plural(unit, 2)}"
+    major = f"{_cardinal(whole)} {_plural(unit, amount)}"
+    if fraction and len(fraction) == 2:
+        cents = int(fraction)
+        if not cents:
+            return major
+        minor_words = f"{number_words(cents)} {_plural(minor, cents)}"
+        return f"{major} {minor_words}" if amount else minor_words
+    if fraction:
+        return f"{_cardinal(whole)} point {_digits(fraction)} {_plural(unit, 2)}"
+    return major
+
+
+def _speak_number(match: re.Match) -> str:
+    whole, fraction, suffix, percent = match.groups()
+    if suffix and not fraction and "," not in whole:
+        words = ordinal_words(int(whole))
+    elif _YEAR_RE.fullmatch(whole) and not (fraction or suffix or percent):
+        # A bare four-digit number in this range is almost always a year.
+        words = year_words(int(whole))
+    else:
+        words = _cardinal(whole)
+        if fraction:
+            words += f" point {_digits(fraction)}"
+        if suffix:
+            words += suffix
+    return f"{words} percent" if percent else words
+
+
+def _numbers(text: str) -> str:
+    text = _CURRENCY_RE.sub(_speak_currency, text)
+    return _NUMBER_RE.sub(_speak_number, text)
+
+
+_MONTHS = (
+    "January February March April May June July August September October "
+    "November December"
+).split()
+_MONTH_NAMES = {name.lower(): i for i, name in enumerate(_MONTHS, 1)}
+_MONTH_NAMES.update({name[:3].lower(): i for i, name in enumerate(_MONTHS, 1)})
+_MONTH_NAMES["sept"] = 9
+_MONTH = r"(" + "|".join(sorted(_MONTH_NAMES, key=len, reverse=True)) + r")\.?"
+_ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+_MONTH_DAY_RE = re.compile(
+    rf"\b{_MONTH} (\d{{1,2}})(?:st|nd|rd|th)?\b(?:,? (\d{{4}})\b)?", re.IGNORECASE
+)
+_DAY_MONTH_RE = re.compile(
+    rf"\b(\d{{1,2}})(?:st|nd|rd|th)? (?:of )?{_MONTH}\b(?:,? (\d{{4}})\b)?",
+    re.IGNORECASE,
+)
+_TIME_RE = re.compile(
+    r"\b([01]?\d|2[0-3]):([0-5]\d)(?!:\d)"
+    # "p.m." keeps its last period where it ends the sentence.
+    r"(?:\s?([AaPp])\.?[Mm]\b(?:\.(?=\s+[a-z]))?)?"
+)
+
+
+def _date(month: int, day: int, year: Optional[str]) -> Optional[str]:
+    if not 1 <= month <= 12 or not 1 <= day <= 31:
+        return None
+    words = f"{_MONTHS[month - 1]} {ordinal_words(day)}"
+    return f"{words}, {year_words(int(year))}" if year else words
+
+
+def _speak_iso_date(match: re.Match) -> str:
+    year, month, day = match.groups()
+    return _date(int(month), int(day), year) or match.group()
+
+
+def _speak_month_day(match: re.Match) -> str:
+    month, day, year = match.groups()
+    return _date(_MONTH_NAMES[month.lower()], int(day), year) or match.group()
+
+
+def _speak_day_month(match: re.Match) -> str:
+    day, month, year = match.groups()
+    return _date(_MONTH_NAMES[month.lower()], int(day), year) or match.group()
+
+
+def _speak_time(match: re.Match) -> str:
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3)
+    if minute == 0:
+        minutes = "" if meridiem else " hundred" if hour > 12 else " o'clock"
+    elif minute < 10:
+        minutes = f" oh {_ONES[minute]}"
+    else:
+        minutes = f" {number_words(minute)}"
+    suffix = f" {meridiem.lower()} m" if meridiem else ""
+    return f"{number_words(hour)}{minutes}{suffix}"
+
+
+def _dates(text: str) -> str:
+    text = _ISO_DATE_RE.sub(_speak_iso_date, text)
+    text = _MONTH_DAY_RE.sub(_speak_month_day, text)
+    text = _DAY_MONTH_RE.sub(_speak_day_month, text)
+    return _TIME_RE.sub(_speak_time, text)
+
+
+# Titles precede a name, so their period never ends a sentence.
+_TITLES = {
+    "Mr.": "Mister",
+    "Mrs.": "Missus",
+    "Ms.": "Miz",
+    "Dr.": "Doctor",
+    "Prof.": "Professor",
+}
+_ABBREVIATIONS = {
+    "e.g.": "for example",
+    "i.e.": "that is",
+    "etc.": "et cetera",
+    "vs.": "versus",
+    "approx.": "approximately",
+    "Jr.": "Junior",
+    "Sr.": "Senior",
+}
+_TITLE_RE = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(t) for t in _TITLES) + r")(?= )"
+)
+_ABBREVIATION_RE = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(a) for a in _ABBREVIATIONS) + r")"
+    r"(,?)(\s+(?=(?-i:[A-Z]))|\s*$)?",
+    re.IGNORECASE | re.MULTILINE,
+)
+_NUMBER_SIGN_RE = re.compile(r"(?<!\w)(?:No\.|#)\s?(?=\d)")
+
+
+def _speak_abbreviation(match: re.Match) -> str:
+    abbreviation, comma, sentence_end = match.groups()
+    words = next(
+        words
+        for key, words in _ABBREVIATIONS.items()
+        if key.lower() == abbreviation.lower()
+    )
+    # The abbreviation's period also ended the sentence.
+    if sentence_end is not None and not comma:
+        return f"{words}.{sentence_end}"
+    return f"{words}{comma}{sentence_end or ''}"
+
+
+def _abbreviations(text: str) -> str:
+    text = _TITLE_RE.sub(lambda m: _TITLES[m.group(1)], text)
+    text = _ABBREVIATION_RE.sub(_speak_abbreviation, text)
+    text = _NUMBER_SIGN_RE.sub("number ", text)
+    return re.sub(r"\s&\s", " and ", text)
+
+
+_APPLY = {
+    "whitespace": _whitespace,
+    "code": _code,
+    "tables": _tables,
+    "markdown": _markdown,
+    "urls": _urls,
+    "dates": _dates,
+    "abbreviations": _abbreviations,
+    "numbers": _numbers,
+}
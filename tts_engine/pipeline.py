@@ -0,0 +1,148 @@
+"""Pipelined multi-segment synthesis with crossfaded seams."""
+
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+
+class Crossfader:
+    """Streams segment audio, blending each seam with an equal-power fade.
+
+    Only the last ``fade_samples`` of the current segment are held back, so
+    the added latency is the fade length, never the segment length.
+    """
+
+    def __init__(self, fade_samples: int):
+        self.fade_samples = max(0, fade_samples)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._seam_tail = None
+        self._head = np.zeros(0, dtype=np.float32)
+        if self.fade_samples:
+            ramp = np.linspace(0.0, np.pi / 2, self.fade_samples, dtype=np.float32)
+            self._fade_in = np.sin(ramp)
+            self._fade_out = np.cos(ramp)
+
+    def feed(self, chunk: np.ndarray) -> np.ndarray:
+        """Adds audio for the current segment; returns audio safe to emit."""
+        if not self.fade_samples:
+            return chunk
+
+        if self._seam_tail is not None:
+            self._head = np.concatenate([self._head, chunk])
+            if len(self._head) < self.fade_samples:
+                return np.zeros(0, dtype=np.float32)
+            n = self.fade_samples
+            blended = self._seam_tail * self._fade_out + self._head[:n] * self._fade_in
+            chunk = np.concatenate([blended, self._head[n:]])
+            self._seam_tail = None
+            self._head = np.zeros(0, dtype=np.float32)
+
+        buffered = np.concatenate([self._tail, chunk])
+        self._tail = buffered[-self.fade_samples :]
+        return buffered[: -self.fade_samples]
+
+    def end_segment(self) -> np.ndarray:
+        """Marks a seam; returns any audio that can no longer be blended."""
+        if not self.fade_samples:
+            return np.zeros(0, dtype=np.float32)
+        pending = self.flush()
+        if len(pending) < self.fade_samples:
+            return pending
+        self._seam_tail = pending[-self.fade_samples :]
+        return pending[: -self.fade_samples]
+
+    def flush(self) -> np.ndarray:
+        """Returns everything still held back."""
+        parts = [self._tail, self._head]
+        if self._seam_tail is not None:
+            parts.insert(0, self._seam_tail)
+        self._tail = np.zeros(0, dtype=np.float32)
+        self._head = np.zeros(0, dtype=np.float32)
+        self._seam_tail = None
+        return np.concatenate(parts)
+
+
+def synthesize_segments(
+    submit: Callable[[Dict[str, Any]], Iterable[np.ndarray]],
+    segments: Union[List[str], Callable[[bool], Optional[str]]],
+    gen_kwargs: Dict[str, Any],
+    fade_samples: int = 0,
+    eager: bool = False,
+    cancel: Optional[Callable[[], None]] = None,
+) -> Iterator[np.ndarray]:
+    """Yields crossfaded audio for ``segments`` in order.
+
+    The first segment is submitted at once. Each following segment is
+    submitted as soon as the previous one starts producing audio, so the
+    model works on it while earlier audio is still being streamed. With
+    ``eager`` every segment is submitted up front, letting the scheduler
+    batch them together when latency to first audio does not matter.
+
+    ``segments`` may also be a function ``next_segment(wait)`` for text
+    that is still arriving. It returns the next segment, or None when none
+    is ready yet (``wait`` False) or none will ever come (``wait`` True).
+    While the model has nothing to do the held-back seam is played out
+    unblended rather than waiting for text.
+
+    Args:
+        submit: Queues one generation and returns an iterable of chunks.
+        segments: Text segments in reading order, or a segment source.
+        gen_kwargs: Generation arguments shared by all segments.
+        fade_samples: Crossfade length at each seam.
+        eager: Submit every segment immediately.
+        cancel: Called when the pipeline stops (an error, or the consumer
+            closing it) with segments still submitted, so they never run.
+    """
+    if callable(segments):
+        next_segment = segments
+    else:
+        remaining = deque(segments)
+
+        def next_segment(wait: bool) -> Optional[str]:
+            return remaining.popleft() if remaining else None
+
+    in_flight = deque()
+
+    def submit_next(wait: bool) -> bool:
+        text = next_segment(wait)
+        if text is None:
+            return False
+        in_flight.append(submit(dict(gen_kwargs, text=text)))
+        return True
+
+    submit_next(True)
+    while eager and submit_next(False):
+        pass
+
+    crossfader = Crossfader(fade_samples)
+    first_segment = True
+    try:
+        while in_flight:
+            if not first_segment:
+                out = crossfader.end_segment()
+                if len(out):
+                    yield out
+            first_segment = False
+
+            ticket = in_flight.popleft()
+            for chunk in ticket:
+                # Keep one segment queued behind the one playing.
+                if not in_flight:
+                    submit_next(False)
+                out = crossfader.feed(chunk)
+                if len(out):
+                    yield out
+            if not in_flight and not submit_next(False):
+                # Nothing to blend into yet: play the seam out, then wait.
+                out = crossfader.flush()
+                if len(out):
+                    yield out
+                submit_next(True)
+
+        out = crossfader.flush()
+        if len(out):
+            yield out
+    finally:
+        if in_flight and cancel is not None:
+            cancel()
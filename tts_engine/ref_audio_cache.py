@@ -0,0 +1,81 @@
+"""Byte-budgeted LRU cache for decoded voice-clone reference audio."""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+CacheKey = Tuple[str, int, int]
+
+
+class RefAudioCache:
+    """Keeps decoded, resampled reference clips keyed by path + mtime + rate.
+
+    A file that is rewritten in place gets a new mtime and therefore a new
+    key, so stale audio is never served; the old entry simply ages out.
+
+    Args:
+        max_bytes: Total size of cached arrays before LRU eviction kicks in.
+        loader: ``loader(path, sample_rate)`` decoding a file to an array.
+    """
+
+    def __init__(self, max_bytes: int, loader: Callable[[str, int], Any]):
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(path: str, sample_rate: int) -> CacheKey:
+        real_path = os.path.realpath(path)
+        return (real_path, os.stat(real_path).st_mtime_ns, sample_rate)
+
+    def get(self, path: str, sample_rate: int) -> Any:
+        """Returns the decoded clip, loading it on a miss.
+
+        Raises:
+            FileNotFoundError: If the reference file does not exist.
+        """
+        key = self.key_for(path, sample_rate)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+            self.misses += 1
+
+        audio = self._loader(path, sample_rate)
+        size = int(getattr(audio, "nbytes", 0))
+        if size > self.max_bytes:
+            return audio
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = audio
+                self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= int(getattr(evicted, "nbytes", 0))
+                self.evictions += 1
+            return self._entries.get(key, audio)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
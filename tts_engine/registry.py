@@ -0,0 +1,127 @@
+"""Resident model variants kept within a memory budget."""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("tts-server")
+
+
+def model_nbytes(model: Any) -> int:
+    """Returns the size of a model's parameters, or 0 if it has none."""
+    try:
+        import mlx.nn as nn
+        from mlx.utils import tree_flatten
+    except ImportError:
+        return 0
+    if not isinstance(model, nn.Module):
+        return 0
+    return sum(v.nbytes for _, v in tree_flatten(model.parameters()))
+
+
+class ModelRegistry:
+    """Loads models on demand and evicts the least recently used ones.
+
+    Pinned models are never evicted. A model larger than the whole budget
+    is still loaded; everything unpinned is evicted to make room for it.
+
+    Args:
+        load: Loads a model by id.
+        budget_bytes: Combined size allowed for resident models; 0 for no
+            limit.
+        size_of: Returns the resident size of a loaded model.
+        pinned: Model ids that stay resident once loaded.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], Any],
+        budget_bytes: int = 0,
+        size_of: Callable[[Any], int] = model_nbytes,
+        pinned: Iterable[str] = (),
+    ):
+        self._load = load
+        self.budget_bytes = budget_bytes
+        self._size_of = size_of
+        self.pinned = set(pinned)
+        self._models: "OrderedDict[str, Tuple[Any, int]]" = OrderedDict()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def resident(self) -> List[str]:
+        """Model ids currently loaded, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def peek(self, model_id: str) -> Optional[Any]:
+        """Returns a resident model without loading or touching recency."""
+        with self._lock:
+            entry = self._models.get(model_id)
+            return entry[0] if entry else None
+
+    def add(self, model_id: str, model: Any) -> None:
+        """Registers an already loaded model."""
+        size = self._size_of(model)
+        with self._lock:
+            self._models[model_id] = (model, size)
+            self._models.move_to_end(model_id)
+            self._evict(keep=model_id)
+
+    def get(self, model_id: str) -> Any:
+        """Returns a model, loading it (and evicting others) if needed."""
+        with self._lock:
+            entry = self._models.get(model_id)
+            if entry is not None:
+                self._models.move_to_end(model_id)
+                return entry[0]
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+
+        # Concurrent requests for the same model wait for one load.
+        with load_lock:
+            model = self.peek(model_id)
+            if model is not None:
+                return self.get(model_id)
+            logger.info(f"Loading model variant: {model_id}")
+            model = self._load(model_id)
+            with self._lock:
+                self.loads += 1
+            self.add(model_id, model)
+            return model
+
+    def evict(self, model_id: str) -> bool:
+        with self._lock:
+            if self._models.pop(model_id, None) is None:
+                return False
+            self.evictions += 1
+        logger.info(f"Evicted model variant: {model_id}")
+        return True
+
+    def _evict(self, keep: str) -> None:
+        if not self.budget_bytes:
+            return
+        total = sum(size for _, size in self._models.values())
+        for model_id in list(self._models):
+            if total <= self.budget_bytes:
+                break
+            if model_id == keep or model_id in self.pinned:
+                continue
+            _, size = self._models.pop(model_id)
+            total -= size
+            self.evictions += 1
+            logger.info(f"Evicted model variant: {model_id} ({size} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident": [
+                    {"model": model_id, "bytes": size}
+                    for model_id, (_, size) in self._models.items()
+                ],
+                "bytes": sum(size for _, size in self._models.values()),
+                "budget_bytes": self.budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,238 @@
+"""Sentence and clause aware text segmentation for pipelined synthesis."""
+
+import re
+import threading
+from collections import deque
+from typing import List, Optional
+
+# Rough characters-per-token ratio for the Qwen tokenizer on English prose.
+CHARS_PER_TOKEN = 4
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…。！？])[\"'”’)\]]*\s+")
+_CLAUSE_END_RE = re.compile(r"(?<=[,;:—–、，；：])\s*")
+# Where text arriving in pieces can be cut: a sentence end followed by
+# whitespace, or a paragraph break.
+_BOUNDARY_RE = re.compile(r"(?<=[.!?…。！？])[\"'”’)\]]*\s+|\n\s*\n")
+_ABBREVIATIONS = {
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.",
+    "e.g.", "i.e.", "approx.", "no.", "fig.", "inc.", "ltd.", "co.",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used to cap segment length."""
+    return max(1, -(-len(text.strip()) // CHARS_PER_TOKEN))
+
+
+def split_sentences(text: str) -> List[str]:
+    """Splits text into sentences, keeping common abbreviations intact."""
+    sentences: List[str] = []
+    for paragraph in _PARAGRAPH_RE.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        current = ""
+        for piece in _SENTENCE_END_RE.split(paragraph):
+            current = f"{current} {piece}" if current else piece
+            last_word = current.rsplit(" ", 1)[-1].lower()
+            if last_word in _ABBREVIATIONS or re.fullmatch(r"[a-z]\.", last_word):
+                continue
+            sentences.append(current)
+            current = ""
+        if current:
+            sentences.append(current)
+    return sentences
+
+
+def _split_long(sentence: str, max_tokens: int) -> List[str]:
+    """Breaks an over-long sentence at clause boundaries, then at words."""
+    parts: List[str] = []
+    current = ""
+    for clause in _CLAUSE_END_RE.split(sentence):
+        if not clause:
+            continue
+        candidate = f"{current} {clause}" if current else clause
+        if estimate_tokens(candidate) <= max_tokens:
+            current = candidate
+            continue
+        if current:
+            parts.append(current)
+        current = ""
+        for word in clause.split():
+            candidate = f"{current} {word}" if current else word
+            if current and estimate_tokens(candidate) > max_tokens:
+                parts.append(current)
+                current = word
+            else:
+                current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def segment_text(text: str, max_tokens: int = 80) -> List[str]:
+    """Splits text into synthesis segments.
+
+    The first segment is a single sentence so time-to-first-audio depends on
+    it alone; later sentences are packed together up to ``max_tokens`` to
+    keep prosody natural and model calls few.
+
+    Args:
+        text: Raw request text.
+        max_tokens: Estimated token cap per segment.
+
+    Returns:
+        Non-empty segments in reading order.
+    """
+    pieces: List[str] = []
+    for sentence in split_sentences(text):
+        if estimate_tokens(sentence) > max_tokens:
+            pieces.extend(_split_long(sentence, max_tokens))
+        else:
+            pieces.append(sentence)
+
+    if not pieces:
+        return []
+
+    segments = [pieces[0]]
+    current = ""
+    for piece in pieces[1:]:
+        candidate = f"{current} {piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            segments.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _is_abbreviation(text: str) -> bool:
+    last_word = text.rsplit(None, 1)[-1].lower() if text.strip() else ""
+    return last_word in _ABBREVIATIONS or bool(re.fullmatch(r"[a-z]\.", last_word))
+
+
+class TextStream:
+    """Text that arrives in pieces, cut into segments as it becomes safe to.
+
+    Text is committed at sentence ends and paragraph breaks once the
+    whitespace after them has arrived, so a sentence is never cut while its
+    end may still be in flight. A run longer than ``max_tokens`` without a
+    boundary is cut at clauses, then words, keeping the last (possibly
+    partial) word back. :meth:`flush` commits whatever is buffered.
+
+    :meth:`next_segment` hands committed text to the synthesis pipeline:
+    the first segment is one sentence, later ones pack every sentence
+    committed so far up to ``max_tokens``. All methods are thread-safe.
+
+    Args:
+        max_tokens: Estimated token cap per segment.
+    """
+
+    def __init__(self, max_tokens: int = 80):
+        self.max_tokens = max_tokens
+        self._buffer = ""
+        self._pieces: deque = deque()
+        self._first = True
+        self._closed = False
+        self._cancelled = False
+        self._condition = threading.Condition()
+
+    def write(self, text: str) -> None:
+        """Appends ``text`` and commits any sentences it completes.
+
+        Text written after :meth:`cancel` is dropped.
+        """
+        with self._condition:
+            if self._cancelled:
+                return
+            if self._closed:
+                raise ValueError("Text stream is closed")
+            self._buffer += text
+            if self._commit_complete() or self._commit_overflow():
+                self._condition.notify_all()
+
+    def flush(self) -> None:
+        """Commits all buffered text, complete sentence or not."""
+        with self._condition:
+            self._commit(self._buffer)
+            self._buffer = ""
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Commits buffered text; no more text will be written."""
+        with self._condition:
+            self._commit(self._buffer)
+            self._buffer = ""
+            self._closed = True
+            self._condition.notify_all()
+
+    def cancel(self) -> None:
+        """Drops all uncommitted and unsent text and closes the stream."""
+        with self._condition:
+            self._buffer = ""
+            self._pieces.clear()
+            self._closed = True
+            self._cancelled = True
+            self._condition.notify_all()
+
+    def _commit(self, text: str) -> bool:
+        pieces = []
+        for sentence in split_sentences(text):
+            if estimate_tokens(sentence) > self.max_tokens:
+                pieces.extend(_split_long(sentence, self.max_tokens))
+            else:
+                pieces.append(sentence)
+        self._pieces.extend(pieces)
+        return bool(pieces)
+
+    def _commit_complete(self) -> bool:
+        cut = 0
+        for match in _BOUNDARY_RE.finditer(self._buffer):
+            # "Dr. " is not a sentence end; "\n\n" always is.
+            if "\n" in match.group() or not _is_abbreviation(
+                self._buffer[: match.start()]
+            ):
+                cut = match.end()
+        if not cut:
+            return False
+        committed = self._commit(self._buffer[:cut])
+        self._buffer = self._buffer[cut:]
+        return committed
+
+    def _commit_overflow(self) -> bool:
+        if estimate_tokens(self._buffer) <= self.max_tokens:
+            return False
+        text = self._buffer.rstrip()
+        trailing = self._buffer[len(text) :]
+        parts = _split_long(" ".join(text.split()), self.max_tokens)
+        if len(parts) < 2:
+            return False
+        self._pieces.extend(parts[:-1])
+        self._buffer = parts[-1] + trailing
+        return True
+
+    def next_segment(self, wait: bool = True) -> Optional[str]:
+        """Takes the next segment of committed text.
+
+        Returns None if nothing is committed yet and ``wait`` is False, or,
+        when waiting, once the stream is closed and drained.
+        """
+        with self._condition:
+            while not self._pieces:
+                if self._closed or not wait:
+                    return None
+                self._condition.wait()
+            segment = self._pieces.popleft()
+            if self._first:
+                self._first = False
+                return segment
+            while self._pieces:
+                candidate = f"{segment} {self._pieces[0]}"
+                if estimate_tokens(candidate) > self.max_tokens:
+                    break
+                segment = candidate
+                self._pieces.popleft()
+            return segment
@@ -0,0 +1,174 @@
+"""Single-flight coalescing of identical in-flight generations.
+
+Double-clicks, retries and several windows reading the same notification
+send the same request within moments of each other. Instead of generating
+it once per caller, later arrivals subscribe to the generation already
+running: each subscriber gets every chunk from the start, replayed from
+memory up to the one being produced and live from there on.
+
+There is no producer thread. Whichever subscriber first needs a chunk
+that does not exist yet pulls it from the shared source while the others
+wait, so the generation runs as long as anyone is reading it. It has its
+own cancel token, cancelled only once every subscriber has been cancelled
+or has gone away.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from tts_engine.cancellation import CLIENT, Cancelled, CancelToken
+
+# start(token) -> the chunks of a new generation, cancelled through token.
+Source = Callable[[CancelToken], Iterable]
+
+
+class Flight:
+    """One shared generation and the chunks it has produced so far."""
+
+    def __init__(self, key: str, start: Source, token: CancelToken):
+        self.key = key
+        self.token = token
+        self.chunks: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._start = start
+        self._source: Optional[Iterator] = None
+        self._pulling = False
+        self._subscribers: List[CancelToken] = []
+        self._condition = threading.Condition()
+
+    @property
+    def joinable(self) -> bool:
+        return not self.done and not self.token.cancelled
+
+    @property
+    def complete(self) -> bool:
+        """Whether every chunk was produced."""
+        return self.done and self.error is None
+
+    def add(self, token: CancelToken) -> None:
+        """Registers a subscriber; the shared deadline becomes the latest."""
+        with self._condition:
+            self._subscribers.append(token)
+            if token.deadline is None or self.token.deadline is None:
+                self.token.deadline = None
+            else:
+                self.token.deadline = max(self.token.deadline, token.deadline)
+        token.on_cancel(self._wake)
+
+    def read(self, token: CancelToken) -> Iterator:
+        """Yields every chunk of the generation for one subscriber."""
+        index = 0
+        try:
+            while True:
+                token.check()
+                pull = False
+                with self._condition:
+                    while (
+                        index == len(self.chunks)
+                        and not self.done
+                        and self._pulling
+                        and not token.cancelled
+                    ):
+                        self._condition.wait(token.remaining())
+                    if index < len(self.chunks):
+                        chunk = self.chunks[index]
+                    elif self.done:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    elif not self._pulling and not token.cancelled:
+                        self._pulling = pull = True
+                if pull:
+                    self._pull()
+                elif not token.cancelled:
+                    index += 1
+                    yield chunk
+        finally:
+            self._leave(token)
+
+    def _pull(self) -> None:
+        chunk = error = None
+        done = False
+        try:
+            if self._source is None:
+                self._source = iter(self._start(self.token))
+            chunk = next(self._source)
+        except StopIteration:
+            done = True
+        except BaseException as e:
+            done, error = True, e
+        with self._condition:
+            if done:
+                self.done, self.error = True, error
+            else:
+                self.chunks.append(chunk)
+            self._pulling = False
+            self._condition.notify_all()
+
+    def _wake(self) -> None:
+        with self._condition:
+            self._condition.notify_all()
+            subscribers = list(self._subscribers)
+        if subscribers and all(t.cancelled for t in subscribers):
+            # Nobody is left who wants the audio.
+            self.token.cancel(subscribers[-1].reason or CLIENT)
+
+    def _leave(self, token: CancelToken) -> None:
+        with self._condition:
+            self._subscribers.remove(token)
+            abandoned = not self._subscribers and not self.done
+            if abandoned:
+                # Anyone reading it later must not take it for complete.
+                self.done, self.error = True, Cancelled(token.reason or CLIENT)
+        if abandoned:
+            self.token.cancel(token.reason or CLIENT)
+            close = getattr(self._source, "close", None)
+            if close is not None:
+                # Nobody is pulling: the last reader was the one leaving.
+                close()
+
+
+class SingleFlight:
+    """Routes identical requests, by key, to one shared generation."""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+
+    def join(
+        self, key: str, start: Source, token: Optional[CancelToken] = None
+    ) -> Tuple[Iterator, bool]:
+        """Subscribes to the generation for ``key``, starting it if needed.
+
+        Args:
+            key: Identity of the request; equal keys share a generation.
+            start: Starts the generation, given the shared cancel token.
+            token: The subscriber's own token. Cancelling it stops this
+                subscriber, and the generation once no one else wants it.
+
+        Returns:
+            The chunks, and whether an already running generation is shared.
+        """
+        token = token or CancelToken()
+        with self._lock:
+            flight = self._flights.get(key)
+            shared = flight is not None and flight.joinable
+            if not shared:
+                timeout = token.remaining()
+                flight = Flight(key, start, CancelToken(timeout))
+                self._flights[key] = flight
+            flight.add(token)
+        return self._read(flight, token), shared
+
+    def _read(self, flight: Flight, token: CancelToken) -> Iterator:
+        try:
+            yield from flight.read(token)
+        finally:
+            with self._lock:
+                if flight.done and self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(flight.joinable for flight in self._flights.values())
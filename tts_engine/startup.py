@@ -0,0 +1,114 @@
+"""Background model loading with staged readiness reporting."""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger("tts-server")
+
+IMPORTING = "importing"
+READING_WEIGHTS = "reading_weights"
+TOKENIZER = "tokenizer"
+WARMUP = "warmup"
+PHASES = (IMPORTING, READING_WEIGHTS, TOKENIZER, WARMUP)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class StartupState:
+    """Records which load phase is running and how long each one took.
+
+    The loader thread moves through ``PHASES`` with :meth:`phase`; request
+    handlers read :meth:`to_dict` to report progress while the model loads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.status = PENDING
+            self.current: Optional[str] = None
+            self.timings: "OrderedDict[str, float]" = OrderedDict()
+            self.error: Optional[str] = None
+            self.started_at: Optional[float] = None
+            self.finished_at: Optional[float] = None
+            self._ready.clear()
+
+    def start(self) -> None:
+        with self._lock:
+            self.status = LOADING
+            self.started_at = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times one load phase and marks it as the current one.
+
+        A phase that raises stays current so failures report where they
+        happened.
+        """
+        with self._lock:
+            self.current = name
+            started = time.perf_counter()
+        logger.info(f"Startup phase: {name}")
+        yield
+        with self._lock:
+            self.timings[name] = time.perf_counter() - started
+            self.current = None
+
+    def mark_ready(self) -> None:
+        with self._lock:
+            self.status = READY
+            self.finished_at = time.perf_counter()
+        self._ready.set()
+        logger.info(f"Startup complete: {self.summary()}")
+
+    def mark_failed(self, error: Exception) -> None:
+        with self._lock:
+            self.status = FAILED
+            self.error = str(error)
+            self.finished_at = time.perf_counter()
+        self._ready.set()
+        logger.error(f"Startup failed during {self.current or 'load'}: {error}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until loading finished (successfully or not)."""
+        return self._ready.wait(timeout)
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    def summary(self) -> str:
+        parts = [f"{name} {seconds:.2f}s" for name, seconds in self.timings.items()]
+        return ", ".join(parts) + f" (total {self.elapsed:.2f}s)"
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            info: Dict[str, Any] = {
+                "status": self.status,
+                "phase": self.current,
+                "progress": (
+                    1.0
+                    if self.status == READY
+                    else round(len(self.timings) / len(PHASES), 4)
+                ),
+                "elapsed_seconds": round(self.elapsed, 4),
+                "phases": {
+                    name: round(seconds, 4) for name, seconds in self.timings.items()
+                },
+            }
+            if self.error is not None:
+                info["error"] = self.error
+            return info
@@ -0,0 +1,167 @@
+"""Content-addressed on-disk cache of synthesized audio."""
+
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger("tts-server")
+
+_SUFFIX = ".flac"
+
+
+def cache_key(params: Dict[str, Any]) -> str:
+    """Hashes every parameter that influences the generated audio."""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=256)
+def _digest(real_path: str, mtime_ns: int, size: int) -> str:
+    sha = hashlib.sha256()
+    with open(real_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """Returns the sha256 of a file, memoized on path, mtime and size."""
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+    return _digest(real_path, st.st_mtime_ns, st.st_size)
+
+
+class SynthesisCache:
+    """Stores generated audio as FLAC files named by their cache key.
+
+    Entries are evicted least-recently-used first once the directory grows
+    past ``max_bytes``; hits refresh the file's mtime so recency survives
+    restarts. A ``max_bytes`` of zero disables the cache.
+
+    Args:
+        directory: Where cache files live; created on first use.
+        max_bytes: Size cap across all entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _load_index(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(_SUFFIX):
+                st = entry.stat()
+                key = entry.name[: -len(_SUFFIX)]
+                found.append((st.st_mtime_ns, key, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def __contains__(self, key: str) -> bool:
+        """Whether audio is stored for a key; not counted as a hit or miss."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            self._load_index()
+            return key in self._entries
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Returns ``(audio, sample_rate)`` for a key, or None on a miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._load_index()
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            path = self._path(key)
+            try:
+                os.utime(path)
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                self._bytes -= self._entries.pop(key)
+                return None
+        audio, sample_rate = sf.read(io.BytesIO(data), dtype="float32")
+        return audio, sample_rate
+
+    def put(self, key: str, audio: np.ndarray, sample_rate: int) -> None:
+        """Stores audio under a key, evicting old entries past the cap."""
+        if not self.enabled or len(audio) == 0:
+            return
+        buffer = io.BytesIO()
+        sf.write(buffer, audio, sample_rate, format="FLAC", subtype="PCM_24")
+        data = buffer.getvalue()
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            self._load_index()
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write synthesis cache entry: {e}")
+                return
+            self._bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.enabled:
+                self._load_index()
+            return {
+                "enabled": self.enabled,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,225 @@
+"""Opt-in per-request stage tracing.
+
+A :class:`Trace` collects timed spans for one request and renders them as a
+``Server-Timing`` header value or as Chrome trace-event JSON (load it in
+``chrome://tracing`` or Perfetto). Untraced requests get :data:`NULL_TRACE`,
+whose methods do nothing, so instrumented code pays almost nothing when
+tracing is off.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger("tts-server")
+
+QUEUE = "queue"
+GENERATE = "generate"
+CONVERT = "convert"
+
+
+class Span(NamedTuple):
+    name: str
+    start: float
+    end: float
+    thread: str
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Trace:
+    """Timed spans of one request.
+
+    Timestamps come from ``time.monotonic`` so they line up with the
+    scheduler's ticket timestamps.
+    """
+
+    enabled = True
+
+    def __init__(self, name: str, sampled: bool = False):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.sampled = sampled
+        self.started = time.monotonic()
+        self.spans: List[Span] = []
+        self._tickets: List[Any] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, thread: Optional[str] = None):
+        span = Span(name, start, end, thread or threading.current_thread().name)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.monotonic())
+
+    def ticket(self, ticket: Any) -> Any:
+        """Registers a scheduler ticket to report its queue and generate time."""
+        with self._lock:
+            self._tickets.append(ticket)
+        return ticket
+
+    def finish(self) -> None:
+        """Adds spans for registered tickets that have completed."""
+        with self._lock:
+            tickets, self._tickets = self._tickets, []
+        for t in tickets:
+            if t.started_at is None or t.finished_at is None:
+                continue
+            self.add(QUEUE, t.submitted_at, t.started_at, "scheduler")
+            self.add(GENERATE, t.started_at, t.finished_at, "scheduler")
+            if t.convert_seconds:
+                # Conversion is spread over the generation; shown as one block.
+                end = t.finished_at
+                self.add(CONVERT, end - t.convert_seconds, end, "scheduler")
+
+    def totals(self) -> "OrderedDict[str, float]":
+        """Seconds per stage name, summed over spans, in first-seen order."""
+        totals: "OrderedDict[str, float]" = OrderedDict()
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        for span in spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def server_timing(self) -> str:
+        """Renders stage totals as a ``Server-Timing`` header value."""
+        parts = [
+            f"{name};dur={seconds * 1000:.1f}"
+            for name, seconds in self.totals().items()
+        ]
+        total = (time.monotonic() - self.started) * 1000
+        parts.append(f"total;dur={total:.1f}")
+        return ", ".join(parts)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Returns the spans as Chrome trace-event JSON."""
+        with self._lock:
+            spans = list(self.spans)
+        threads: Dict[str, int] = {}
+        events = []
+        for span in sorted(spans, key=lambda s: s.start):
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": round((span.start - self.started) * 1e6, 1),
+                    "dur": round(span.duration * 1e6, 1),
+                    "pid": 1,
+                    "tid": tid,
+                }
+            )
+        for thread, tid in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {"name": thread},
+                }
+            )
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.id, "request": self.name},
+        }
+
+
+class _NullTrace:
+    enabled = False
+    id = None
+    sampled = False
+
+    def add(self, *args, **kwargs) -> None:
+        pass
+
+    def span(self, name: str):
+        return _NULL_SPAN
+
+    def ticket(self, ticket: Any) -> Any:
+        return ticket
+
+    def finish(self) -> None:
+        pass
+
+    def server_timing(self) -> str:
+        return ""
+
+
+_NULL_SPAN = nullcontext()
+NULL_TRACE = _NullTrace()
+
+
+class Tracer:
+    """Decides which requests are traced and keeps the recent traces.
+
+    Args:
+        always: Trace every request.
+        sample_rate: Fraction of requests to trace and dump as Chrome JSON.
+        dump_dir: Directory for Chrome trace files; sampled requests are not
+            dumped without it.
+        keep: Finished traces kept for lookup by id.
+    """
+
+    def __init__(
+        self,
+        always: bool = False,
+        sample_rate: float = 0.0,
+        dump_dir: Optional[str] = None,
+        keep: int = 256,
+    ):
+        self.always = always
+        self.sample_rate = sample_rate
+        self.dump_dir = dump_dir
+        self._recent: "deque[Trace]" = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def start(self, name: str, requested: bool = False):
+        """Returns a new trace, or NULL_TRACE when the request is not traced."""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not (requested or sampled or self.always):
+            return NULL_TRACE
+        return Trace(name, sampled=sampled)
+
+    def finish(self, trace) -> None:
+        if not trace.enabled:
+            return
+        trace.finish()
+        with self._lock:
+            self._recent.append(trace)
+        if trace.sampled and self.dump_dir:
+            self.dump(trace)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            for trace in self._recent:
+                if trace.id == trace_id:
+                    return trace
+        return None
+
+    def dump(self, trace: Trace) -> Optional[str]:
+        path = os.path.join(self.dump_dir, f"{trace.name}-{trace.id}.json")
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(trace.to_chrome(), f)
+        except OSError as e:
+            logger.warning(f"Could not write trace {path}: {e}")
+            return None
+        return path
@@ -0,0 +1,130 @@
+"""Streaming prompt-echo and silence trimming.
+
+Both trims work chunk by chunk. Only the current run of quiet frames is
+held back (it may turn out to be trailing silence), never the utterance.
+"""
+
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+_EMPTY = np.zeros(0, dtype=np.float32)
+
+
+def drop_leading(chunks: Iterable[np.ndarray], samples: int) -> Iterator[np.ndarray]:
+    """Yields ``chunks`` without their first ``samples`` samples.
+
+    Used to cut the reference prompt some cloning models echo back before
+    the requested text.
+    """
+    remaining = max(0, int(samples))
+    for chunk in chunks:
+        if remaining:
+            skipped = min(remaining, len(chunk))
+            remaining -= skipped
+            chunk = chunk[skipped:]
+            if not len(chunk):
+                continue
+        yield chunk
+
+
+class SilenceTrimmer:
+    """Removes leading and trailing silence from a stream of float32 audio.
+
+    Audio is split into fixed frames whose mean power is compared with a
+    threshold in one vectorized pass per chunk. Frames before the first
+    loud frame are dropped, and a run of quiet frames is held until a loud
+    frame follows it or the stream ends. ``pad_ms`` of silence is kept on
+    each side so onsets and decays are not clipped.
+
+    Args:
+        sample_rate: Sample rate of the audio.
+        threshold_db: Frames quieter than this (dBFS, mean power) are silent.
+        frame_ms: Analysis frame length.
+        pad_ms: Silence kept before the first and after the last loud frame.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        threshold_db: float = -50.0,
+        frame_ms: float = 10.0,
+        pad_ms: float = 30.0,
+    ):
+        self.frame = max(1, int(sample_rate * frame_ms / 1000))
+        self.pad = max(0, int(sample_rate * pad_ms / 1000))
+        self.threshold = 10 ** (threshold_db / 10)
+        self._partial = _EMPTY
+        self._started = False
+        # Before the onset: the latest quiet audio, capped at the pad length.
+        self._lead = _EMPTY
+        # After the onset: quiet audio since the last loud frame.
+        self._held: List[np.ndarray] = []
+
+    def feed(self, chunk: np.ndarray) -> np.ndarray:
+        """Adds audio; returns the audio that is known not to be trimmed."""
+        data = np.concatenate([self._partial, np.asarray(chunk, np.float32)])
+        usable = len(data) - len(data) % self.frame
+        self._partial = data[usable:]
+        if not usable:
+            return _EMPTY
+        frames = data[:usable].reshape(-1, self.frame)
+        power = np.einsum("ij,ij->i", frames, frames) / self.frame
+        return self._emit(data[:usable], np.flatnonzero(power > self.threshold))
+
+    def flush(self) -> np.ndarray:
+        """Ends the stream; returns the remaining audio worth keeping."""
+        tail, self._partial = self._partial, _EMPTY
+        loud = np.zeros(0, dtype=np.int64)
+        if len(tail) and np.mean(tail * tail) > self.threshold:
+            loud = np.array([0])
+        # The partial frame counts as one frame of its own length.
+        out = self._emit(tail, loud, frame=max(1, len(tail)))
+        if not self._started:
+            return out
+        held = self._take_held()
+        return np.concatenate([out, held[: self.pad]])
+
+    def _emit(self, data: np.ndarray, loud: np.ndarray, frame: int = 0) -> np.ndarray:
+        frame = frame or self.frame
+        if not len(loud):
+            if self._started:
+                self._held.append(data)
+            else:
+                lead = np.concatenate([self._lead, data])
+                self._lead = lead[-self.pad :] if self.pad else _EMPTY
+            return _EMPTY
+
+        parts = []
+        start = 0
+        if not self._started:
+            self._started = True
+            start = loud[0] * frame
+            lead = np.concatenate([self._lead, data[:start]])
+            parts.append(lead[-self.pad :] if self.pad else _EMPTY)
+            self._lead = _EMPTY
+        else:
+            parts.append(self._take_held())
+        end = (loud[-1] + 1) * frame
+        parts.append(data[start:end])
+        if end < len(data):
+            self._held.append(data[end:])
+        return np.concatenate(parts)
+
+    def _take_held(self) -> np.ndarray:
+        held = np.concatenate(self._held) if self._held else _EMPTY
+        self._held = []
+        return held
+
+
+def trim_silence(
+    chunks: Iterable[np.ndarray], trimmer: SilenceTrimmer
+) -> Iterator[np.ndarray]:
+    """Yields ``chunks`` passed through ``trimmer``, skipping empty pieces."""
+    for chunk in chunks:
+        out = trimmer.feed(chunk)
+        if len(out):
+            yield out
+    out = trimmer.flush()
+    if len(out):
+        yield out
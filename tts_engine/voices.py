@@ -0,0 +1,280 @@
+"""Voice-clone reference ingestion and storage.
+
+Uploaded recordings are read block by block, checked for silence,
+clipping and noise, resampled once to the model's rate, trimmed and
+loudness-normalized, then stored as 16-bit mono WAV next to a JSON record.
+Clone requests load the stored clip with a single read and no resampling.
+"""
+
+import json
+import math
+import os
+import time
+import uuid
+from fractions import Fraction
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from tts_engine.trimming import SilenceTrimmer, trim_silence
+
+BLOCK_FRAMES = 65536
+FRAME_MS = 20.0
+# Frames quieter than this count as silence (matches the output trimmer).
+SILENCE_DB = -50.0
+# Samples at or above this magnitude count as clipped.
+CLIP_LEVEL = 0.999
+TARGET_SPEECH_DB = -20.0
+PEAK_CEILING_DB = -1.0
+
+MIN_SECONDS = 1.0
+# Longer uploads are rejected while they are read, before they are held in
+# memory; a compressed file within the size limit can decode to hours.
+MAX_SECONDS = 60.0
+MIN_SPEECH_RATIO = 0.05
+MAX_CLIPPED_RATIO = 0.001
+MIN_SNR_DB = 20.0
+
+VOICE_SUFFIX = ".voice.wav"
+
+
+class VoiceRejected(ValueError):
+    """The recording cannot be used as a clone reference."""
+
+    def __init__(self, problems: List[str], analysis: Dict[str, Any]):
+        super().__init__("; ".join(problems))
+        self.problems = problems
+        self.analysis = analysis
+
+
+def _db(power: float) -> float:
+    return 10 * math.log10(power) if power > 0 else -math.inf
+
+
+class AudioStats:
+    """Accumulates level statistics over mono blocks with vectorized math."""
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.frame = max(1, int(sample_rate * FRAME_MS / 1000))
+        self.samples = 0
+        self.peak = 0.0
+        self.clipped = 0
+        self.sum_squares = 0.0
+        self._frame_power: List[np.ndarray] = []
+        self._partial = np.zeros(0, dtype=np.float32)
+
+    def feed(self, block: np.ndarray) -> None:
+        if not len(block):
+            return
+        magnitude = np.abs(block)
+        self.samples += len(block)
+        self.peak = max(self.peak, float(magnitude.max()))
+        self.clipped += int(np.count_nonzero(magnitude >= CLIP_LEVEL))
+        self.sum_squares += float(np.dot(block, block))
+
+        data = np.concatenate([self._partial, block])
+        usable = len(data) - len(data) % self.frame
+        self._partial = data[usable:]
+        if usable:
+            frames = data[:usable].reshape(-1, self.frame)
+            self._frame_power.append(
+                np.einsum("ij,ij->i", frames, frames) / self.frame
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        power = (
+            np.concatenate(self._frame_power)
+            if self._frame_power
+            else np.zeros(0, dtype=np.float32)
+        )
+        silent = power <= 10 ** (SILENCE_DB / 10)
+        speech = power[~silent]
+        # Noise floor from the quietest frames, speech level from the loud
+        # ones; their gap estimates the recording's signal-to-noise ratio.
+        noise_db = _db(float(np.percentile(power, 10))) if len(power) else -math.inf
+        speech_db = _db(float(np.mean(speech))) if len(speech) else -math.inf
+        snr_db = speech_db - max(noise_db, -120.0)
+        return {
+            "duration": self.samples / self.sample_rate,
+            "peak_db": round(20 * math.log10(self.peak), 2) if self.peak else None,
+            "rms_db": _rounded(_db(self.sum_squares / max(1, self.samples))),
+            "speech_db": _rounded(speech_db),
+            "noise_db": _rounded(noise_db),
+            "snr_db": _rounded(snr_db),
+            "clipped_ratio": self.clipped / max(1, self.samples),
+            "speech_ratio": float(np.mean(~silent)) if len(power) else 0.0,
+        }
+
+
+def _rounded(value: float) -> Optional[float]:
+    return round(value, 2) if math.isfinite(value) else None
+
+
+def check(analysis: Dict[str, Any]) -> List[str]:
+    """Returns warnings; raises VoiceRejected for unusable recordings."""
+    problems = []
+    if analysis["speech_ratio"] < MIN_SPEECH_RATIO:
+        problems.append("recording is silent")
+    elif analysis["duration"] < MIN_SECONDS:
+        problems.append(f"recording is shorter than {MIN_SECONDS:g}s")
+    if problems:
+        raise VoiceRejected(problems, analysis)
+
+    warnings = []
+    if analysis["clipped_ratio"] > MAX_CLIPPED_RATIO:
+        warnings.append("clipping")
+    snr = analysis["snr_db"]
+    if snr is not None and snr < MIN_SNR_DB:
+        warnings.append("low_snr")
+    return warnings
+
+
+def resample(audio: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate or not len(audio):
+        return audio.astype(np.float32, copy=False)
+    from scipy.signal import resample_poly
+
+    ratio = Fraction(target_rate, source_rate)
+    out = resample_poly(audio, ratio.numerator, ratio.denominator)
+    return out.astype(np.float32)
+
+
+def normalize(audio: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, float]:
+    """Scales speech to TARGET_SPEECH_DB, keeping peaks under the ceiling.
+
+    Returns:
+        The scaled audio and the applied gain in dB.
+    """
+    stats = AudioStats(sample_rate)
+    stats.feed(audio)
+    speech_db = stats.summary()["speech_db"]
+    if speech_db is None:
+        return audio, 0.0
+    gain_db = TARGET_SPEECH_DB - speech_db
+    peak = float(np.max(np.abs(audio)))
+    if peak > 0:
+        gain_db = min(gain_db, PEAK_CEILING_DB - 20 * math.log10(peak))
+    return audio * np.float32(10 ** (gain_db / 20)), round(gain_db, 2)
+
+
+def load_voice(path: str, sample_rate: int) -> np.ndarray:
+    """Reads a voice clip as mono float32 at ``sample_rate``.
+
+    Multichannel files are downmixed, since a worker may be handed any
+    reference file and not only clips the store wrote.
+    """
+    audio, rate = sf.read(path, dtype="float32", always_2d=True)
+    return resample(audio.mean(axis=1), rate, sample_rate)
+
+
+def is_voice_file(path: str) -> bool:
+    return path.endswith(VOICE_SUFFIX)
+
+
+class VoiceStore:
+    """Pre-processed clone references, one WAV and one JSON record each.
+
+    Args:
+        directory: Where voices are stored; created on first use.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _record_path(self, voice_id: str) -> str:
+        return os.path.join(self.directory, f"{voice_id}.json")
+
+    def ingest(
+        self,
+        source: str,
+        sample_rate: int,
+        name: Optional[str] = None,
+        transcript: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Analyzes, converts and stores a recording.
+
+        Args:
+            source: Audio file in any format soundfile can read.
+            sample_rate: Rate to store the clip at (the model's rate).
+            name: Display name.
+            transcript: What is said in the recording, used as ref_text.
+
+        Returns:
+            The stored voice's record.
+
+        Raises:
+            VoiceRejected: If the recording is silent, too short or too long.
+            RuntimeError: If the file cannot be decoded (soundfile's error).
+        """
+        with sf.SoundFile(source) as f:
+            source_rate = f.samplerate
+            stats = AudioStats(source_rate)
+            blocks = []
+            for block in f.blocks(BLOCK_FRAMES, dtype="float32", always_2d=True):
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                stats.feed(mono)
+                if stats.samples > MAX_SECONDS * source_rate:
+                    problem = f"recording is longer than {MAX_SECONDS:g}s"
+                    raise VoiceRejected([problem], stats.summary())
+                blocks.append(mono)
+
+        analysis = stats.summary()
+        warnings = check(analysis)
+
+        audio = resample(np.concatenate(blocks), source_rate, sample_rate)
+        trimmed = list(trim_silence([audio], SilenceTrimmer(sample_rate)))
+        audio = np.concatenate(trimmed) if trimmed else audio
+        audio, gain_db = normalize(audio, sample_rate)
+
+        voice_id = uuid.uuid4().hex[:12]
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{voice_id}{VOICE_SUFFIX}")
+        sf.write(path, audio, sample_rate, subtype="PCM_16")
+        record = {
+            "id": voice_id,
+            "name": name or voice_id,
+            "transcript": transcript,
+            "path": path,
+            "sample_rate": sample_rate,
+            "duration": round(len(audio) / sample_rate, 3),
+            "source_sample_rate": source_rate,
+            "gain_db": gain_db,
+            "analysis": analysis,
+            "warnings": warnings,
+            "created": time.time(),
+        }
+        with open(self._record_path(voice_id), "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=2)
+        return record
+
+    def get(self, voice_id: str) -> Optional[Dict[str, Any]]:
+        if not voice_id.isalnum():
+            return None
+        try:
+            with open(self._record_path(voice_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return []
+        records = [self.get(n[: -len(".json")]) for n in names if n.endswith(".json")]
+        return sorted(
+            (r for r in records if r is not None), key=lambda r: r["created"]
+        )
+
+    def delete(self, voice_id: str) -> bool:
+        record = self.get(voice_id)
+        if record is None:
+            return False
+        for path in (record["path"], self._record_path(voice_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return True
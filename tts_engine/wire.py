@@ -0,0 +1,372 @@
+"""Wire formats and optional framing for streamed audio.
+
+Unframed streams are the bare encoded bytes. Framed streams wrap every
+piece in a fixed header so clients can see chunk boundaries and tell a
+clean end from a failure::
+
+    type:u8  seq:u32  sample_offset:u64  length:u32  payload[length]
+
+all little-endian. ``FRAME_AUDIO`` carries encoded audio, and the stream
+always closes with one ``FRAME_END`` or ``FRAME_ERROR`` frame whose payload
+is a small JSON object.
+
+PCM chunks are converted straight into a small ring of reusable buffers and
+yielded as memoryviews, with the frame header written in place in front of
+the payload. Small model steps can be coalesced into fewer, larger writes.
+"""
+
+import io
+import json
+import logging
+import struct
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+import soundfile as sf
+
+from tts_engine.cancellation import Cancelled
+from tts_engine.tracing import NULL_TRACE
+
+logger = logging.getLogger("tts-server")
+
+STREAM_FORMATS = {
+    "f32le": "application/octet-stream",
+    "s16le": "application/octet-stream",
+    "opus": "audio/ogg; codecs=opus",
+}
+DEFAULT_STREAM_FORMAT = "f32le"
+
+FRAMED_MEDIA_TYPE = "application/x-aura-tts-frames"
+FRAME_HEADER = struct.Struct("<BIQI")
+FRAME_AUDIO = 1
+FRAME_END = 2
+FRAME_ERROR = 3
+
+# sndfile.h SFC_SET_OGG_PAGE_LATENCY_MS (libsndfile >= 1.1). Without it Ogg
+# pages are only flushed about once a second.
+_SFC_SET_OGG_PAGE_LATENCY_MS = 0x1302
+OGG_PAGE_LATENCY_MS = 100.0
+
+# Buffers a packer rotates through before reusing one.
+POOL_SLOTS = 4
+_PCM_DTYPES = {"f32le": np.dtype("<f4"), "s16le": np.dtype("<i2")}
+
+
+class _ByteSink(io.RawIOBase):
+    """Write-only file object that hands encoder output to the caller."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        # libsndfile probes the length on open; the stream never rewinds.
+        return self._position
+
+    def read(self, size: int = -1) -> bytes:
+        return b""
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class StreamEncoder:
+    """Incrementally encodes float32 chunks into one stream format."""
+
+    def __init__(self, fmt: str, sample_rate: int):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported stream format: {fmt}")
+        self.fmt = fmt
+        self._sink = None
+        self._file = None
+        if fmt == "opus":
+            self._sink = _ByteSink()
+            self._file = sf.SoundFile(
+                self._sink, "w", sample_rate, 1, format="OGG", subtype="OPUS"
+            )
+            self._set_page_latency(OGG_PAGE_LATENCY_MS)
+
+    def _set_page_latency(self, latency_ms: float) -> None:
+        try:
+            from soundfile import _ffi, _snd
+
+            value = _ffi.new("double*", latency_ms)
+            _snd.sf_command(
+                self._file._file,
+                _SFC_SET_OGG_PAGE_LATENCY_MS,
+                value,
+                _ffi.sizeof("double"),
+            )
+        except Exception:
+            pass
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        if self.fmt == "f32le":
+            return np.asarray(audio, dtype="<f4").tobytes()
+        if self.fmt == "s16le":
+            clipped = np.clip(audio, -1.0, 1.0)
+            return (clipped * 32767).astype("<i2").tobytes()
+        self._file.write(np.asarray(audio, dtype=np.float32))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self._file is None:
+            return b""
+        self._file.close()
+        return self._sink.drain()
+
+
+def _exported(buffer: bytearray) -> bool:
+    """True if views of ``buffer`` are alive (it then refuses to resize)."""
+    if not buffer:
+        return False
+    try:
+        # Within the allocation, so this never reallocates.
+        buffer.append(buffer.pop())
+    except BufferError:
+        return True
+    return False
+
+
+class PcmPacker:
+    """Converts float32 chunks into pooled buffers, coalescing small ones.
+
+    Chunks are written at the end of the pending block with no intermediate
+    arrays; a block is handed out once it holds ``min_samples`` or more.
+    ``header_bytes`` are left free at the front of every block for a frame
+    header.
+
+    Returned views alias the pool. A slot comes round again ``slots`` blocks
+    later; if a view of it is still alive by then, the slot gets a fresh
+    buffer instead of being overwritten, so views stay valid for as long as
+    they are held and a consumer that drops them costs no allocations.
+
+    Args:
+        fmt: ``f32le`` or ``s16le``.
+        min_samples: Smallest block to emit; 0 emits every chunk.
+        header_bytes: Space reserved before the payload.
+        slots: Number of buffers in the pool.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        min_samples: int = 0,
+        header_bytes: int = 0,
+        slots: int = POOL_SLOTS,
+    ):
+        self.dtype = _PCM_DTYPES[fmt]
+        self.min_samples = min_samples
+        self.header_bytes = header_bytes
+        self.pending = 0
+        self._buffers = [bytearray() for _ in range(slots)]
+        self._slot = 0
+        # Typed view of the pending block's payload area.
+        self._out: Optional[np.ndarray] = None
+        self._scratch = np.empty(0, np.float32)
+
+    def _reserve(self, samples: int) -> np.ndarray:
+        needed = self.pending + samples
+        if self._out is not None and len(self._out) >= needed:
+            return self._out
+        buffer = self._buffers[self._slot]
+        if self._out is None and _exported(buffer):
+            # A consumer still holds an old block from this slot.
+            buffer = bytearray()
+        size = self.header_bytes + needed * self.dtype.itemsize
+        if len(buffer) < size:
+            grown = bytearray(max(size, 2 * len(buffer)))
+            if self.pending:
+                used = self.header_bytes + self.pending * self.dtype.itemsize
+                grown[:used] = memoryview(buffer)[:used]
+            self._out = None
+            buffer = grown
+        self._buffers[self._slot] = buffer
+        capacity = (len(buffer) - self.header_bytes) // self.dtype.itemsize
+        self._out = np.frombuffer(
+            buffer, self.dtype, count=capacity, offset=self.header_bytes
+        )
+        return self._out
+
+    def add(self, audio: np.ndarray) -> Optional[Tuple[memoryview, int]]:
+        """Appends ``audio``; returns ``(block, samples)`` once enough is pending."""
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim != 1:
+            audio = audio.reshape(-1)
+        count = len(audio)
+        if count:
+            out = self._reserve(count)[self.pending : self.pending + count]
+            if self.dtype.kind == "f":
+                out[:] = audio
+            else:
+                if len(self._scratch) < count:
+                    self._scratch = np.empty(count, np.float32)
+                clipped = np.clip(audio, -1.0, 1.0, out=self._scratch[:count])
+                np.multiply(clipped, 32767, out=out, casting="unsafe")
+            self.pending += count
+        if not self.pending or self.pending < self.min_samples:
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[Tuple[memoryview, int]]:
+        """Returns whatever is pending as ``(block, samples)``, or None."""
+        if not self.pending:
+            return None
+        samples = self.pending
+        size = self.header_bytes + samples * self.dtype.itemsize
+        block = memoryview(self._buffers[self._slot])[:size]
+        self._slot = (self._slot + 1) % len(self._buffers)
+        self._out = None
+        self.pending = 0
+        return block, samples
+
+
+class Framer:
+    """Builds length-prefixed frames with sequence numbers and offsets."""
+
+    def __init__(self):
+        self.seq = 0
+        self.sample_offset = 0
+
+    def _frame(self, frame_type: int, payload: bytes) -> bytes:
+        header = FRAME_HEADER.pack(
+            frame_type, self.seq, self.sample_offset, len(payload)
+        )
+        self.seq += 1
+        return header + payload
+
+    def audio(self, payload: bytes, samples: int) -> bytes:
+        frame = self._frame(FRAME_AUDIO, payload)
+        self.sample_offset += samples
+        return frame
+
+    def audio_into(self, block: memoryview, samples: int) -> memoryview:
+        """Frames ``block`` in place; its first header-size bytes are reserved."""
+        FRAME_HEADER.pack_into(
+            block,
+            0,
+            FRAME_AUDIO,
+            self.seq,
+            self.sample_offset,
+            len(block) - FRAME_HEADER.size,
+        )
+        self.seq += 1
+        self.sample_offset += samples
+        return block
+
+    def end(self, info: Optional[Dict[str, Any]] = None) -> bytes:
+        body = {"status": "ok", "samples": self.sample_offset, **(info or {})}
+        return self._frame(FRAME_END, json.dumps(body).encode("utf-8"))
+
+    def error(self, message: str) -> bytes:
+        body = {"status": "error", "error": message}
+        return self._frame(FRAME_ERROR, json.dumps(body).encode("utf-8"))
+
+
+def encode_stream(
+    chunks: Iterable[np.ndarray],
+    fmt: str,
+    sample_rate: int,
+    framed: bool = False,
+    trace=NULL_TRACE,
+    coalesce_ms: float = 0.0,
+) -> Iterator[Union[bytes, memoryview]]:
+    """Encodes (and optionally frames) a stream of float32 audio chunks.
+
+    With ``coalesce_ms`` set, chunks after the first are held back until at
+    least that much audio is pending (or the stream ends), trading a little
+    latency for fewer, larger writes. The first chunk always goes out on its
+    own, so coalescing never delays the first audio.
+
+    PCM pieces are memoryviews into a :class:`PcmPacker` pool rather than
+    fresh bytes; ASGI servers send each one before pulling the next, so the
+    pool is reused without copies or allocations.
+
+    Errors raised by ``chunks`` are logged; framed streams additionally end
+    with an error frame so the client can tell a crash from completion.
+    Encoding time is recorded as ``encode`` spans on ``trace``.
+    """
+    encoder = StreamEncoder(fmt, sample_rate)
+    framer = Framer() if framed else None
+    pcm = fmt in _PCM_DTYPES
+    packer = PcmPacker(
+        fmt if pcm else "f32le",
+        header_bytes=FRAME_HEADER.size if pcm and framer is not None else 0,
+    )
+    coalesce = int(sample_rate * coalesce_ms / 1000)
+    unsent_samples = 0
+
+    def emit(packed) -> Optional[Union[bytes, memoryview]]:
+        nonlocal unsent_samples
+        if packed is None:
+            return None
+        block, samples = packed
+        # Later blocks wait for enough audio; the first one never does.
+        packer.min_samples = coalesce
+        if pcm:
+            return block if framer is None else framer.audio_into(block, samples)
+        with trace.span("encode"):
+            data = encoder.encode(np.frombuffer(block, np.float32))
+        unsent_samples += samples
+        if not data:
+            return None
+        piece = data if framer is None else framer.audio(data, unsent_samples)
+        unsent_samples = 0
+        return piece
+
+    try:
+        for audio in chunks:
+            with trace.span("encode"):
+                packed = packer.add(audio)
+            piece = emit(packed)
+            if piece is not None:
+                yield piece
+
+        piece = emit(packer.flush())
+        if piece is not None:
+            yield piece
+        with trace.span("encode"):
+            data = encoder.finish()
+        if data:
+            yield data if framer is None else framer.audio(data, unsent_samples)
+        if framer is not None:
+            yield framer.end()
+    except Cancelled as e:
+        logger.info(f"Stream stopped: {e}")
+        if framer is not None:
+            yield framer.error(str(e))
+    except Exception as e:
+        logger.error(f"Streaming generator error: {e}")
+        piece = emit(packer.flush())
+        if piece is not None:
+            yield piece
+        if framer is not None:
+            yield framer.error(str(e))
+
+
+def parse_frames(data: bytes):
+    """Splits a framed byte stream into ``(type, seq, offset, payload)``."""
+    frames = []
+    position = 0
+    while position < len(data):
+        frame_type, seq, offset, length = FRAME_HEADER.unpack_from(
+            data, position
+        )
+        position += FRAME_HEADER.size
+        payload = data[position : position + length]
+        frames.append((frame_type, seq, offset, payload))
+        position += length
+    return frames
@@ -0,0 +1,530 @@
+"""Model worker processes behind the server's scheduler.
+
+With a pool the server process is a router: each worker process loads its
+own copy of the model and runs one generation at a time, so N workers use
+N cores and a crash in generation takes down one worker, not the server.
+
+Requests go to the least-loaded ready worker over a pipe. Audio comes back
+through a per-worker shared-memory ring; only ``(position, length)`` is
+sent over the pipe, and the router copies each chunk out once. A worker
+that exits or stalls is restarted. Its in-flight requests fail, except
+those that had produced no audio yet, which are retried on another worker.
+"""
+
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+logger = logging.getLogger("tts-server")
+
+RING_BYTES = 16 * 1024 * 1024
+STALL_TIMEOUT_S = 300.0
+READY_TIMEOUT_S = 600.0
+# Consecutive crashes back off up to this long before the next restart.
+MAX_RESTART_DELAY_S = 30.0
+MONITOR_INTERVAL_S = 1.0
+
+# Worker states.
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+STOPPED = "stopped"
+
+_DONE = object()
+
+
+class WorkerCrashed(RuntimeError):
+    """The worker running a request exited or stopped responding."""
+
+
+class WorkerError(RuntimeError):
+    """Generation raised inside a worker."""
+
+
+class Chunk(NamedTuple):
+    """One piece of generated audio, shaped like a model result."""
+
+    audio: np.ndarray
+
+
+def _resolve(factory: str) -> Callable[..., Any]:
+    module, _, attr = factory.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+def _ring_view(shm: SharedMemory) -> np.ndarray:
+    return np.ndarray((shm.size // 4,), dtype=np.float32, buffer=shm.buf)
+
+
+def read_ring(ring: np.ndarray, position: int, length: int) -> np.ndarray:
+    """Copies ``length`` samples out of the ring starting at ``position``."""
+    start = position % len(ring)
+    first = min(length, len(ring) - start)
+    if first == length:
+        return ring[start : start + length].copy()
+    return np.concatenate([ring[start:], ring[: length - first]])
+
+
+class _RingWriter:
+    """Worker side of the ring: writes chunks once the router made room."""
+
+    def __init__(self, ring: np.ndarray, read_pos):
+        self.ring = ring
+        self.capacity = len(ring)
+        self.read_pos = read_pos
+        self.write_pos = 0
+        self._parent = os.getppid()
+
+    def write(self, audio: np.ndarray) -> Iterator[tuple]:
+        """Writes ``audio``, yielding ``(position, length)`` per piece."""
+        step = max(1, self.capacity // 2)
+        for offset in range(0, len(audio), step):
+            piece = audio[offset : offset + step]
+            n = len(piece)
+            while self.write_pos + n - self.read_pos.value > self.capacity:
+                if os.getppid() != self._parent:
+                    raise SystemExit("router exited")
+                time.sleep(0.001)
+            start = self.write_pos % self.capacity
+            first = min(n, self.capacity - start)
+            self.ring[start : start + first] = piece[:first]
+            self.ring[: n - first] = piece[first:]
+            yield self.write_pos, n
+            self.write_pos += n
+
+
+def worker_main(conn, ring_name: str, read_pos, factory: str, args: tuple) -> None:
+    """Entry point of a worker process."""
+    # Ctrl-C goes to the whole process group; the router shuts workers down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    shm = SharedMemory(ring_name, track=False)
+    ring = _RingWriter(_ring_view(shm), read_pos)
+    try:
+        model = _resolve(factory)(*args)
+    except Exception as e:
+        conn.send(("failed", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", getattr(model, "sample_rate", None)))
+
+    backlog = deque()
+    cancelled = set()
+
+    def control(current: Optional[int] = None) -> bool:
+        """Drains pending messages; returns True if ``current`` is cancelled."""
+        stop = False
+        while conn.poll():
+            msg = conn.recv()
+            if msg[0] == "cancel":
+                if msg[1] == current:
+                    stop = True
+                else:
+                    cancelled.add(msg[1])
+            else:
+                backlog.append(msg)
+        return stop
+
+    try:
+        while True:
+            msg = backlog.popleft() if backlog else conn.recv()
+            if msg[0] == "stop":
+                return
+            if msg[0] == "cancel":
+                cancelled.add(msg[1])
+                continue
+            _, request_id, kwargs = msg
+            if request_id in cancelled:
+                cancelled.discard(request_id)
+                conn.send(("done", request_id))
+                continue
+            results = model.generate(**kwargs)
+            try:
+                for result in results:
+                    audio = np.asarray(result.audio, dtype=np.float32).reshape(-1)
+                    for position, length in ring.write(audio):
+                        conn.send(("chunk", request_id, position, length))
+                    if control(request_id):
+                        break
+            except Exception as e:
+                conn.send(("error", request_id, f"{type(e).__name__}: {e}"))
+            else:
+                conn.send(("done", request_id))
+            finally:
+                getattr(results, "close", lambda: None)()
+    except (EOFError, OSError):
+        # The router went away.
+        return
+    finally:
+        shm.close()
+
+
+class PoolRequest:
+    """A request dispatched to a worker; its queue receives the audio."""
+
+    def __init__(self, request_id: int, worker: "_Worker"):
+        self.id = request_id
+        self.worker = worker
+        self.queue: "queue.Queue[Any]" = queue.Queue()
+        self.chunks = 0
+        self.finished = False
+
+
+class _Worker:
+    """Router-side handle for one worker process."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.state = STOPPED
+        self.process = None
+        self.conn = None
+        self.shm: Optional[SharedMemory] = None
+        self.ring: Optional[np.ndarray] = None
+        self.read_pos = None
+        self.requests: Dict[int, PoolRequest] = {}
+        self.send_lock = threading.Lock()
+        self.reader: Optional[threading.Thread] = None
+        self.dispatched = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.last_seen = time.monotonic()
+        self.error: Optional[str] = None
+
+    def send(self, msg) -> None:
+        with self.send_lock:
+            self.conn.send(msg)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "state": self.state,
+            "pid": self.process.pid if self.process is not None else None,
+            "in_flight": len(self.requests),
+            "dispatched": self.dispatched,
+            "restarts": self.restarts,
+            "error": self.error,
+        }
+
+
+class WorkerPool:
+    """Runs model generations on a set of worker processes.
+
+    Args:
+        size: Number of worker processes.
+        factory: ``"module:function"`` that builds the model inside a worker.
+        args: Arguments for ``factory``; must be picklable.
+        ring_bytes: Shared-memory ring size per worker.
+        stall_timeout: Seconds a busy worker may go without a message before
+            it is killed and restarted.
+        start_method: multiprocessing start method. "spawn" keeps workers
+            free of the router's threads and Metal state.
+        on_restart: Called with the worker index whenever a worker restarts.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        factory: str,
+        args: tuple = (),
+        ring_bytes: int = RING_BYTES,
+        stall_timeout: float = STALL_TIMEOUT_S,
+        start_method: str = "spawn",
+        on_restart: Optional[Callable[[int], None]] = None,
+    ):
+        self.factory = factory
+        self.args = args
+        self.ring_bytes = ring_bytes
+        self.stall_timeout = stall_timeout
+        self.on_restart = on_restart
+        self.sample_rate: Optional[int] = None
+        self._ctx = multiprocessing.get_context(start_method)
+        self._workers = [_Worker(i) for i in range(max(1, size))]
+        self._ids = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._monitor: Optional[threading.Thread] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._workers)
+
+    def start(self) -> None:
+        for worker in self._workers:
+            self._spawn(worker)
+        self._monitor = threading.Thread(
+            target=self._watch, name="tts-worker-monitor", daemon=True
+        )
+        self._monitor.start()
+
+    def _spawn(self, worker: _Worker) -> None:
+        shm = SharedMemory(create=True, size=self.ring_bytes)
+        read_pos = self._ctx.RawValue("q", 0)
+        router_end, worker_end = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(worker_end, shm.name, read_pos, self.factory, self.args),
+            name=f"tts-worker-{worker.index}",
+            daemon=True,
+        )
+        with self._cond:
+            worker.state = STARTING
+            worker.error = None
+            worker.shm, worker.ring, worker.read_pos = shm, _ring_view(shm), read_pos
+            worker.conn, worker.process = router_end, process
+            worker.last_seen = time.monotonic()
+        process.start()
+        worker_end.close()
+        worker.reader = threading.Thread(
+            target=self._read,
+            args=(worker, router_end),
+            name=f"tts-worker-{worker.index}-reader",
+            daemon=True,
+        )
+        worker.reader.start()
+
+    def _read(self, worker: _Worker, conn) -> None:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            worker.last_seen = time.monotonic()
+            kind = msg[0]
+            if kind == "chunk":
+                _, request_id, position, length = msg
+                audio = read_ring(worker.ring, position, length)
+                worker.read_pos.value = position + length
+                request = worker.requests.get(request_id)
+                if request is not None:
+                    request.queue.put(audio)
+            elif kind in ("done", "error"):
+                with self._cond:
+                    request = worker.requests.pop(msg[1], None)
+                    self._cond.notify_all()
+                if request is not None:
+                    request.finished = True
+                    request.queue.put(_DONE if kind == "done" else WorkerError(msg[2]))
+            elif kind == "ready":
+                with self._cond:
+                    worker.state = READY
+                    worker.crashes = 0
+                    if self.sample_rate is None:
+                        self.sample_rate = msg[1]
+                    self._cond.notify_all()
+                logger.info(f"Worker {worker.index} ready (pid {worker.process.pid})")
+            elif kind == "failed":
+                with self._cond:
+                    worker.state = FAILED
+                    worker.error = msg[1]
+                    self._cond.notify_all()
+                logger.error(f"Worker {worker.index} failed to start: {msg[1]}")
+        self._exited(worker)
+
+    def _exited(self, worker: _Worker) -> None:
+        process = worker.process
+        process.join(timeout=5)
+        with self._cond:
+            requests, worker.requests = worker.requests, {}
+            failed = worker.state == FAILED
+            if not failed:
+                worker.state = STOPPED
+            self._cond.notify_all()
+        worker.conn.close()
+        # The numpy view pins the mapping; drop it before closing.
+        worker.ring = None
+        worker.shm.close()
+        worker.shm.unlink()
+
+        error = WorkerCrashed(
+            f"Worker {worker.index} exited with code {process.exitcode}"
+        )
+        for request in requests.values():
+            request.finished = True
+            request.queue.put(error)
+        if self._closed or failed:
+            return
+
+        worker.crashes += 1
+        worker.restarts += 1
+        worker.error = str(error)
+        delay = min(MAX_RESTART_DELAY_S, 0.5 * 2 ** (worker.crashes - 1))
+        logger.error(f"{error}; restarting in {delay:.1f}s")
+        if self.on_restart is not None:
+            self.on_restart(worker.index)
+        time.sleep(delay)
+        if not self._closed:
+            self._spawn(worker)
+
+    def _watch(self) -> None:
+        while not self._closed:
+            time.sleep(MONITOR_INTERVAL_S)
+            now = time.monotonic()
+            for worker in self._workers:
+                idle = now - worker.last_seen
+                if worker.requests and idle > self.stall_timeout:
+                    logger.error(
+                        f"Worker {worker.index} stalled for {idle:.0f}s; killing it"
+                    )
+                    worker.process.kill()
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT_S) -> None:
+        """Blocks until at least one worker is ready.
+
+        Raises:
+            RuntimeError: If every worker failed to start or none became
+                ready in time.
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: any(w.state == READY for w in self._workers)
+                or all(w.state == FAILED for w in self._workers),
+                timeout,
+            )
+            if not ready:
+                raise RuntimeError("No model worker became ready in time")
+            if not any(w.state == READY for w in self._workers):
+                errors = "; ".join(w.error or "" for w in self._workers)
+                raise RuntimeError(f"Model workers failed to start: {errors}")
+
+    def submit(self, kwargs: Dict[str, Any], timeout: float = READY_TIMEOUT_S):
+        """Dispatches a generation to the least-loaded ready worker."""
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._closed
+                or any(w.state == READY for w in self._workers)
+                or all(w.state == FAILED for w in self._workers),
+                timeout,
+            )
+            ready = [w for w in self._workers if w.state == READY]
+            if self._closed or not ok or not ready:
+                raise WorkerCrashed("No model worker is available")
+            worker = min(ready, key=lambda w: (len(w.requests), w.dispatched))
+            request = PoolRequest(next(self._ids), worker)
+            worker.requests[request.id] = request
+            worker.dispatched += 1
+        try:
+            worker.send(("generate", request.id, kwargs))
+        except OSError as e:
+            with self._cond:
+                worker.requests.pop(request.id, None)
+            raise WorkerCrashed(f"Worker {worker.index} is gone: {e}") from e
+        return request
+
+    def cancel(self, request: PoolRequest) -> None:
+        """Asks the worker to stop ``request`` at its next chunk."""
+        if request.finished:
+            return
+        try:
+            request.worker.send(("cancel", request.id))
+        except OSError:
+            pass
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [w.to_dict() for w in self._workers]
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stops every worker; in-flight requests fail."""
+        self._closed = True
+        with self._cond:
+            self._cond.notify_all()
+        for worker in self._workers:
+            try:
+                worker.send(("stop",))
+            except (OSError, AttributeError):
+                pass
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.reader.join(timeout)
+
+
+def _portable(value: Any) -> Any:
+    # Framework arrays (e.g. decoded reference audio) travel as numpy.
+    if hasattr(value, "__array__") and not isinstance(value, np.ndarray):
+        return np.asarray(value)
+    return value
+
+
+class PooledModel:
+    """Model interface over a :class:`WorkerPool` for the scheduler.
+
+    ``generate()`` yields :class:`Chunk` results; closing the generator
+    (which the scheduler does on cancellation) cancels the request in its
+    worker.
+    """
+
+    # Tells the scheduler it may run several generations at once.
+    concurrent = True
+
+    def __init__(self, pool: WorkerPool):
+        self.pool = pool
+
+    @property
+    def sample_rate(self) -> Optional[int]:
+        return self.pool.sample_rate
+
+    def generate(self, **kwargs) -> Iterator[Chunk]:
+        kwargs = {k: _portable(v) for k, v in kwargs.items()}
+        return self._stream(kwargs)
+
+    def _stream(self, kwargs: Dict[str, Any]) -> Iterator[Chunk]:
+        for attempt in range(2):
+            request = self.pool.submit(kwargs)
+            try:
+                while True:
+                    item = request.queue.get()
+                    if item is _DONE:
+                        return
+                    if isinstance(item, BaseException):
+                        # Nothing was heard yet, so another worker can redo it.
+                        if isinstance(item, WorkerCrashed) and not request.chunks:
+                            if attempt == 0:
+                                logger.warning(f"{item}; retrying request")
+                                break
+                        raise item
+                    request.chunks += 1
+                    yield Chunk(item)
+            finally:
+                self.pool.cancel(request)
+
+
+class _MlxInputs:
+    """Converts numpy inputs from the router back to mlx arrays."""
+
+    def __init__(self, model):
+        self.model = model
+        self.sample_rate = model.sample_rate
+
+    def generate(self, **kwargs):
+        import mlx.core as mx
+
+        kwargs = {
+            k: mx.array(v) if isinstance(v, np.ndarray) else v
+            for k, v in kwargs.items()
+        }
+        return self.model.generate(**kwargs)
+
+
+def load_worker_model(model_id: str, warmup_kwargs: Optional[dict] = None):
+    """Worker factory for the server: loads and optionally warms a model."""
+    from tts_engine import loader
+
+    model, _ = loader.load_model(model_id)
+    model = _MlxInputs(model)
+    if warmup_kwargs:
+        for _ in model.generate(**warmup_kwargs):
+            pass
+    return model
@@ -1,20 +1,8 @@
 import argparse
-import os
-import sys
-from pathlib import Path
-import mlx.core as mx
-import soundfile as sf
-from mlx_audio.tts import utils, generate
 
+from mlx_audio.tts import generate
 
-def patch_load_model():
-    old_load_model = utils.load_model
-
-    def new_load_model(*args, **kwargs):
-        kwargs["strict"] = False
-        return old_load_model(*args, **kwargs)
-
-    utils.load_model = new_load_model
+from tts_engine.loader import load_model
 
 
 def main():
@@ -27,15 +15,15 @@ def main():
 
     model_path = "./Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
 
-    # Patch the utility to allow non-strict loading (ignore extra weights)
-    patch_load_model()
+    # The shared loader skips checkpoint tensors the model does not use, so
+    # mlx_audio no longer needs to be patched into non-strict loading.
+    model, _ = load_model(model_path, strict=False)
 
     print(f"Generating audio for: '{args.text}'...")
 
-    # Use the generate_audio function from mlx_audio.tts.generate
-    # It will use our patched load_model
+    # generate_audio accepts an already-loaded model instance
     generate.generate_audio(
-        model=model_path,
+        model=model,
         text=args.text,
         file_prefix=args.output.replace(".wav", ""),
         audio_format="wav",
@@ -1,22 +1,70 @@
-import io
+import json
 import os
 import sys
+import tempfile
 import time
 import logging
 import asyncio
+import threading
+import uuid
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
-from typing import Optional
-from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, Response
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi import (
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 import uvicorn
-import soundfile as sf
 import numpy as np
 
-from mlx_audio.tts.generate import generate_audio
-from mlx_audio.tts.utils import load_model
+from tts_engine.audio_codec import FORMATS, encode_audio, negotiate_format
+from tts_engine import loader
+from tts_engine.batching import BACKGROUND, BULK, INTERACTIVE, BatchScheduler
+from tts_engine.cancellation import (
+    ABANDONED,
+    CLIENT,
+    DEADLINE,
+    DISCONNECTED,
+    ActiveRequests,
+    Cancelled,
+    CancelToken,
+)
+from tts_engine.documents import PENDING, DocumentManager, split_paragraphs
+from tts_engine.executor import PipelineExecutor
+from tts_engine.jobs import FAILED, JobManager
+from tts_engine.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    RTF_BUCKETS,
+    MetricsRegistry,
+    current_rss_bytes,
+)
+from tts_engine.normalizer import normalize_text, resolve_rules
+from tts_engine.pipeline import synthesize_segments
+from tts_engine.ref_audio_cache import RefAudioCache
+from tts_engine.registry import ModelRegistry
+from tts_engine.segmenter import TextStream, estimate_tokens, segment_text
+from tts_engine.single_flight import SingleFlight
+from tts_engine.startup import IMPORTING, READING_WEIGHTS, WARMUP, StartupState
+from tts_engine.synthesis_cache import SynthesisCache, cache_key, file_digest
+from tts_engine.tracing import NULL_TRACE, Tracer
+from tts_engine.trimming import SilenceTrimmer, drop_leading, trim_silence
+from tts_engine.voices import VoiceRejected, VoiceStore, is_voice_file, load_voice
+from tts_engine.workers import PooledModel, WorkerPool
+from tts_engine.wire import (
+    DEFAULT_STREAM_FORMAT,
+    FRAMED_MEDIA_TYPE,
+    STREAM_FORMATS,
+    encode_stream,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -26,27 +74,437 @@ logging.basicConfig(
 )
 logger = logging.getLogger("tts-server")
 
-MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
+MODEL_ID = os.environ.get("TTS_MODEL", loader.DEFAULT_MODEL_ID)
 model_instance = None
 
+# Low-latency variant used when the queue backs up; requests may also ask
+# for any model in AVAILABLE_MODELS by id.
+FALLBACK_MODEL_ID = os.environ.get("TTS_FALLBACK_MODEL", loader.SMALL_MODEL_ID)
+AVAILABLE_MODELS = [
+    model_id.strip()
+    for model_id in os.environ.get(
+        "TTS_MODELS", f"{MODEL_ID},{FALLBACK_MODEL_ID}"
+    ).split(",")
+    if model_id.strip()
+]
+MODEL_BUDGET_MB = int(os.environ.get("TTS_MODEL_BUDGET_MB", 6144))
+# Pending generations at which requests without a model switch to the
+# fallback model, when they fit its model type; 0 disables the fallback.
+FALLBACK_QUEUE_DEPTH = int(os.environ.get("TTS_FALLBACK_QUEUE_DEPTH", 0))
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup logic
+# Short enough to finish in a second or two, long enough to compile every
+# kernel the first real request would otherwise wait on.
+WARMUP_TEXT = "Hello, this is a warm-up."
+WARMUP_ENABLED = os.environ.get("TTS_WARMUP", "1") != "0"
+
+# With TTS_WORKERS > 0 the default model runs in that many worker processes
+# and this process only routes requests to them.
+WORKERS = int(os.environ.get("TTS_WORKERS", 0))
+WORKER_STALL_S = float(os.environ.get("TTS_WORKER_STALL_S", 300))
+worker_pool: Optional[WorkerPool] = None
+
+startup = StartupState()
+
+
+# mlx_audio is imported on first use so the server can bind and answer
+# /health while the heavy import runs on the loader thread.
+def load_model(model_id: str, phase=None):
+    model, _ = loader.load_model(model_id, phase=phase)
+    return model
+
+
+def load_audio(path: str, sample_rate: int):
+    if WORKERS:
+        # The router never imports mlx; workers receive numpy audio.
+        return load_voice(path, sample_rate)
+    if is_voice_file(path):
+        # Ingested voices are stored ready to use at the model's rate.
+        import mlx.core as mx
+
+        return mx.array(load_voice(path, sample_rate))
+
+    from mlx_audio.tts.generate import load_audio as mlx_load_audio
+
+    return mlx_load_audio(path, sample_rate=sample_rate)
+
+
+def load_variant(model_id: str):
+    """Loads and warms an additional model for the registry."""
+    model = load_model(model_id)
+    if WARMUP_ENABLED:
+        try:
+            warm_up(model)
+        except Exception as e:
+            logger.warning(f"Warm-up synthesis failed for {model_id}: {e}")
+    return model
+
+
+# The default model is published through model_instance and pinned here so
+# it counts against the budget but is never evicted.
+model_registry = ModelRegistry(
+    load_variant,
+    budget_bytes=MODEL_BUDGET_MB * 1024 * 1024,
+    pinned=[MODEL_ID],
+)
+
+
+def get_model(model_id: Optional[str] = None):
+    """Returns the default model or a registry variant, loading it if needed."""
+    if model_id is None or model_id == MODEL_ID:
+        return model_instance
+    return model_registry.get(model_id)
+
+
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter(
+    "tts_requests_total", "Requests by endpoint and outcome.", ["endpoint", "outcome"]
+)
+REQUESTS_IN_FLIGHT = metrics.gauge(
+    "tts_requests_in_flight", "Requests currently being served.", ["endpoint"]
+)
+QUEUE_WAIT = metrics.histogram(
+    "tts_queue_wait_seconds", "Time generations wait in the scheduler queue."
+)
+TIME_TO_FIRST_AUDIO = metrics.histogram(
+    "tts_time_to_first_audio_seconds",
+    "Time from request to the first audio produced.",
+    ["endpoint"],
+)
+REQUEST_DURATION = metrics.histogram(
+    "tts_request_duration_seconds", "Total time to serve a request.", ["endpoint"]
+)
+AUDIO_SECONDS = metrics.counter(
+    "tts_audio_seconds_total", "Seconds of audio produced.", ["endpoint"]
+)
+REAL_TIME_FACTOR = metrics.histogram(
+    "tts_real_time_factor",
+    "Serving time per second of generated audio (cache hits excluded).",
+    ["endpoint"],
+    buckets=RTF_BUCKETS,
+)
+BYTES_STREAMED = metrics.counter(
+    "tts_streamed_bytes_total", "Encoded audio bytes sent.", ["endpoint"]
+)
+CANCELLATIONS = metrics.counter(
+    "tts_cancellations_total", "Requests cancelled, by reason.", ["reason"]
+)
+CANCELLED_GENERATIONS = metrics.counter(
+    "tts_cancelled_generations_total",
+    "Segment generations stopped by cancellation, by whether they had started.",
+    ["state"],
+)
+CANCELLED_COMPUTE = metrics.counter(
+    "tts_cancelled_compute_seconds_total",
+    "Generation time spent on segments that were then cancelled.",
+)
+SAVED_COMPUTE = metrics.counter(
+    "tts_saved_compute_seconds_total",
+    "Estimated generation time skipped thanks to cancellation.",
+)
+TEXT_CHARS = metrics.counter(
+    "tts_text_chars_total",
+    "Characters of request text as received and as spoken after normalization.",
+    ["endpoint", "stage"],
+)
+TEXT_TOKENS = metrics.counter(
+    "tts_text_tokens_total",
+    "Estimated tokens of request text as received and as spoken.",
+    ["endpoint", "stage"],
+)
+WORKER_RESTARTS = metrics.counter(
+    "tts_worker_restarts_total", "Model worker processes restarted after exiting."
+)
+
+
+def worker_states():
+    if worker_pool is None:
+        return None
+    states = [w["state"] for w in worker_pool.stats()]
+    return {(state,): states.count(state) for state in set(states)}
+
+
+metrics.gauge(
+    "tts_workers", "Model worker processes by state.", ["state"], fn=worker_states
+)
+
+REQUEST_TIMEOUT_S = float(os.environ.get("TTS_REQUEST_TIMEOUT_S", 0))
+# Seconds a request's first segment may wait for the model before the
+# request is dropped; 0 waits as long as the request timeout allows.
+START_TIMEOUT_S = float(os.environ.get("TTS_START_TIMEOUT_S", 0))
+# Cancel tokens of in-flight /stream and /generate requests.
+active_requests = ActiveRequests()
+
+
+class RequestTracker:
+    """Collects one request's metrics and records them when it finishes.
+
+    The tracker also owns the request's cancel token, registered under its
+    id until the request finishes, and its trace, if any.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        trace=NULL_TRACE,
+        request_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.endpoint = endpoint
+        self.trace = trace
+        self.request_id = request_id or uuid.uuid4().hex
+        self.token = CancelToken(timeout)
+        active_requests.register(self.request_id, self.token)
+        self.started = time.perf_counter()
+        self.first_audio_at: Optional[float] = None
+        self.audio_seconds = 0.0
+        self.outcome: Optional[str] = None
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+
+    def audio(self, seconds: float) -> None:
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+            TIME_TO_FIRST_AUDIO.observe(
+                self.first_audio_at - self.started, endpoint=self.endpoint
+            )
+        self.audio_seconds += seconds
+
+    def sent(self, nbytes: int) -> None:
+        BYTES_STREAMED.inc(nbytes, endpoint=self.endpoint)
+
+    def finish(self, outcome: str, generated: bool = True) -> None:
+        """Records the request once; later calls are ignored."""
+        if self.outcome is not None:
+            return
+        self.outcome = outcome
+        elapsed = time.perf_counter() - self.started
+        active_requests.unregister(self.request_id, self.token)
+        if self.token.reason is not None:
+            CANCELLATIONS.inc(reason=self.token.reason)
+        tracer.finish(self.trace)
+        REQUESTS_IN_FLIGHT.dec(endpoint=self.endpoint)
+        REQUESTS.inc(endpoint=self.endpoint, outcome=outcome)
+        REQUEST_DURATION.observe(elapsed, endpoint=self.endpoint)
+        if self.audio_seconds:
+            AUDIO_SECONDS.inc(self.audio_seconds, endpoint=self.endpoint)
+            if generated:
+                REAL_TIME_FACTOR.observe(
+                    elapsed / self.audio_seconds, endpoint=self.endpoint
+                )
+
+    def reject(self, error: HTTPException) -> None:
+        if error.status_code < 500:
+            self.finish("rejected")
+        else:
+            self.finish("error" if error.status_code == 500 else "unavailable")
+
+
+MAX_BATCH_SIZE = int(os.environ.get("TTS_MAX_BATCH_SIZE", 4))
+BATCH_WAIT_MS = float(os.environ.get("TTS_BATCH_WAIT_MS", 20))
+
+# Every generation goes through the scheduler so concurrent requests share
+# batched forward passes instead of contending for model_instance. Its
+# threads own the model; /stream and /ws/stream wait in its interactive
+# lane, /generate in the bulk lane and jobs and read-ahead in the
+# background lane.
+# Pool workers run one generation each, so the scheduler dispatches single
+# tickets on one thread per worker instead of batching.
+scheduler = BatchScheduler(
+    get_model,
+    max_batch_size=1 if WORKERS else MAX_BATCH_SIZE,
+    concurrency=max(1, WORKERS),
+    max_wait=BATCH_WAIT_MS / 1000,
+    on_start=lambda ticket: QUEUE_WAIT.observe(ticket.queue_wait),
+    on_cancel=lambda ticket: record_cancelled_generation(ticket),
+)
+
+
+PIPELINE_THREADS = int(os.environ.get("TTS_PIPELINE_THREADS", 64))
+
+# /stream bodies and /generate renders wait on the scheduler from these
+# threads, not from Starlette's shared pool, and hand their output to the
+# event loop through asyncio queues; /health and the rest stay responsive
+# however many long generations are running.
+pipelines = PipelineExecutor(max_workers=PIPELINE_THREADS)
+
+
+def record_cancelled_generation(ticket) -> None:
+    CANCELLED_GENERATIONS.inc(state=ticket.cancel_state)
+    CANCELLED_COMPUTE.inc(ticket.spent_seconds)
+    SAVED_COMPUTE.inc(ticket.saved_seconds)
+
+metrics.gauge(
+    "tts_queued_generations",
+    "Generations waiting for the scheduler.",
+    fn=lambda: scheduler.pending_count,
+)
+metrics.gauge(
+    "tts_model_load_seconds",
+    "Duration of the default model's startup load.",
+    fn=lambda: startup.elapsed if startup.finished_at is not None else None,
+)
+metrics.gauge(
+    "tts_model_load_phase_seconds",
+    "Duration of each startup phase.",
+    ["phase"],
+    fn=lambda: {(name,): seconds for name, seconds in list(startup.timings.items())},
+)
+metrics.gauge(
+    "process_resident_memory_bytes", "Resident memory size.", fn=current_rss_bytes
+)
+metrics.gauge(
+    "process_peak_resident_memory_bytes",
+    "Peak resident memory size.",
+    fn=loader.peak_rss_bytes,
+)
+
+REF_CACHE_MB = int(os.environ.get("TTS_REF_CACHE_MB", 256))
+
+# Saved voices are cloned over and over; decode and resample each file once.
+ref_audio_cache = RefAudioCache(
+    max_bytes=REF_CACHE_MB * 1024 * 1024,
+    loader=lambda path, sample_rate: load_audio(path, sample_rate),
+)
+
+VOICES_DIR = os.environ.get(
+    "TTS_VOICES_DIR", str(Path.home() / ".cache" / "aura-voice" / "voices")
+)
+VOICE_MAX_MB = int(os.environ.get("TTS_VOICE_MAX_MB", 50))
+voice_store = VoiceStore(VOICES_DIR)
+
+SEGMENT_MAX_TOKENS = int(os.environ.get("TTS_SEGMENT_MAX_TOKENS", 80))
+CROSSFADE_MS = float(os.environ.get("TTS_CROSSFADE_MS", 20))
+
+# Leading and trailing silence is trimmed unless a request opts out.
+TRIM_SILENCE = os.environ.get("TTS_TRIM_SILENCE", "1") != "0"
+SILENCE_THRESHOLD_DB = float(os.environ.get("TTS_SILENCE_THRESHOLD_DB", -50))
+
+SYNTHESIS_CACHE_DIR = os.environ.get(
+    "TTS_SYNTHESIS_CACHE_DIR",
+    str(Path.home() / ".cache" / "aura-voice" / "synthesis"),
+)
+SYNTHESIS_CACHE_MB = int(os.environ.get("TTS_SYNTHESIS_CACHE_MB", 512))
+# Cache hits are replayed through /stream in chunks of this many samples.
+REPLAY_CHUNK_SAMPLES = 24000
+# /stream holds model steps back until this much audio is pending (the first
+# chunk always goes out at once); 0 sends every step as it arrives.
+STREAM_COALESCE_MS = float(os.environ.get("TTS_STREAM_COALESCE_MS", 80))
+# Whether text normalization rules run when a request does not say. Off by
+# default: requests that do not opt in are spoken as written.
+NORMALIZE = os.environ.get("TTS_NORMALIZE", "0") != "0"
+
+synthesis_cache = SynthesisCache(
+    SYNTHESIS_CACHE_DIR, max_bytes=SYNTHESIS_CACHE_MB * 1024 * 1024
+)
+# Identical requests that overlap share one generation.
+flights = SingleFlight()
+
+# Requests are traced when they send "X-Trace: 1", when TTS_TRACE=1, or when
+# sampled; sampled traces are written to TTS_TRACE_DIR as Chrome JSON.
+tracer = Tracer(
+    always=os.environ.get("TTS_TRACE", "0") == "1",
+    sample_rate=float(os.environ.get("TTS_TRACE_SAMPLE", 0)),
+    dump_dir=os.environ.get("TTS_TRACE_DIR") or None,
+)
+
+
+def warm_up(model) -> None:
+    """Runs one short streaming synthesis to compile kernels ahead of time."""
+    req = TtsRequest(text=WARMUP_TEXT)
+    for _ in model.generate(**build_generation_kwargs(req, stream=True)):
+        pass
+
+
+def import_backend() -> None:
+    """Imports mlx and mlx_audio, a large part of a cold start."""
+    import mlx.core  # noqa: F401
+    import mlx_audio.tts.generate  # noqa: F401
+    import mlx_audio.tts.utils  # noqa: F401
+
+
+def load_resident_model():
+    """Loads and warms the default model in this process."""
+    with startup.phase(IMPORTING):
+        import_backend()
+
+    # Reports the reading_weights and tokenizer phases itself.
+    model = load_model(MODEL_ID, phase=startup.phase)
+
+    with startup.phase(WARMUP):
+        if WARMUP_ENABLED:
+            try:
+                warm_up(model)
+            except Exception as e:
+                logger.warning(f"Warm-up synthesis failed: {e}")
+    return model
+
+
+def start_worker_pool() -> PooledModel:
+    """Starts the model workers and returns the default model over them."""
+    global worker_pool
+    warmup_kwargs = None
+    if WARMUP_ENABLED:
+        warmup_kwargs = build_generation_kwargs(TtsRequest(text=WARMUP_TEXT), True)
+    worker_pool = WorkerPool(
+        WORKERS,
+        "tts_engine.workers:load_worker_model",
+        args=(MODEL_ID, warmup_kwargs),
+        stall_timeout=WORKER_STALL_S,
+        on_restart=lambda index: WORKER_RESTARTS.inc(),
+    )
+    worker_pool.start()
+    worker_pool.wait_ready()
+    return PooledModel(worker_pool)
+
+
+def load_model_in_background(cancelled: threading.Event) -> None:
+    """Loads, primes and warms the model, publishing it once it is ready."""
     global model_instance
+    startup.start()
     logger.info(f"Loading model: {MODEL_ID}...")
-    start_time = time.time()
     try:
-        # Load the model once
-        model_instance = load_model(MODEL_ID)
-        logger.info(f"Model loaded successfully in {time.time() - start_time:.2f}s")
+        if WORKERS:
+            # Each worker imports, loads and warms its own copy.
+            with startup.phase(READING_WEIGHTS):
+                model = start_worker_pool()
+        else:
+            model = load_resident_model()
     except Exception as e:
-        logger.error(f"Failed to load model: {e}")
+        startup.mark_failed(e)
+        return
+
+    if cancelled.is_set():
+        return
+    model_instance = model
+    model_registry.add(MODEL_ID, model)
+    startup.mark_ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global model_instance
+    # Bind right away; the model loads on a background thread and /health
+    # reports its progress until it is ready.
+    startup.reset()
+    scheduler.start()
+    cancelled = threading.Event()
+    threading.Thread(
+        target=load_model_in_background,
+        args=(cancelled,),
+        name="tts-model-loader",
+        daemon=True,
+    ).start()
 
     yield
 
     # Shutdown logic (cleanup if needed)
     logger.info("Shutting down TTS server...")
+    cancelled.set()
+    job_manager.shutdown()
+    document_manager.shutdown()
+    scheduler.shutdown()
+    if worker_pool is not None:
+        worker_pool.close()
+    model_registry.evict(MODEL_ID)
     model_instance = None
 
 
@@ -55,8 +513,9 @@ app = FastAPI(title="Qwen3 TTS Sidecar Server", lifespan=lifespan)
 
 class TtsRequest(BaseModel):
     text: str
-    output_path: str
-    file_prefix: str
+    # Kept for older clients; audio is no longer written to disk.
+    output_path: Optional[str] = None
+    file_prefix: Optional[str] = None
     voice: Optional[str] = None
     speed: Optional[float] = 1.0
     pitch: Optional[float] = 1.0
@@ -64,136 +523,1278 @@ class TtsRequest(BaseModel):
     instruct: Optional[str] = None
     ref_audio: Optional[str] = None
     ref_text: Optional[str] = None
+    # An ingested voice from POST /voices; fills ref_audio and ref_text.
+    voice_id: Optional[str] = None
     exaggeration: Optional[float] = 1.0
     cfg_scale: Optional[float] = 1.0
     ddpm_steps: Optional[int] = 30
+    split_sentences: Optional[bool] = True
+    cache: Optional[bool] = True
+    # /stream wire format: f32le, s16le or opus (Ogg); framed adds headers.
+    stream_format: Optional[str] = None
+    framed: Optional[bool] = False
+    # Minimum audio per /stream write; None uses TTS_STREAM_COALESCE_MS.
+    stream_coalesce_ms: Optional[float] = None
+    # One of AVAILABLE_MODELS; None uses the default (or the fallback model
+    # when the queue is deep).
+    model: Optional[str] = None
+    # Seconds before the server cancels the request; defaults to
+    # TTS_REQUEST_TIMEOUT_S (0 for none).
+    timeout: Optional[float] = None
+    # Seconds generation may wait to start before the request is dropped;
+    # defaults to TTS_START_TIMEOUT_S (0 for none).
+    start_timeout: Optional[float] = None
+    # None uses TTS_TRIM_SILENCE.
+    trim_silence: Optional[bool] = None
+    # Drop the reference prompt's length from the start of each cloned
+    # segment, for models that read the prompt back first.
+    trim_prompt_echo: Optional[bool] = False
+    # Text normalization: true/false for every rule, or {rule: bool} on top
+    # of TTS_NORMALIZE (see tts_engine.normalizer.RULES). Unset, and with
+    # TTS_NORMALIZE off (the default), no rule runs.
+    normalize: Optional[Union[bool, Dict[str, bool]]] = None
+
+
+# Request fields that never change the generated audio.
+CACHE_KEY_EXCLUDE = {
+    "text",
+    "model",
+    "output_path",
+    "file_prefix",
+    "ref_audio",
+    "voice_id",
+    "cache",
+    "stream_format",
+    "framed",
+    "stream_coalesce_ms",
+    "timeout",
+    "start_timeout",
+    # Keyed by the normalized text instead.
+    "normalize",
+}
+
+
+def request_timeout(req: TtsRequest) -> Optional[float]:
+    return req.timeout or REQUEST_TIMEOUT_S or None
+
+
+def request_start_by(req: TtsRequest) -> Optional[float]:
+    """Monotonic time by which the request's generation must start."""
+    timeout = req.start_timeout or START_TIMEOUT_S
+    return time.monotonic() + timeout if timeout else None
+
+
+def request_cache_key(req: TtsRequest, model_id: str) -> Optional[str]:
+    """Content address for a request, or None when caching is bypassed."""
+    if not req.cache or not synthesis_cache.enabled:
+        return None
+    return request_key(req, model_id)
+
+
+def flight_key(req: TtsRequest, model_id: str) -> Optional[str]:
+    """Single-flight key for a request; None when it asks for a fresh render."""
+    return request_key(req, model_id) if req.cache else None
+
+
+def request_key(req: TtsRequest, model_id: str) -> str:
+    """Identity of the audio a request produces, whatever its wire format."""
+    params = req.model_dump(exclude=CACHE_KEY_EXCLUDE)
+    params["text"] = " ".join(req.text.split())
+    params["ref_audio"] = file_digest(req.ref_audio) if req.ref_audio else None
+    params["model"] = model_id
+    # Server settings that shape the audio; cached audio outlives restarts.
+    trim = req.trim_silence if req.trim_silence is not None else TRIM_SILENCE
+    params["trim_silence"] = trim
+    params["silence_threshold_db"] = SILENCE_THRESHOLD_DB if trim else None
+    params["crossfade_ms"] = CROSSFADE_MS
+    params["segment_max_tokens"] = SEGMENT_MAX_TOKENS
+    return cache_key(params)
+
+
+def normalization_rules(req: TtsRequest) -> FrozenSet[str]:
+    try:
+        return resolve_rules(req.normalize, default=NORMALIZE)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def record_text(endpoint: str, spoken: str, received: str) -> None:
+    TEXT_CHARS.inc(len(received), endpoint=endpoint, stage="input")
+    TEXT_CHARS.inc(len(spoken), endpoint=endpoint, stage="spoken")
+    TEXT_TOKENS.inc(estimate_tokens(received), endpoint=endpoint, stage="input")
+    TEXT_TOKENS.inc(estimate_tokens(spoken), endpoint=endpoint, stage="spoken")
+
+
+def normalize_request(req: TtsRequest, endpoint: str) -> dict:
+    """Replaces ``req.text`` with its normalized form.
+
+    Returns:
+        Response headers reporting the characters and estimated tokens saved.
+    """
+    result = normalize_text(req.text, normalization_rules(req))
+    record_text(endpoint, result.text, req.text)
+    req.text = result.text
+    return {
+        "X-Text-Chars-Saved": str(result.chars_saved),
+        "X-Text-Tokens-Saved": str(result.tokens_saved),
+    }
+
+
+def normalized_segments(next_segment, rules: FrozenSet[str], endpoint: str):
+    """Normalizes a ``next_segment(wait)`` source one segment at a time."""
+
+    def next_normalized(wait: bool = True) -> Optional[str]:
+        while True:
+            segment = next_segment(wait)
+            if segment is None:
+                return None
+            text = normalize_text(segment, rules).text
+            record_text(endpoint, text, segment)
+            if text:
+                return text
+
+    return next_normalized
+
+
+def validate_model(req: TtsRequest) -> None:
+    if req.model is not None and req.model not in AVAILABLE_MODELS:
+        supported = ", ".join(AVAILABLE_MODELS)
+        raise HTTPException(status_code=400, detail=f"Supported models: {supported}")
+
+
+def apply_voice(req: TtsRequest) -> None:
+    """Points a request using ``voice_id`` at the stored voice.
+
+    Raises:
+        HTTPException: 404 for an unknown voice, 400 when the reference
+            audio file does not exist.
+    """
+    if req.voice_id is not None:
+        voice = voice_store.get(req.voice_id)
+        if voice is None:
+            raise HTTPException(status_code=404, detail="Voice not found")
+        req.ref_audio = voice["path"]
+        if not req.ref_text:
+            req.ref_text = voice["transcript"]
+    if req.ref_audio and not os.path.isfile(req.ref_audio):
+        raise HTTPException(
+            status_code=400, detail=f"Reference audio not found: {req.ref_audio}"
+        )
+
+
+# The request field each Qwen3-TTS model type cannot generate without.
+MODEL_TYPE_NEEDS = {
+    "voice_design": "instruct",
+    "custom_voice": "voice",
+    "base": "ref_audio",
+}
+
+
+def fits_model(req: TtsRequest, model_id: str) -> bool:
+    """Whether ``req`` carries what the type of ``model_id`` requires.
+
+    A model of unknown type never fits, so requests are only moved to a
+    model they are known to work with.
+    """
+    needs = MODEL_TYPE_NEEDS.get(loader.model_type(model_id))
+    return needs is not None and bool(getattr(req, needs))
+
+
+def select_model(req: TtsRequest, allow_fallback: bool = True) -> str:
+    """Picks the model id for a request.
+
+    An explicit ``model`` always wins. Otherwise the default model is used,
+    unless the scheduler queue is at least FALLBACK_QUEUE_DEPTH deep, in
+    which case the faster fallback model takes interactive requests that
+    fit its model type.
+    """
+    if req.model:
+        return req.model
+    if (
+        allow_fallback
+        and FALLBACK_QUEUE_DEPTH
+        and FALLBACK_MODEL_ID != MODEL_ID
+        and scheduler.pending_count >= FALLBACK_QUEUE_DEPTH
+        and fits_model(req, FALLBACK_MODEL_ID)
+    ):
+        return FALLBACK_MODEL_ID
+    return MODEL_ID
+
+
+def resolve_model(
+    req: TtsRequest, allow_fallback: bool = True
+) -> Tuple[str, object]:
+    """Returns the selected model id and model, loading it if needed.
+
+    A fallback model that cannot be loaded is skipped in favor of the
+    default; an explicitly requested one raises.
+    """
+    model_id = select_model(req, allow_fallback)
+    try:
+        return model_id, get_model(model_id)
+    except Exception as e:
+        if req.model or model_id == MODEL_ID:
+            raise
+        logger.warning(f"Fallback model {model_id} unavailable: {e}")
+        return MODEL_ID, model_instance
+
+
+class JobRequest(BaseModel):
+    items: List[TtsRequest]
+    format: Optional[str] = "wav"
+
+
+class DocumentRequest(TtsRequest):
+    # Paragraphs synthesized ahead of the one playing; None uses
+    # TTS_READ_AHEAD.
+    read_ahead: Optional[int] = None
+
+
+def etag_matches(
+    if_none_match: Optional[str], etag: str, stored: Callable[[], bool]
+) -> bool:
+    """Whether If-None-Match lets the client reuse ``etag``.
+
+    ``*`` only matches when ``stored()`` says the audio is in the cache;
+    otherwise the client has nothing to reuse.
+    """
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    if any(c.removeprefix("W/") == etag for c in candidates):
+        return True
+    return "*" in candidates and stored()
+
+
+def build_generation_kwargs(
+    req: TtsRequest, stream: bool, model=None, trace=NULL_TRACE
+) -> dict:
+    """Maps a request onto ``model.generate()`` arguments."""
+    gen_kwargs = dict(
+        text=req.text,
+        speed=req.speed if req.speed else 1.0,
+        cfg_scale=req.cfg_scale if req.cfg_scale else 1.5,
+        ddpm_steps=req.ddpm_steps if req.ddpm_steps else 20,
+        stream=stream,
+        instruct=req.instruct,
+    )
+
+    if req.voice:
+        gen_kwargs["voice"] = req.voice
+    if req.gender:
+        gen_kwargs["gender"] = req.gender
+    if req.pitch:
+        gen_kwargs["pitch"] = float(req.pitch)
+    if req.exaggeration:
+        gen_kwargs["exaggeration"] = float(req.exaggeration)
+
+    if req.ref_audio:
+        model = model if model is not None else model_instance
+        with trace.span("ref_audio"):
+            gen_kwargs["ref_audio"] = ref_audio_cache.get(
+                req.ref_audio, model.sample_rate
+            )
+        gen_kwargs["ref_text"] = req.ref_text
+
+    return gen_kwargs
+
+
+def synthesize_request(
+    req: TtsRequest,
+    stream: bool,
+    model_id: str = MODEL_ID,
+    model=None,
+    trace=NULL_TRACE,
+    token: Optional[CancelToken] = None,
+    next_segment: Optional[Callable[[bool], Optional[str]]] = None,
+    priority=BULK,
+    start_by: Optional[float] = None,
+):
+    """Yields audio for a request, segment by segment, with crossfaded seams.
+
+    Streaming requests start on the first sentence and queue each following
+    segment once the previous one is producing audio; non-streaming requests
+    submit every segment up front so the scheduler can batch them. Prompt
+    echo and silence are trimmed on the fly, for both kinds. With
+    ``next_segment`` (see :func:`synthesize_segments`) the text comes from
+    it as it is written, not from ``req.text``.
+
+    Segments are queued in the scheduler lane ``priority``; ``start_by``
+    applies to the first one, as the later ones follow its audio.
+    """
+    model = model if model is not None else get_model(model_id)
+    gen_kwargs = build_generation_kwargs(req, stream=stream, model=model, trace=trace)
+    if next_segment is not None:
+        segments = next_segment
+    elif req.split_sentences:
+        with trace.span("segment"):
+            segments = segment_text(req.text, max_tokens=SEGMENT_MAX_TOKENS)
+    else:
+        segments = [req.text]
+    fade_samples = int(model.sample_rate * CROSSFADE_MS / 1000)
+
+    echo_samples = 0
+    if req.trim_prompt_echo and gen_kwargs.get("ref_audio") is not None:
+        echo_samples = int(gen_kwargs["ref_audio"].shape[0])
+
+    tickets = []
+
+    def submit(kwargs):
+        nonlocal start_by
+        ticket = scheduler.submit(
+            kwargs, model=model_id, token=token, priority=priority, start_by=start_by
+        )
+        start_by = None
+        tickets.append(ticket)
+        trace.ticket(ticket)
+        return drop_leading(ticket, echo_samples) if echo_samples else ticket
+
+    def cancel():
+        for ticket in tickets:
+            if ticket.finished_at is None:
+                ticket.token.cancel(ABANDONED)
+
+    audio = synthesize_segments(
+        submit,
+        segments,
+        gen_kwargs,
+        fade_samples=fade_samples,
+        eager=not stream,
+        cancel=cancel,
+    )
+    trim = req.trim_silence if req.trim_silence is not None else TRIM_SILENCE
+    if trim:
+        trimmer = SilenceTrimmer(model.sample_rate, threshold_db=SILENCE_THRESHOLD_DB)
+        audio = trim_silence(audio, trimmer)
+    return audio
+
+
+def replay_chunks(audio: np.ndarray):
+    """Splits cached audio into chunks for streaming."""
+    for start in range(0, len(audio), REPLAY_CHUNK_SAMPLES):
+        yield audio[start : start + REPLAY_CHUNK_SAMPLES]
+
+
+def render_audio(
+    req: TtsRequest,
+    fmt: str,
+    model_id: str,
+    model,
+    trace=NULL_TRACE,
+    token: Optional[CancelToken] = None,
+    priority=BULK,
+    start_by: Optional[float] = None,
+) -> Tuple[bytes, float, str]:
+    """Synthesizes a request on a resolved model into one encoded file.
+
+    Returns:
+        The encoded audio, its duration in seconds and where it came from:
+        "ok" when generated, "cache_hit" from the synthesis cache or
+        "coalesced" from an identical request's generation.
+    """
+    with trace.span("cache"):
+        key = request_cache_key(req, model_id)
+        cached = synthesis_cache.get(key) if key else None
+    if cached is not None:
+        audio, sample_rate = cached
+        with trace.span("encode"):
+            data = encode_audio(audio, sample_rate, fmt)
+        return data, len(audio) / sample_rate, "cache_hit"
+
+    def generate(flight_token):
+        return synthesize_request(
+            req,
+            False,
+            model_id,
+            model,
+            trace,
+            flight_token,
+            priority=priority,
+            start_by=start_by,
+        )
+
+    chunks, shared = join_flight(req, model_id, generate, token)
+    chunks = list(chunks)
+    if not chunks:
+        raise Exception("No audio was generated")
+    audio = np.concatenate(chunks)
+    sample_rate = model.sample_rate
+    if key and not shared:
+        with trace.span("cache_write"):
+            synthesis_cache.put(key, audio, sample_rate)
+    with trace.span("encode"):
+        data = encode_audio(audio, sample_rate, fmt)
+    return data, len(audio) / sample_rate, "coalesced" if shared else "ok"
+
+
+def join_flight(
+    req: TtsRequest, model_id: str, generate, token: Optional[CancelToken]
+):
+    """Runs ``generate(token)``, or shares an identical one already running.
+
+    Returns:
+        The audio chunks and whether they come from another request's
+        generation.
+    """
+    key = flight_key(req, model_id)
+    if key is None:
+        return generate(token), False
+    return flights.join(key, generate, token)
+
+
+MAX_JOBS = int(os.environ.get("TTS_MAX_JOBS", 64))
+
+# Bulk exports run in the background against the resident model; items are
+# rendered concurrently so the scheduler can batch them, in its background
+# lane. Exports favor quality, so they never switch to the fallback model.
+job_manager = JobManager(
+    lambda req, fmt: render_audio(
+        req, fmt, *resolve_model(req, False), priority=BACKGROUND
+    )[:2],
+    workers=MAX_BATCH_SIZE,
+    max_jobs=MAX_JOBS,
+)
+
+READ_AHEAD = int(os.environ.get("TTS_READ_AHEAD", 2))
+MAX_DOCUMENTS = int(os.environ.get("TTS_MAX_DOCUMENTS", 32))
+DOCUMENT_TTL_S = float(os.environ.get("TTS_DOCUMENT_TTL_S", 600))
+
+
+def paragraph_audio(session, paragraph, token: CancelToken):
+    """Synthesizes one paragraph of a document session, or replays it.
+
+    Read-ahead runs in the scheduler's background lane until the cursor
+    reaches the paragraph; from then on its segments are interactive.
+    """
+    options, model_id = session.options
+    req = options.model_copy(update={"text": paragraph.text})
+    key = request_cache_key(req, model_id)
+    cached = synthesis_cache.get(key) if key else None
+    if cached is not None:
+        yield from replay_chunks(cached[0])
+        return
+
+    produced = []
+    for audio in synthesize_request(
+        req,
+        True,
+        model_id,
+        token=token,
+        priority=lambda: (
+            INTERACTIVE if session.cursor == paragraph.index else BACKGROUND
+        ),
+    ):
+        if key:
+            produced.append(audio)
+        yield audio
+    if produced:
+        sample_rate = get_model(model_id).sample_rate
+        synthesis_cache.put(key, np.concatenate(produced), sample_rate)
+
+
+# Long-form reading: paragraphs are synthesized ahead of each session's
+# cursor whenever nothing else is waiting for the model.
+document_manager = DocumentManager(
+    paragraph_audio,
+    idle=lambda: scheduler.pending_count == 0,
+    max_sessions=MAX_DOCUMENTS,
+    ttl=DOCUMENT_TTL_S,
+)
 
 
 @app.get("/health")
 async def health_check():
+    if model_instance is None:
+        raise HTTPException(status_code=503, detail=startup.to_dict())
+    health = {"status": "ready", "model": MODEL_ID, "startup": startup.to_dict()}
+    if worker_pool is not None:
+        health["workers"] = worker_pool.stats()
+    return health
+
+
+@app.get("/models")
+async def list_models():
+    return {
+        "default": MODEL_ID,
+        "fallback": FALLBACK_MODEL_ID,
+        "fallback_queue_depth": FALLBACK_QUEUE_DEPTH,
+        "available": AVAILABLE_MODELS,
+        **model_registry.stats(),
+    }
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "ref_audio": ref_audio_cache.stats(),
+        "synthesis": synthesis_cache.stats(),
+        "in_flight": len(flights),
+    }
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+def track_stream(
+    tracker: RequestTracker, chunks, encode, sample_rate: int, outcome: str = "ok"
+):
+    """Encodes /stream audio with ``encode``, recording audio, bytes and outcome.
+
+    ``outcome`` is recorded when the stream completes; only "ok" streams
+    count as generated for the real-time factor.
+    """
+    generated = outcome == "ok"
+
+    def tracked_chunks():
+        try:
+            for audio in chunks:
+                tracker.audio(len(audio) / sample_rate)
+                yield audio
+        except Cancelled:
+            tracker.finish("cancelled", generated=generated)
+            raise
+        except Exception:
+            tracker.finish("error", generated=generated)
+            raise
+
+    def tracked_bytes():
+        try:
+            for data in encode(tracked_chunks()):
+                tracker.sent(len(data))
+                yield data
+            tracker.finish(outcome, generated=generated)
+        finally:
+            # Closed before the end: the client went away.
+            tracker.finish("disconnected", generated=generated)
+
+    return tracked_bytes()
+
+
+async def cancel_on_disconnect(body, tracker: RequestTracker):
+    """Streams ``body``; if the client goes away first, cancels the request.
+
+    The sync body runs on a pipeline thread, so the cancellation is what
+    stops its generation rather than waiting for the model to finish.
+    """
+    completed = False
+    try:
+        async with aclosing(pipelines.iterate(body)) as pieces:
+            async for data in pieces:
+                yield data
+        completed = True
+    finally:
+        if not completed and tracker.outcome is None:
+            tracker.token.cancel(DISCONNECTED)
+
+
+DISCONNECT_POLL_S = 0.25
+
+
+async def run_until_disconnected(request: Request, fn, token: CancelToken):
+    """Runs ``fn`` on a pipeline thread, cancelling ``token`` on disconnect."""
+    future = pipelines.run(fn)
+    while True:
+        done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_S)
+        if done:
+            return future.result()
+        if not token.cancelled and await request.is_disconnected():
+            token.cancel(DISCONNECTED)
+
+
+@app.delete("/requests/{request_id}")
+async def cancel_request(request_id: str):
+    """Cancels in-flight /stream or /generate requests by their X-Request-Id."""
+    if not active_requests.cancel(request_id):
+        raise HTTPException(status_code=404, detail="Request not found")
+    return {"id": request_id, "status": "cancelled"}
+
+
+def trace_headers(trace) -> dict:
+    if not trace.enabled:
+        return {}
+    return {"Server-Timing": trace.server_timing(), "X-Trace-Id": trace.id}
+
+
+@app.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Returns a recent trace in Chrome trace-event format."""
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return dict(trace.to_chrome(), serverTiming=trace.server_timing())
+
+
+@app.post("/voices", status_code=201)
+async def create_voice(
+    request: Request, name: Optional[str] = None, transcript: Optional[str] = None
+):
+    """Ingests a clone reference sent as the raw request body.
+
+    The upload is spooled to disk as it arrives, then analyzed and stored at
+    the default model's sample rate. Silent, very short or over-long
+    recordings are rejected; clipping and background noise come back as
+    ``warnings``.
+    """
     if model_instance is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
-    return {"status": "ready", "model": MODEL_ID}
+    limit = VOICE_MAX_MB * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix=".upload") as upload:
+        size = 0
+        async for block in request.stream():
+            size += len(block)
+            if size > limit:
+                detail = f"Voice uploads are limited to {VOICE_MAX_MB} MB"
+                raise HTTPException(status_code=413, detail=detail)
+            upload.write(block)
+        if not size:
+            raise HTTPException(status_code=400, detail="Audio is required")
+        upload.flush()
+        try:
+            return await run_in_threadpool(
+                voice_store.ingest,
+                upload.name,
+                model_instance.sample_rate,
+                name,
+                transcript,
+            )
+        except VoiceRejected as e:
+            raise HTTPException(
+                status_code=422,
+                detail={"problems": e.problems, "analysis": e.analysis},
+            )
+        except RuntimeError as e:
+            raise HTTPException(status_code=415, detail=f"Unreadable audio: {e}")
+
+
+@app.get("/voices")
+async def list_voices():
+    return {"voices": voice_store.list()}
+
+
+@app.get("/voices/{voice_id}")
+async def get_voice(voice_id: str):
+    voice = voice_store.get(voice_id)
+    if voice is None:
+        raise HTTPException(status_code=404, detail="Voice not found")
+    return voice
+
+
+@app.delete("/voices/{voice_id}")
+async def delete_voice(voice_id: str):
+    if not voice_store.delete(voice_id):
+        raise HTTPException(status_code=404, detail="Voice not found")
+    return {"id": voice_id, "status": "deleted"}
 
 
 @app.post("/stream")
-async def stream_speech(req: TtsRequest):
+async def stream_speech(
+    req: TtsRequest,
+    x_trace: Optional[str] = Header(None),
+    x_request_id: Optional[str] = Header(None),
+):
+    """Streams speech for ``req.text`` as it is generated.
+
+    Text normalization is opt-in: unless the request sets ``normalize`` or
+    the server runs with TTS_NORMALIZE=1, the text is spoken as written and
+    X-Text-Chars-Saved is 0.
+    """
+    trace = tracer.start("stream", requested=x_trace == "1")
+    tracker = RequestTracker("stream", trace, x_request_id, request_timeout(req))
+    try:
+        return await start_stream(req, tracker)
+    except HTTPException as e:
+        tracker.reject(e)
+        raise
+    except Exception:
+        tracker.finish("error")
+        raise
+
+
+async def start_stream(req: TtsRequest, tracker: RequestTracker):
+    """Validates a /stream request and returns its streaming response."""
     if model_instance is None:
         raise HTTPException(status_code=503, detail="Model not loaded")
 
-    def generate_chunks():
-        try:
-            # Prepare arguments
-            gen_kwargs = dict(
-                text=req.text,
-                speed=req.speed if req.speed else 1.0,
-                cfg_scale=req.cfg_scale if req.cfg_scale else 1.5,
-                ddpm_steps=req.ddpm_steps if req.ddpm_steps else 20,
-                stream=True,
-                instruct=req.instruct,
-            )
+    start_by = request_start_by(req)
+    stream_format = request_stream_format(req)
+    coalesce_ms = stream_coalesce_ms(req)
+    validate_model(req)
+    apply_voice(req)
+    trace = tracker.trace
+    with trace.span("normalize"):
+        text_headers = normalize_request(req, tracker.endpoint)
 
-            if req.voice:
-                gen_kwargs["voice"] = req.voice
+    try:
+        with trace.span("resolve_model"):
+            model_id, model = await run_in_threadpool(resolve_model, req)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Model unavailable: {e}")
 
-            if req.ref_audio:
-                from mlx_audio.tts.generate import load_audio
+    with trace.span("cache"):
+        key = await run_in_threadpool(request_cache_key, req, model_id)
+        cached = await run_in_threadpool(synthesis_cache.get, key) if key else None
+    sample_rate = model.sample_rate
 
-                gen_kwargs["ref_audio"] = load_audio(
-                    req.ref_audio, sample_rate=model_instance.sample_rate
-                )
-                gen_kwargs["ref_text"] = req.ref_text
+    def generate_chunks(token):
+        logger.info(f"Starting model generation for: {req.text[:20]}...")
 
-            logger.info(f"Starting model generation for: {req.text[:20]}...")
+        produced = []
+        for audio_data in synthesize_request(
+            req,
+            True,
+            model_id,
+            model,
+            trace,
+            token,
+            priority=INTERACTIVE,
+            start_by=start_by,
+        ):
+            if key:
+                produced.append(audio_data)
+            yield audio_data
 
-            # This needs to be a real generator
-            for result in model_instance.generate(**gen_kwargs):
-                audio_data = np.array(result.audio).astype(np.float32)
-                yield audio_data.tobytes()
+        if produced:
+            with trace.span("cache_write"):
+                synthesis_cache.put(key, np.concatenate(produced), sample_rate)
+
+    if cached is not None:
+        chunks, outcome = replay_chunks(cached[0]), "cache_hit"
+    else:
+        with trace.span("single_flight"):
+            chunks, shared = await run_in_threadpool(
+                join_flight, req, model_id, generate_chunks, tracker.token
+            )
+        outcome = "coalesced" if shared else "ok"
+    content = track_stream(
+        tracker,
+        chunks,
+        lambda tracked: encode_stream(
+            tracked,
+            stream_format,
+            sample_rate,
+            framed=req.framed,
+            trace=trace,
+            coalesce_ms=coalesce_ms,
+        ),
+        sample_rate,
+        outcome,
+    )
+    return stream_response(
+        content,
+        tracker,
+        req,
+        stream_format,
+        sample_rate,
+        model_id,
+        {
+            "X-Cache": "HIT" if cached is not None else "MISS",
+            "X-Coalesced": "1" if outcome == "coalesced" else "0",
+            **text_headers,
+        },
+    )
 
-        except Exception as e:
-            logger.error(f"Streaming generator error: {e}")
 
+def stream_response(
+    content,
+    tracker: RequestTracker,
+    req: TtsRequest,
+    stream_format: str,
+    sample_rate: int,
+    model_id: str,
+    extra_headers: dict,
+) -> StreamingResponse:
+    """Wraps an encoded /stream body with the headers describing its audio."""
     headers = {
-        "X-Sample-Rate": "24000",
+        "X-Sample-Rate": str(sample_rate),
         "X-Channels": "1",
-        "X-Format": "f32le",
+        "X-Format": stream_format,
+        "X-Framing": "v1" if req.framed else "none",
+        **extra_headers,
+        "X-Model": model_id,
+        "X-Request-Id": tracker.request_id,
+        # Stages up to the first byte; the full trace is at /traces/{id}.
+        **trace_headers(tracker.trace),
     }
+    media_type = FRAMED_MEDIA_TYPE if req.framed else STREAM_FORMATS[stream_format]
     return StreamingResponse(
-        generate_chunks(),
-        media_type="application/octet-stream",
+        cancel_on_disconnect(content, tracker),
+        media_type=media_type,
         headers=headers,
     )
 
 
+def request_stream_format(req: TtsRequest) -> str:
+    stream_format = req.stream_format or DEFAULT_STREAM_FORMAT
+    if stream_format not in STREAM_FORMATS:
+        supported = ", ".join(STREAM_FORMATS)
+        raise HTTPException(
+            status_code=400, detail=f"Supported stream formats: {supported}"
+        )
+    return stream_format
+
+
+def stream_coalesce_ms(req: TtsRequest) -> float:
+    if req.stream_coalesce_ms is None:
+        return STREAM_COALESCE_MS
+    if req.stream_coalesce_ms < 0:
+        raise HTTPException(
+            status_code=400, detail="stream_coalesce_ms must not be negative"
+        )
+    return req.stream_coalesce_ms
+
+
+def socket_options(message: dict) -> TtsRequest:
+    """Validates the generation options of a /ws/stream ``start`` message."""
+    options = {k: v for k, v in message.items() if k not in ("type", "text")}
+    try:
+        req = TtsRequest(text="", **options)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    request_stream_format(req)
+    stream_coalesce_ms(req)
+    normalization_rules(req)
+    validate_model(req)
+    return req
+
+
+class Utterance:
+    """One stretch of speech on a /ws/stream socket.
+
+    Text written to :attr:`text` is synthesized as it becomes segmentable;
+    :meth:`speak` sends the framed audio once the previous utterance on the
+    socket has finished.
+    """
+
+    def __init__(self, req: TtsRequest):
+        self.req = req
+        self.text = TextStream(max_tokens=SEGMENT_MAX_TOKENS)
+        self.tracker = RequestTracker("ws", tracer.start("ws"))
+
+    def cancel(self, reason: str = CLIENT) -> None:
+        self.tracker.token.cancel(reason)
+        self.text.cancel()
+
+    async def speak(self, websocket: WebSocket, previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait({previous})
+        try:
+            await self._speak(websocket)
+        except (WebSocketDisconnect, RuntimeError):
+            # Sending failed: the socket is gone.
+            self.cancel(DISCONNECTED)
+            self.tracker.finish("disconnected")
+
+    async def _speak(self, websocket: WebSocket) -> None:
+        tracker = self.tracker
+        if tracker.token.cancelled:
+            tracker.finish("cancelled", generated=False)
+            return
+        req = self.req.model_copy()
+        fmt = req.stream_format or DEFAULT_STREAM_FORMAT
+        start_by = request_start_by(req)
+        try:
+            if model_instance is None:
+                raise HTTPException(status_code=503, detail="Model not loaded")
+            apply_voice(req)
+            model_id, model = await run_in_threadpool(resolve_model, req)
+        except HTTPException as e:
+            self.cancel()
+            tracker.reject(e)
+            await websocket.send_json({"type": "error", "error": e.detail})
+            return
+        except Exception as e:
+            self.cancel()
+            tracker.finish("unavailable")
+            await websocket.send_json(
+                {"type": "error", "error": f"Model unavailable: {e}"}
+            )
+            return
+        sample_rate = model.sample_rate
+
+        def chunks():
+            yield from synthesize_request(
+                req,
+                True,
+                model_id,
+                model,
+                tracker.trace,
+                tracker.token,
+                next_segment=normalized_segments(
+                    self.text.next_segment, normalization_rules(req), "ws"
+                ),
+                priority=INTERACTIVE,
+                start_by=start_by,
+            )
+
+        body = track_stream(
+            tracker,
+            chunks(),
+            lambda tracked: encode_stream(
+                tracked,
+                fmt,
+                sample_rate,
+                framed=True,
+                trace=tracker.trace,
+                coalesce_ms=stream_coalesce_ms(req),
+            ),
+            sample_rate,
+        )
+        try:
+            await websocket.send_json(
+                {
+                    "type": "started",
+                    "id": tracker.request_id,
+                    "model": model_id,
+                    "sample_rate": sample_rate,
+                    "format": fmt,
+                }
+            )
+            async with aclosing(pipelines.iterate(body)) as frames:
+                async for frame in frames:
+                    await websocket.send_bytes(bytes(frame))
+        finally:
+            if tracker.outcome is None:
+                self.cancel(DISCONNECTED)
+
+
+@app.websocket("/ws/stream")
+async def stream_socket(websocket: WebSocket):
+    """Speaks text while it is still being written, e.g. by an LLM.
+
+    Client messages are JSON objects:
+
+    - ``{"type": "start", ...}`` sets generation options (any /stream field
+      except ``text``) for the utterances that follow.
+    - ``{"type": "text", "text": "..."}`` appends text to the current
+      utterance, starting one if needed. Each sentence is synthesized as
+      soon as its end arrives.
+    - ``{"type": "flush"}`` synthesizes buffered text without waiting for
+      the end of its sentence.
+    - ``{"type": "end"}`` finishes the utterance.
+    - ``{"type": "cancel"}`` stops the utterance and drops unspoken text.
+
+    Each utterance is announced by a ``started`` message (id, model,
+    sample rate, format) followed by its audio as binary messages, one
+    frame of the /stream framing each, ending in an end frame, or in an
+    error frame if it was cancelled or failed. Utterances are spoken one
+    after another. Problems with a message are reported as
+    ``{"type": "error"}`` messages without closing the socket.
+    """
+    await websocket.accept()
+    options = TtsRequest(text="")
+    current: Optional[Utterance] = None
+    speaking: Optional[asyncio.Task] = None
+    utterances = []
+
+    async def error(message: str) -> None:
+        await websocket.send_json({"type": "error", "error": message})
+
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                kind = message.get("type") if isinstance(message, dict) else None
+            except ValueError:
+                await error("Messages must be JSON objects")
+                continue
+
+            if kind == "start":
+                if current is not None:
+                    await error("End or cancel the current utterance first")
+                    continue
+                try:
+                    options = socket_options(message)
+                except HTTPException as e:
+                    await error(e.detail)
+            elif kind == "text":
+                if not isinstance(message.get("text"), str):
+                    await error("text must be a string")
+                    continue
+                if current is None:
+                    current = Utterance(options)
+                    utterances = [u for u in utterances if u.tracker.outcome is None]
+                    utterances.append(current)
+                    speaking = asyncio.create_task(current.speak(websocket, speaking))
+                current.text.write(message["text"])
+            elif kind in ("flush", "end", "cancel"):
+                if current is None:
+                    continue
+                if kind == "flush":
+                    current.text.flush()
+                    continue
+                if kind == "end":
+                    current.text.close()
+                else:
+                    current.cancel()
+                current = None
+            else:
+                await error(f"Unknown message type: {kind}")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for utterance in utterances:
+            if utterance.tracker.outcome is None:
+                utterance.cancel(DISCONNECTED)
+        if speaking is not None:
+            await asyncio.wait({speaking})
+
+
+@app.post("/documents", status_code=201)
+async def create_document(doc_req: DocumentRequest):
+    """Opens a session for reading a long document paragraph by paragraph.
+
+    Paragraphs are separated by blank lines. Their audio is fetched from
+    /documents/{id}/paragraphs/{index}, with the following paragraphs
+    synthesized ahead of time.
+    """
+    if model_instance is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    read_ahead = READ_AHEAD if doc_req.read_ahead is None else doc_req.read_ahead
+    if read_ahead < 0:
+        raise HTTPException(status_code=400, detail="read_ahead must not be negative")
+    req = TtsRequest(**doc_req.model_dump(exclude={"read_ahead"}))
+    request_stream_format(req)
+    stream_coalesce_ms(req)
+    validate_model(req)
+    apply_voice(req)
+    normalize_request(req, "documents")
+    paragraphs = split_paragraphs(req.text)
+    if not paragraphs:
+        raise HTTPException(status_code=400, detail="Text is required")
+
+    # Keep one voice for the whole document: no fallback model.
+    try:
+        model_id, _ = await run_in_threadpool(resolve_model, req, False)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Model unavailable: {e}")
+    session = document_manager.create(paragraphs, (req, model_id), read_ahead)
+    return {**session.to_dict(), "model": model_id}
+
+
+@app.get("/documents/{document_id}")
+async def get_document(document_id: str):
+    session = document_manager.get(document_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return session.to_dict()
+
+
+@app.delete("/documents/{document_id}")
+async def close_document(document_id: str):
+    if not document_manager.close(document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"id": document_id, "status": "closed"}
+
+
+@app.get("/documents/{document_id}/paragraphs/{index}")
+async def stream_paragraph(
+    document_id: str,
+    index: int,
+    x_trace: Optional[str] = Header(None),
+    x_request_id: Optional[str] = Header(None),
+):
+    """Streams a paragraph's audio, as /stream would, and moves the cursor.
+
+    X-Read-Ahead tells how far read-ahead had got: "ready", "running" or
+    "pending" (not started). Asking for a paragraph outside the read-ahead
+    window is a seek: read-ahead elsewhere is dropped.
+    """
+    session = document_manager.get(document_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not 0 <= index < len(session.paragraphs):
+        raise HTTPException(status_code=404, detail="Paragraph not found")
+    req, model_id = session.options
+    trace = tracer.start("documents", requested=x_trace == "1")
+    tracker = RequestTracker("documents", trace, x_request_id, request_timeout(req))
+    try:
+        try:
+            model = await run_in_threadpool(get_model, model_id)
+        except Exception as e:
+            raise HTTPException(status_code=503, detail=f"Model unavailable: {e}")
+        try:
+            chunks, state = document_manager.play(session, index, tracker.token)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Document not found")
+    except HTTPException as e:
+        tracker.reject(e)
+        raise
+
+    stream_format = request_stream_format(req)
+    content = track_stream(
+        tracker,
+        chunks,
+        lambda tracked: encode_stream(
+            tracked,
+            stream_format,
+            model.sample_rate,
+            framed=req.framed,
+            trace=trace,
+            coalesce_ms=stream_coalesce_ms(req),
+        ),
+        model.sample_rate,
+        "ok" if state == PENDING else "read_ahead",
+    )
+    return stream_response(
+        content,
+        tracker,
+        req,
+        stream_format,
+        model.sample_rate,
+        model_id,
+        {"X-Read-Ahead": state},
+    )
+
+
 @app.post("/generate")
-async def synthesize(req: TtsRequest):
+async def synthesize(
+    request: Request,
+    req: TtsRequest,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    x_trace: Optional[str] = Header(None),
+    x_request_id: Optional[str] = Header(None),
+):
+    """Renders speech for ``req.text`` into one audio file.
+
+    Text normalization is opt-in, as for /stream.
+    """
+    trace = tracer.start("generate", requested=x_trace == "1")
+    tracker = RequestTracker("generate", trace, x_request_id, request_timeout(req))
+    try:
+        return await generate_file(request, req, accept, if_none_match, tracker)
+    except HTTPException as e:
+        tracker.reject(e)
+        raise
+
+
+async def generate_file(
+    request: Request,
+    req: TtsRequest,
+    accept: Optional[str],
+    if_none_match: Optional[str],
+    tracker: RequestTracker,
+):
+    """Renders a /generate request into one encoded file."""
     if model_instance is None:
         raise HTTPException(status_code=503, detail="Model not initialized")
 
+    start_by = request_start_by(req)
+    trace = tracker.trace
+    with trace.span("normalize"):
+        text_headers = normalize_request(req, tracker.endpoint)
     if not req.text.strip():
         raise HTTPException(status_code=400, detail="Text is required")
 
+    fmt = negotiate_format(accept)
+    if fmt is None:
+        supported = ", ".join(f.media_type for f in FORMATS.values())
+        raise HTTPException(
+            status_code=406, detail=f"Supported formats: {supported}"
+        )
+    validate_model(req)
+    apply_voice(req)
+
+    try:
+        with trace.span("resolve_model"):
+            model_id, model = await run_in_threadpool(resolve_model, req)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Model unavailable: {e}")
+
     try:
-        steps = req.ddpm_steps if req.ddpm_steps else 20
-        temp_prefix = f"gen_{int(time.time() * 1000)}"
-        temp_path = Path(req.output_path)
-
-        kwargs = {
-            "model": model_instance,
-            "text": req.text,
-            "output_path": str(temp_path),
-            "file_prefix": temp_prefix,
-            "audio_format": "wav",
-            "verbose": False,
-            "ddpm_steps": steps,
+        key = await run_in_threadpool(request_cache_key, req, model_id)
+        headers = {
+            "X-Model": model_id,
+            "X-Request-Id": tracker.request_id,
+            **text_headers,
         }
+        if key:
+            headers["ETag"] = f'"{key}.{fmt}"'
+            if etag_matches(
+                if_none_match, headers["ETag"], lambda: key in synthesis_cache
+            ):
+                tracker.finish("not_modified")
+                headers.update(trace_headers(trace))
+                return Response(status_code=304, headers=headers)
 
-        if req.voice:
-            kwargs["voice"] = req.voice
-        if req.instruct:
-            kwargs["instruct"] = req.instruct
-        if req.gender:
-            kwargs["gender"] = req.gender
-        if req.ref_audio:
-            kwargs["ref_audio"] = req.ref_audio
-        if req.ref_text:
-            kwargs["ref_text"] = req.ref_text
-        if req.speed:
-            kwargs["speed"] = float(req.speed)
-        if req.pitch:
-            kwargs["pitch"] = float(req.pitch)
-        if req.exaggeration:
-            kwargs["exaggeration"] = float(req.exaggeration)
-        if req.cfg_scale:
-            kwargs["cfg_scale"] = float(req.cfg_scale)
-
-        # Execute generation
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: generate_audio(**kwargs))
-
-        # Find and read the file into memory
-        matches = sorted(temp_path.glob(f"{temp_prefix}*.wav"))
-        if not matches:
-            raise Exception("No audio file was generated")
-
-        audio_file = matches[0]
-        with open(audio_file, "rb") as f:
-            audio_bytes = f.read()
-
-        # Cleanup
-        try:
-            os.remove(audio_file)
-        except:
-            pass
+        def run_generation():
+            audio_bytes, seconds, outcome = render_audio(
+                req, fmt, model_id, model, trace, tracker.token, start_by=start_by
+            )
+            if key:
+                headers["X-Cache"] = "HIT" if outcome == "cache_hit" else "MISS"
+            headers["X-Coalesced"] = "1" if outcome == "coalesced" else "0"
+            tracker.audio(seconds)
+            tracker.sent(len(audio_bytes))
+            tracker.finish(outcome, generated=outcome == "ok")
+            headers.update(trace_headers(trace))
+            return audio_bytes
 
-        return Response(content=audio_bytes, media_type="audio/wav")
+        audio_bytes = await run_until_disconnected(
+            request, run_generation, tracker.token
+        )
+        return Response(
+            content=audio_bytes,
+            media_type=FORMATS[fmt].media_type,
+            headers=headers,
+        )
 
+    except Cancelled as e:
+        tracker.finish("cancelled")
+        status_code = 504 if e.reason == DEADLINE else 409
+        raise HTTPException(status_code=status_code, detail=str(e))
     except Exception as e:
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/jobs", status_code=202)
+async def create_job(job_req: JobRequest):
+    if model_instance is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    if job_req.format not in FORMATS:
+        supported = ", ".join(FORMATS)
+        raise HTTPException(status_code=400, detail=f"Supported formats: {supported}")
+    if not job_req.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    for item in job_req.items:
+        normalize_request(item, "jobs")
+    if any(not item.text.strip() for item in job_req.items):
+        raise HTTPException(status_code=400, detail="Text is required")
+    for item in job_req.items:
+        validate_model(item)
+        apply_voice(item)
+
+    job = job_manager.submit(job_req.items, job_req.format)
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/result/{index}")
+async def get_job_result(job_id: str, index: int):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not 0 <= index < len(job.items):
+        raise HTTPException(status_code=404, detail="Item not found")
+
+    item = job.items[index]
+    if item.status == FAILED:
+        raise HTTPException(status_code=500, detail=item.error)
+    if item.audio is None:
+        raise HTTPException(status_code=409, detail=f"Item is {item.status}")
+    return Response(content=item.audio, media_type=FORMATS[job.format].media_type)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("TTS_PORT", 8000))
     logger.info(f"Starting TTS server on port {port}")
@@ -1,24 +1,45 @@
-import time
-import tempfile
-from pathlib import Path
+"""Local Gradio demo, streaming audio from the resident model.
 
-import gradio as gr
-from mlx_audio.tts.generate import generate_audio
-from mlx_audio.tts.utils import load_model
+Streamed audio output needs ffmpeg on PATH (Gradio encodes the chunks).
+"""
 
 import os
 
-MODEL_ID = "mlx-community/Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16"
+import gradio as gr
+import numpy as np
+from mlx_audio.tts.generate import load_audio
+
+from tts_engine.batching import to_float32
+from tts_engine.loader import DEFAULT_MODEL_ID, SMALL_MODEL_ID, load_model
+from tts_engine.registry import ModelRegistry
+
+MODEL_ID = os.environ.get("TTS_MODEL", DEFAULT_MODEL_ID)
+MODEL_OPTIONS = [MODEL_ID, os.environ.get("TTS_FALLBACK_MODEL", SMALL_MODEL_ID)]
 VOICE_OPTIONS = ["", "Chelsie", "Ethan", "Vivian"]
 
-_model = None
+# The model runs one generation at a time; more would only slow each other
+# down. Further clicks wait in a bounded queue.
+CONCURRENCY = int(os.environ.get("TTS_UI_CONCURRENCY", 1))
+QUEUE_SIZE = int(os.environ.get("TTS_UI_QUEUE_SIZE", 8))
+# Gradio spools streamed audio and uploads to its cache; files older than
+# this are deleted, checked as often.
+CACHE_MAX_AGE_S = int(os.environ.get("TTS_UI_CACHE_MAX_AGE_S", 3600))
+
+# The default model stays resident; the other is loaded on first use.
+_models = ModelRegistry(
+    lambda model_id: load_model(model_id)[0],
+    budget_bytes=int(os.environ.get("TTS_MODEL_BUDGET_MB", 6144)) * 1024 * 1024,
+    pinned=[MODEL_ID],
+)
+
+
+def get_model(model_id=MODEL_ID):
+    return _models.get(model_id or MODEL_ID)
 
 
-def get_model():
-    global _model
-    if _model is None:
-        _model = load_model(MODEL_ID)
-    return _model
+def to_pcm16(audio) -> np.ndarray:
+    samples = np.clip(to_float32(audio), -1.0, 1.0)
+    return (samples * 32767).astype(np.int16)
 
 
 def synthesize(
@@ -33,22 +54,14 @@ def synthesize(
     exaggeration,
     cfg_scale,
     ddpm_steps,
+    model_id=MODEL_ID,
 ):
+    """Streams audio to the output as the model produces it."""
     if not text or not text.strip():
         raise gr.Error("Text is required.")
 
-    model = get_model()
-    output_dir = Path(tempfile.gettempdir()) / "qwen3_tts"
-    output_dir.mkdir(parents=True, exist_ok=True)
-    prefix = f"qwen3_{int(time.time() * 1000)}"
-
-    kwargs = {
-        "model": model,
-        "text": text,
-        "file_prefix": prefix,
-        "output_path": str(output_dir),
-        "audio_format": "wav",
-    }
+    model = get_model(model_id)
+    kwargs = {"text": text, "stream": True}
 
     if voice:
         kwargs["voice"] = voice
@@ -61,7 +74,7 @@ def synthesize(
     if gender:
         kwargs["gender"] = gender
     if ref_audio:
-        kwargs["ref_audio"] = ref_audio
+        kwargs["ref_audio"] = load_audio(ref_audio, sample_rate=model.sample_rate)
     if ref_text:
         kwargs["ref_text"] = ref_text
     if exaggeration is not None:
@@ -71,15 +84,21 @@ def synthesize(
     if ddpm_steps is not None:
         kwargs["ddpm_steps"] = int(ddpm_steps)
 
-    generate_audio(**kwargs)
-
-    matches = sorted(output_dir.glob(f"{prefix}*.wav"))
-    if not matches:
-        raise gr.Error("No audio file was generated.")
-    return str(matches[0])
-
-
-with gr.Blocks(title="Qwen3-TTS (mlx-audio)") as demo:
+    produced = False
+    # Stopping the event closes this generator, which stops the model.
+    for result in model.generate(**kwargs):
+        audio = to_pcm16(result.audio)
+        if len(audio):
+            produced = True
+            yield model.sample_rate, audio
+    if not produced:
+        raise gr.Error("No audio was generated.")
+
+
+with gr.Blocks(
+    title="Qwen3-TTS (mlx-audio)",
+    delete_cache=(CACHE_MAX_AGE_S, CACHE_MAX_AGE_S),
+) as demo:
     gr.Markdown("# Qwen3-TTS local demo")
 
     with gr.Row():
@@ -88,9 +107,14 @@ with gr.Blocks(title="Qwen3-TTS (mlx-audio)") as demo:
             lines=4,
             value="Hello, this is a test.",
         )
-        audio_out = gr.Audio(label="Output", type="filepath")
+        audio_out = gr.Audio(label="Output", streaming=True, autoplay=True)
 
     with gr.Row():
+        model_id = gr.Dropdown(
+            label="Model",
+            choices=MODEL_OPTIONS,
+            value=MODEL_ID,
+        )
         voice = gr.Dropdown(
             label="Voice",
             choices=VOICE_OPTIONS,
@@ -138,8 +162,10 @@ with gr.Blocks(title="Qwen3-TTS (mlx-audio)") as demo:
             step=1,
         )
 
-    run = gr.Button("Generate")
-    run.click(
+    with gr.Row():
+        run = gr.Button("Generate", variant="primary")
+        stop = gr.Button("Stop")
+    generation = run.click(
         synthesize,
         inputs=[
             text,
@@ -153,9 +179,19 @@ with gr.Blocks(title="Qwen3-TTS (mlx-audio)") as demo:
             exaggeration,
             cfg_scale,
             ddpm_steps,
+            model_id,
         ],
         outputs=audio_out,
+        concurrency_limit=CONCURRENCY,
     )
+    stop.click(None, cancels=[generation])
+
+demo.queue(default_concurrency_limit=CONCURRENCY, max_size=QUEUE_SIZE)
 
 if __name__ == "__main__":
+    # Load and warm the resident model before taking requests.
+    resident = get_model(MODEL_ID)
+    if os.environ.get("TTS_WARMUP", "1") != "0":
+        for _ in resident.generate(text="Hello, this is a warm-up.", stream=True):
+            pass
     demo.launch()
@@ -10,6 +10,7 @@ def verify_structure(root_path: Path):
         "Qwen3-TTS-12Hz-1.7B-VoiceDesign-bf16/config.json",
         ".venv/bin/python",
         "tts_server.py",
+        "tts_engine/__init__.py",
     ]
 
     missing = []
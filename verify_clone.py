@@ -1,5 +1,5 @@
 from mlx_audio.tts.generate import generate_audio
-from mlx_audio.tts.utils import load_model
+from tts_engine.loader import load_model
 import os
 
 # Data from voices.json for "asd"
@@ -23,7 +23,7 @@ if size < 1000:
     print("WARNING: Audio file seems very small.")
 
 print("Loading model...")
-model = load_model(MODEL_ID)
+model, _ = load_model(MODEL_ID)
 
 print("Generating audio with cloning parameters...")
 try: